@@ -6,5 +6,6 @@ from . import models
 admin.site.register(models.NoteSpace)
 admin.site.register(models.NoteSpaceMember)
 admin.site.register(models.Note)
+admin.site.register(models.NoteBody)
 admin.site.register(models.Tag)
 admin.site.register(models.NoteLog)
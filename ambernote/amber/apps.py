@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AmbernoteAmberConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ambernote.amber'
+
+    def ready(self):
+        from . import membership  # noqa: F401, register signal receivers
+        from ambernote import metrics, timing  # noqa: F401, time and count database connections and queries
@@ -0,0 +1,108 @@
+"""
+Results of benchmarks (see :mod:`.loadtest` and :mod:`.microbench`), stored as JSON so that runs can be compared
+across commits.
+
+A result file is ``{"meta": {...}, "results": {"<name>": {"<metric>": value, ...}, ...}}``,
+where meta describes the run (commit, database, versions...) and each result is a set of metrics,
+e.g. ``"wsgi/notes_list": {"requests": 400, "errors": 0, "throughput": 812.5, "p50_ms": 4.1, ...}``.
+"""
+import json
+import math
+import platform
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# metrics which regress when they decrease, other metrics (latencies) regress when they increase
+HIGHER_IS_BETTER = {'throughput'}
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+
+def summarize_latencies(latencies: list[float], errors: int, duration: float) -> dict:
+    """
+    Summarize latencies (in seconds) of the requests made in the duration (in seconds).
+    """
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput': round(len(values) / duration, 1) if duration > 0 else 0.0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        **{f'p{percent}_ms': round(percentile(values, percent) * 1000, 3) for percent in (50, 95, 99)},
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def describe_run(**options) -> dict:
+    """
+    Metadata of a benchmark run, with the given options.
+    """
+    return {
+        'commit': _git_commit(),
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'debug': settings.DEBUG,
+        **options,
+    }
+
+
+def save_results(path: str, meta: dict, results: dict) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'meta': meta, 'results': results}, indent=2, sort_keys=True) + '\n')
+
+
+def load_results(path: str) -> dict:
+    """
+    :returns: results of the file
+    :raises ValueError: if the file can not be read
+    """
+    try:
+        return json.loads(Path(path).read_text())['results']
+    except (OSError, ValueError, KeyError) as e:
+        raise ValueError(f'Can not read benchmark results from {path}: {e}')
+
+
+def find_regressions(baseline: dict, results: dict, limits: dict[str, float]) -> list[str]:
+    """
+    Compare results with the baseline, results missing from either are skipped.
+    :param limits: metric => maximum relative change for the worse, e.g. {"p95_ms": 0.25} fails when
+        the p95 latency is more than 25% higher than the baseline
+    :returns: descriptions of the regressions
+    """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        for metric, limit in limits.items():
+            old, new = baseline.get(name, {}).get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > limit:
+                regressions.append(f'{name}: {metric} {old} -> {new} ({change:+.0%}, limit {limit:.0%})')
+    return regressions
@@ -0,0 +1,162 @@
+"""
+Transparent compression of large JSON values at rest.
+
+A value of a :class:`CompressedJSONField` whose JSON text is larger than ``JSON_COMPRESSION_THRESHOLD`` bytes
+is stored as a frame ``{"$zlib": "<base64 of the zlib-compressed JSON text>"}``, smaller values are stored as they are.
+The column is still a JSON column, so rows written before compression was enabled are read as they are,
+and values are decompressed when loaded, so models, serializers and the admin only see the original values.
+Keys of compressed values cannot be queried (e.g. ``extras__has_key``), nor be indexed.
+
+Existing rows are (re)compressed by the ``recompress_json`` command,
+and :func:`recompress_field` may be called by any scheduler as well.
+"""
+import json
+import logging
+import time
+import zlib
+from base64 import b64decode, b64encode
+from typing import Any, Iterator, NamedTuple, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Cast
+
+logger = logging.getLogger(__name__)
+
+FRAME_KEY = '$zlib'
+
+# zlib level, from 1 (fastest) to 9 (smallest)
+COMPRESSION_LEVEL = 6
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _size(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+def is_frame(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and isinstance(value.get(FRAME_KEY), str)
+
+
+def compress_json(value: Any, threshold: Optional[int] = None) -> Any:
+    """
+    Compress the value if its JSON text is larger than `threshold` bytes (default: JSON_COMPRESSION_THRESHOLD)
+    and compression saves space.
+    A value which looks like a frame is always compressed, so that it is not mistaken for one when decompressed.
+    :returns: the frame of the compressed value, or the value itself
+    """
+    if threshold is None:
+        threshold = settings.JSON_COMPRESSION_THRESHOLD
+    text = _dumps(value)
+    if _size(text) <= threshold and not is_frame(value):
+        return value
+
+    frame = {FRAME_KEY: b64encode(zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)).decode('ascii')}
+    if _size(_dumps(frame)) >= _size(text) and not is_frame(value):
+        return value  # incompressible, e.g. random strings
+    return frame
+
+
+def decompress_json(value: Any) -> Any:
+    """
+    Decompress a value stored by :func:`compress_json`, other values are returned as they are.
+    """
+    if not is_frame(value):
+        return value
+    return json.loads(zlib.decompress(b64decode(value[FRAME_KEY])).decode('utf-8'))
+
+
+class CompressedJSONField(models.JSONField):
+    """
+    JSONField which compresses large values at rest, see :mod:`.compression`.
+    """
+
+    def get_prep_value(self, value):
+        if value is None:
+            return value
+        return super().get_prep_value(compress_json(value))
+
+    def from_db_value(self, value, expression, connection):
+        value = super().from_db_value(value, expression, connection)
+        if isinstance(expression, KeyTransform):  # a part of a value is never compressed
+            return value
+        return decompress_json(value)
+
+
+class RecompressResult(NamedTuple):
+    scanned: int = 0  # number of scanned rows
+    rewritten: int = 0  # number of rewritten rows
+    bytes_before: int = 0  # estimated size of the scanned values before
+    bytes_after: int = 0  # estimated size of the scanned values after
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __add__(self, other):
+        return RecompressResult(*(a + b for a, b in zip(self, other)))
+
+
+def get_compressed_fields() -> Iterator[CompressedJSONField]:
+    """
+    Get compressed JSON fields of all installed models.
+    """
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, CompressedJSONField):
+                yield field
+
+
+def recompress_field(field: CompressedJSONField, batch_size: int = 500, sleep: float = 0,
+                     dry_run: bool = False) -> RecompressResult:
+    """
+    Rewrite the values of the field with the current threshold, `batch_size` rows in each transaction:
+    large uncompressed values are compressed, and compressed values under the threshold are decompressed.
+    Sleep `sleep` seconds between transactions to leave room for other queries.
+    """
+    model = field.model
+    pk_name = model._meta.pk.attname
+
+    result = RecompressResult()
+    last_pk = None
+    while True:
+        queryset = model._base_manager.order_by('pk')
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+
+        with transaction.atomic():
+            # lock the rows, so that no value changed meanwhile is overwritten,
+            # and read the stored JSON text, not the decompressed value
+            rows = list(queryset.select_for_update()
+                        .values_list('pk', Cast(field.attname, models.TextField()))[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            rewritten = []
+            bytes_before = bytes_after = 0
+            for pk, text in rows:
+                if text is None:
+                    continue
+                stored = json.loads(text)
+                value = decompress_json(stored)
+                encoded = compress_json(value)
+                bytes_before += _size(_dumps(stored))
+                bytes_after += _size(_dumps(encoded))
+                if is_frame(stored) != is_frame(encoded):
+                    rewritten.append(model(**{pk_name: pk, field.attname: value}))
+
+            if rewritten and not dry_run:
+                model._base_manager.bulk_update(rewritten, [field.attname])
+
+        result += RecompressResult(len(rows), len(rewritten), bytes_before, bytes_after)
+        logger.debug(f'Recompressed {model._meta.label}.{field.name} up to {last_pk}: {result}')
+        if sleep:
+            time.sleep(sleep)
+
+    return result
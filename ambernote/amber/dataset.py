@@ -0,0 +1,364 @@
+"""
+Synthetic dataset for performance work, generated by the ``generate_dataset`` command.
+
+It creates users, a personal notespace for each user and team notespaces with a mix of roles, tags,
+and notes with their bodies, tags, search terms and log histories, as the API would have created them:
+the logs of a note rebuild each of its versions (see :mod:`.history`), the excerpt and word count
+match the content, and trashed notes are not indexed.
+
+Sizes follow long-tailed distributions: a few notespaces hold most notes, and most notes are short
+while some are very long (so that compression and patches are exercised).
+Everything is drawn from a random generator seeded with ``DatasetSpec.seed``, and timestamps are relative
+to ``DatasetSpec.until``, so the same spec generates the same rows on SQLite, MySQL and PostgreSQL
+(except auto-incremented ids).
+"""
+import logging
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .history import NoteVersion, encode_created, encode_update
+from .models import Note, NoteBody, NoteLog, NoteSpace, NoteSpaceMember, Tag
+from .search import index_notes
+from .text import summarize
+
+UserModel = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+EMAIL_DOMAIN = 'example.com'
+VOCABULARY_SIZE = 5000
+SYLLABLES = ('ka', 'to', 'ri', 'mi', 'sa', 'no', 'ne', 'lu', 'ven', 'dor', 'el', 'an', 'is', 'or', 'ta', 'be',
+             'qu', 'ex', 'pra', 'lin', 'mon', 'ser', 'gal', 'fi', 'um', 'ost', 'che', 'ra', 'do', 'wi')
+
+# probabilities of note states and of a team member role (other than the owner creating the notespace)
+ARCHIVED_RATE = 0.08
+PINNED_RATE = 0.04
+DELETED_RATE = 0.03
+EMPTY_RATE = 0.03
+ROLE_WEIGHTS = {NoteSpaceMember.Role.OWNER: 1, NoteSpaceMember.Role.MEMBER: 6, NoteSpaceMember.Role.GUEST: 3}
+
+MAX_BLOCKS = 400  # blocks in the content of a note
+MAX_UPDATES = 40  # UPDATED logs of a note
+
+
+class DatasetSpec(NamedTuple):
+    users: int = 100
+    team_notespaces: int = 20
+    notes: int = 10000
+    # tags of a notespace are drawn up to this number, and a note has up to max_note_tags of them
+    max_tags: int = 30
+    max_note_tags: int = 4
+    # history of the notes spans this number of days until the given time, default the current time
+    days: int = 365
+    until: Optional[datetime] = None
+    seed: int = 0
+    # password of every user, to log in e.g. in benchmarks
+    password: str = 'password'
+
+
+class DatasetResult(NamedTuple):
+    users: int = 0
+    notespaces: int = 0
+    members: int = 0
+    tags: int = 0
+    notes: int = 0
+    logs: int = 0
+    terms: int = 0
+
+    def __add__(self, other):
+        return DatasetResult(*(a + b for a, b in zip(self, other)))
+
+
+def get_email_suffix(seed: int) -> str:
+    """
+    Common suffix of the emails of users generated with the seed.
+    """
+    return f'.seed{seed}@{EMAIL_DOMAIN}'
+
+
+def get_email(seed: int, index: int) -> str:
+    """
+    Email of the index-th (from 0) user generated with the seed.
+    """
+    return f'user{index}{get_email_suffix(seed)}'
+
+
+@contextmanager
+def _explicit_timestamps(*models):
+    """
+    Save the given created_at and updated_at instead of the current time, which auto_now(_add) would set.
+    """
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _bulk_create(model, objs: list, batch_size: int) -> None:
+    """
+    Create objects which have a uuid, and set their primary keys.
+    """
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    if objs and objs[0].pk is None:  # e.g. MySQL does not return the ids of inserted rows
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            ids = dict(model.objects.filter(uuid__in=[obj.uuid for obj in batch]).values_list('uuid', 'id'))
+            for obj in batch:
+                obj.pk = ids[obj.uuid]
+
+
+class _Generator:
+    def __init__(self, spec: DatasetSpec, until: datetime):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.since = until - timedelta(days=spec.days)
+        self.until = until
+        self.words = self._make_vocabulary()
+        # Zipf's law: the n-th most frequent word is used about 1/n as often as the first
+        self.word_weights = list(_cumulative(1 / rank for rank in range(1, len(self.words) + 1)))
+
+    def _make_vocabulary(self) -> list[str]:
+        words: list[str] = []
+        seen: set[str] = set()
+        while len(words) < VOCABULARY_SIZE:
+            word = ''.join(self.rng.choices(SYLLABLES, k=self.rng.randint(1, 4)))
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+        return words
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.rng.getrandbits(128), version=4)
+
+    def time_between(self, start: datetime, end: datetime) -> datetime:
+        return start + (end - start) * self.rng.random()
+
+    def sentence(self, min_words: int, max_words: int) -> str:
+        words = self.rng.choices(self.words, cum_weights=self.word_weights, k=self.rng.randint(min_words, max_words))
+        return ' '.join(words).capitalize()
+
+    def paragraph(self) -> dict:
+        text = '. '.join(self.sentence(4, 20) for _ in range(self.rng.randint(1, 5))) + '.'
+        return {'type': 'paragraph', 'content': [{'type': 'text', 'text': text}]}
+
+    def block(self) -> dict:
+        kind = self.rng.random()
+        if kind < 0.1:
+            return {'type': 'heading', 'attrs': {'level': self.rng.randint(1, 3)},
+                    'content': [{'type': 'text', 'text': self.sentence(1, 6)}]}
+        if kind < 0.25:
+            return {'type': 'bulletList', 'content': [
+                {'type': 'listItem', 'content': [self.paragraph()]} for _ in range(self.rng.randint(2, 6))
+            ]}
+        return self.paragraph()
+
+    def blocks(self) -> list[dict]:
+        if self.rng.random() < EMPTY_RATE:
+            return []
+        # log-normal: a median of about 5 blocks (1 KB), and a long tail of long notes
+        count = min(MAX_BLOCKS, int(self.rng.lognormvariate(1.6, 1.0)) + 1)
+        return [self.block() for _ in range(count)]
+
+    def versions(self) -> list[NoteVersion]:
+        """
+        Versions of a note, each update writes more of the final content and sometimes renames it.
+        """
+        blocks = self.blocks()
+        updates = min(MAX_UPDATES, int(self.rng.expovariate(1 / 3)))
+        title = self.sentence(1, 8)
+        versions = []
+        for revision in range(1, updates + 2):
+            if revision > 1 and self.rng.random() < 0.1:
+                title = self.sentence(1, 8)
+            written = math.ceil(len(blocks) * revision / (updates + 1))
+            versions.append(NoteVersion(title, {'type': 'doc', 'content': blocks[:written]}, revision))
+        return versions
+
+    def users(self) -> list:
+        password = make_password(self.spec.password)  # hashed once, hashing is slow on purpose
+        users = []
+        for index in range(self.spec.users):
+            joined_at = self.time_between(self.since, self.since + (self.until - self.since) / 4)
+            users.append(UserModel(
+                uuid=self.uuid(), email=get_email(self.spec.seed, index), fullname=self.sentence(2, 2).title(),
+                password=password, date_joined=joined_at, created_at=joined_at, updated_at=joined_at,
+            ))
+        return users
+
+    def notespaces(self, users: list) -> tuple[list[NoteSpace], list[NoteSpaceMember]]:
+        notespaces, members = [], []
+        for user in users:
+            notespace = NoteSpace(uuid=self.uuid(), type=NoteSpace.Type.PERSONAL, name=user.fullname,
+                                  created_at=user.created_at, updated_at=user.created_at)
+            notespaces.append(notespace)
+            members.append(NoteSpaceMember(notespace=notespace, user=user, role=NoteSpaceMember.Role.OWNER,
+                                           created_at=user.created_at, updated_at=user.created_at))
+
+        roles, weights = list(ROLE_WEIGHTS), list(ROLE_WEIGHTS.values())
+        for _ in range(self.spec.team_notespaces):
+            size = min(len(users), 1 + int(self.rng.lognormvariate(1.5, 0.8)))
+            team = self.rng.sample(users, size)
+            created_at = self.time_between(max(user.created_at for user in team), self.until)
+            notespace = NoteSpace(uuid=self.uuid(), type=NoteSpace.Type.TEAM, name=self.sentence(1, 3),
+                                  created_at=created_at, updated_at=created_at)
+            notespaces.append(notespace)
+            for index, user in enumerate(team):
+                role = NoteSpaceMember.Role.OWNER if index == 0 else self.rng.choices(roles, weights)[0]
+                joined_at = created_at if index == 0 else self.time_between(created_at, self.until)
+                members.append(NoteSpaceMember(notespace=notespace, user=user, role=role,
+                                               created_at=joined_at, updated_at=joined_at))
+        return notespaces, members
+
+    def tags(self, notespace: NoteSpace) -> list[Tag]:
+        names: list[str] = []
+        for _ in range(self.rng.randint(0, self.spec.max_tags)):
+            name = self.rng.choice(self.words)
+            if name not in names:
+                names.append(name)
+        tags = []
+        for name in names:
+            created_at = self.time_between(notespace.created_at, self.until)
+            tags.append(Tag(uuid=self.uuid(), notespace=notespace, name=name,
+                            created_at=created_at, updated_at=created_at))
+        return tags
+
+    def note_counts(self, count: int) -> list[int]:
+        """
+        Split the notes between the notespaces, a few notespaces get most of them (Pareto).
+        """
+        weights = [self.rng.paretovariate(1.2) for _ in range(count)]
+        total = sum(weights)
+        counts = [int(self.spec.notes * weight / total) for weight in weights]
+        for index in self.rng.choices(range(count), weights, k=self.spec.notes - sum(counts)):
+            counts[index] += 1
+        return counts
+
+    def note(self, notespace: NoteSpace, writers: list, tags: list[Tag]) -> tuple[Note, NoteBody, list, list]:
+        """
+        :returns: (note, body, tags, logs) of a new note, in order of creation
+        """
+        versions = self.versions()
+        created_at = self.time_between(notespace.created_at, self.until)
+        # a log every few hours to few weeks after the previous one, within the history
+        times = [created_at]
+        for _ in range(len(versions) + 3):  # CREATED, UPDATED, TAGGED and flag logs
+            times.append(min(self.until, times[-1] + timedelta(hours=self.rng.expovariate(1 / 72))))
+        times.reverse()
+
+        last = versions[-1]
+        excerpt, word_count = summarize(last.content)
+        note = Note(uuid=self.uuid(), notespace=notespace, title=last.title, excerpt=excerpt, word_count=word_count,
+                    revision=last.revision, created_at=created_at, updated_at=created_at)
+
+        def log(action, **kwargs):
+            at = times.pop()
+            logs.append(NoteLog(uuid=self.uuid(), note=note, notespace=notespace, user=self.rng.choice(writers),
+                                action=action, created_at=at, updated_at=at, **kwargs))
+            return at
+
+        logs: list[NoteLog] = []
+        log(NoteLog.Action.CREATED, extras=encode_created(versions[0]))
+        for old, new in zip(versions, versions[1:]):
+            note.updated_at = log(NoteLog.Action.UPDATED, extras=encode_update(old, new))
+
+        note_tags = self.rng.sample(tags, min(len(tags), self.rng.randint(0, self.spec.max_note_tags)))
+        if note_tags:
+            note.updated_at = log(NoteLog.Action.TAGGED, extras={
+                'tags': [{'uuid': str(tag.uuid), 'name': tag.name} for tag in note_tags],
+            })
+        for flag, rate, action in (('is_pinned', PINNED_RATE, NoteLog.Action.PINNED),
+                                   ('is_archived', ARCHIVED_RATE, NoteLog.Action.ARCHIVED),
+                                   ('is_deleted', DELETED_RATE, NoteLog.Action.DELETED)):
+            if self.rng.random() < rate:
+                setattr(note, flag, True)
+                note.updated_at = log(action, extras={})
+        if note.is_deleted:
+            note.deleted_at = note.updated_at
+
+        return note, NoteBody(note=note, content=last.content), note_tags, logs
+
+
+def generate_dataset(spec: DatasetSpec, batch_size: int = 1000, index: bool = True) -> DatasetResult:
+    """
+    Generate a dataset, the notes of each notespace are created in transactions of batch_size notes.
+    :param index: whether notes are added to the search index
+    :raises ValueError: if the users of the seed already exist
+    """
+    until = spec.until or timezone.now()
+    generator = _Generator(spec, until)
+    emails = [get_email(spec.seed, index) for index in range(spec.users)]
+    if UserModel.objects.filter(email__in=emails[:1] + emails[-1:]).exists():
+        raise ValueError(f'A dataset with seed {spec.seed} exists, use another seed')
+
+    with _explicit_timestamps(UserModel, NoteSpace, NoteSpaceMember, Tag, Note, NoteLog):
+        with transaction.atomic():
+            users = generator.users()
+            _bulk_create(UserModel, users, batch_size)
+            notespaces, members = generator.notespaces(users)
+            _bulk_create(NoteSpace, notespaces, batch_size)
+            NoteSpaceMember.objects.bulk_create(members, batch_size=batch_size)
+        result = DatasetResult(users=len(users), notespaces=len(notespaces), members=len(members))
+        logger.info(f'Created {len(users)} users and {len(notespaces)} notespaces')
+
+        writers: dict[int, list] = {}
+        for member in members:
+            if member.role != NoteSpaceMember.Role.GUEST:
+                writers.setdefault(member.notespace.pk, []).append(member.user)
+
+        for notespace, count in zip(notespaces, generator.note_counts(len(notespaces))):
+            with transaction.atomic():
+                tags = generator.tags(notespace)
+                _bulk_create(Tag, tags, batch_size)
+            result += DatasetResult(tags=len(tags))
+
+            for start in range(0, count, batch_size):
+                with transaction.atomic():
+                    result += _create_notes(generator, notespace, writers[notespace.pk], tags,
+                                            min(batch_size, count - start), batch_size, index)
+            logger.info(f'Created {count} notes in notespace {notespace.uuid}')
+    return result
+
+
+def _create_notes(generator: _Generator, notespace: NoteSpace, writers: list, tags: list[Tag], count: int,
+                  batch_size: int, index: bool) -> DatasetResult:
+    notes, bodies, note_tags, logs = [], [], [], []
+    for _ in range(count):
+        note, body, tags_of_note, logs_of_note = generator.note(notespace, writers, tags)
+        notes.append(note)
+        bodies.append(body)
+        note_tags.append(tags_of_note)
+        logs += logs_of_note
+
+    _bulk_create(Note, notes, batch_size)
+    NoteBody.objects.bulk_create(bodies, batch_size=batch_size)
+    Note.tags.through.objects.bulk_create([
+        Note.tags.through(note_id=note.pk, tag_id=tag.pk)
+        for note, tags_of_note in zip(notes, note_tags) for tag in tags_of_note
+    ], batch_size=batch_size)
+    NoteLog.objects.bulk_create(logs, batch_size=batch_size)
+    terms = index_notes(notes, batch_size=batch_size) if index else 0
+    return DatasetResult(notes=len(notes), logs=len(logs), terms=terms)
+
+
+def _cumulative(values):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
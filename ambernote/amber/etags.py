@@ -0,0 +1,100 @@
+"""
+Entity tags for conditional requests.
+
+The ETag of a note is made of its uuid, revision and update time, and a digest of its tags,
+e.g. ``"<uuid hex>-12-1675209600000000-<digest>"``, so that it changes whenever the note (including flags)
+or one of its tags (e.g. renamed or deleted) changes, although renaming a tag does not update its notes.
+The revision in it is also what ``If-Match`` of an update is compared with.
+
+The ETag of a list is a digest of the request, the state of the pagination (e.g. the total count),
+and the ids and update times of the objects on the page and of their embedded relations,
+which changes when any of them is created, updated or deleted.
+It is built from the objects of the response, so nothing more is queried unless ``If-None-Match`` is sent.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from django.db.models import Model
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags
+
+from .models import Note
+
+
+def _timestamp(value: datetime) -> int:
+    return int(value.timestamp() * 1_000_000)
+
+
+def _relation_version(instance: Model, relation: str) -> list[tuple]:
+    """
+    Get the ids and update times of the related objects, from the prefetched ones if any.
+    """
+    prefetched = getattr(instance, '_prefetched_objects_cache', {})
+    if relation in prefetched:
+        values = [(obj.pk, obj.updated_at) for obj in prefetched[relation]]
+    else:
+        values = getattr(instance, relation).values_list('pk', 'updated_at')
+    return sorted((pk, _timestamp(updated_at)) for pk, updated_at in values)
+
+
+def note_etag(note: Note) -> str:
+    """
+    Get the (strong) ETag of the note, the tags are queried unless they are prefetched.
+    """
+    tags = hashlib.sha1(repr(_relation_version(note, 'tags')).encode('utf-8')).hexdigest()[:16]
+    return f'"{note.uuid.hex}-{note.revision}-{_timestamp(note.updated_at)}-{tags}"'
+
+
+def parse_if_match(header: Optional[str], note_uuid: UUID) -> Optional[list[int]]:
+    """
+    Get revisions of the note listed in an ``If-Match`` header,
+    each entity tag may be an ETag of the note or a bare revision, e.g. ``"12"``.
+    Weak entity tags never match.
+    :returns: None if there is no precondition (no header or ``*``), otherwise the (maybe empty) list of revisions
+    """
+    if header is None:
+        return None
+    revisions = []
+    for tag in parse_etags(header):
+        if tag == '*':
+            return None
+        if not tag.startswith('"'):  # weak or malformed
+            continue
+        parts = tag.strip('"').split('-')
+        if len(parts) == 1 and parts[0].isdigit():
+            revisions.append(int(parts[0]))
+        elif len(parts) in (3, 4) and parts[0] == note_uuid.hex and parts[1].isdigit():  # (3: issued without tags)
+            revisions.append(int(parts[1]))
+    return revisions
+
+
+def page_etag(objects: list[Model], key: str, state: tuple = (), relations: tuple[str, ...] = ()) -> str:
+    """
+    Get the ETag of a page of objects.
+    :param key: what else the response depends on, e.g. the full path and the media type
+    :param state: state of the pagination the response depends on, e.g. the count and if there is a next page
+    :param relations: embedded relations, whose versions are included if they are prefetched
+    """
+    digest = hashlib.sha1(f'{key}|{state}'.encode('utf-8'))
+    for obj in objects:
+        versions = [
+            _relation_version(obj, relation) for relation in relations
+            if relation in getattr(obj, '_prefetched_objects_cache', {})
+        ]
+        digest.update(f'|{obj.pk}:{_timestamp(obj.updated_at)}:{versions}'.encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified_response(request, etag: str) -> Optional[HttpResponse]:
+    """
+    Get the 304 Not Modified response if the ETag matches If-None-Match of a GET (or HEAD) request.
+    """
+    if request.method not in ('GET', 'HEAD') or 'HTTP_IF_NONE_MATCH' not in request.META:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
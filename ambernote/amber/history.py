@@ -0,0 +1,133 @@
+"""
+Note history stored in note logs.
+
+A CREATED log stores the full title and content of the new note.
+An UPDATED log stores a JSON Patch from the previous content (and the new title if changed),
+except every ``SNAPSHOT_INTERVAL`` revisions, or when the patch is not smaller than the content,
+where it stores a full snapshot instead. So any version can be rebuilt by applying
+a bounded number of patches to the nearest snapshot before it.
+"""
+import json
+from typing import Any, NamedTuple, Optional
+
+from .jsonpatch import apply_patch, make_patch
+from .models import Note, NoteLog
+
+SNAPSHOT_INTERVAL = 20
+
+
+class NoteVersion(NamedTuple):
+    title: str
+    content: Any
+    revision: Optional[int]
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, separators=(',', ':'), ensure_ascii=False))
+
+
+def encode_created(version: NoteVersion) -> dict:
+    """
+    Build extras of a CREATED log from the first version.
+    """
+    return {
+        'title': version.title,
+        'content': version.content,
+    }
+
+
+def build_created_extras(note: Note) -> dict:
+    """
+    Build extras of the CREATED log of a new note.
+    """
+    return encode_created(NoteVersion(note.title, note.content, note.revision))
+
+
+def encode_update(old: Optional[NoteVersion], new: NoteVersion, force_snapshot: bool = False) -> dict:
+    """
+    Build extras of an UPDATED log from the old version to the new version,
+    a full snapshot is stored if there is no old version.
+    """
+    extras: dict[str, Any] = {'revision': new.revision}
+    if not force_snapshot and old is not None and (new.revision is None or new.revision % SNAPSHOT_INTERVAL):
+        patch = make_patch(old.content, new.content)
+        if _json_size(patch) < _json_size(new.content):
+            if new.title != old.title:
+                extras['title'] = new.title
+            extras['patch'] = patch
+            return extras
+
+    extras['snapshot'] = {
+        'title': new.title,
+        'content': new.content,
+    }
+    return extras
+
+
+def build_updated_extras(old_title: str, old_content, note: Note) -> dict:
+    """
+    Build extras of the UPDATED log from the previous title and content to the current ones of the note.
+    """
+    old = NoteVersion(old_title, old_content, None)
+    return encode_update(old, NoteVersion(note.title, note.content, note.revision))
+
+
+def get_snapshot(log: NoteLog) -> Optional[NoteVersion]:
+    """
+    Get the full version stored in the log, None if the log only stores a patch.
+    """
+    extras = log.extras
+    if log.action == NoteLog.Action.CREATED and 'content' in extras:
+        return NoteVersion(extras.get('title', ''), extras['content'], extras.get('revision', 1))
+    if log.action == NoteLog.Action.UPDATED:
+        if 'snapshot' in extras:
+            return NoteVersion(extras['snapshot']['title'], extras['snapshot']['content'], extras.get('revision'))
+        if 'new' in extras:  # full copies written by older versions
+            return NoteVersion(extras['new']['title'], extras['new']['content'], extras.get('revision'))
+    return None
+
+
+def apply_log(version: Optional[NoteVersion], log: NoteLog) -> Optional[NoteVersion]:
+    """
+    Get the version right after the log from the version before it.
+    :returns: None if the version is unknown
+    """
+    snapshot = get_snapshot(log)
+    if snapshot is not None:
+        return snapshot
+    if version is None or log.action != NoteLog.Action.UPDATED:
+        return None
+    extras = log.extras
+    return NoteVersion(
+        extras.get('title', version.title),
+        apply_patch(version.content, extras.get('patch', [])),
+        extras.get('revision', version.revision),
+    )
+
+
+def reconstruct(log: NoteLog) -> Optional[NoteVersion]:
+    """
+    Rebuild the version of the note right after the log.
+    :returns: None if there is no snapshot to rebuild from (e.g. logs without content)
+    """
+    history = (
+        NoteLog.objects
+        .filter(note_id=log.note_id, id__lte=log.id, action__in=[NoteLog.Action.CREATED, NoteLog.Action.UPDATED])
+        .only('id', 'action', 'extras')
+        .order_by('-id')
+    )
+
+    # walk back to the nearest snapshot
+    patches = []
+    for entry in history.iterator(chunk_size=SNAPSHOT_INTERVAL):
+        version = get_snapshot(entry)
+        if version is not None:
+            break
+        patches.append(entry)
+    else:
+        return None
+
+    # and apply patches after it
+    for entry in reversed(patches):
+        version = apply_log(version, entry)
+    return version
@@ -0,0 +1,195 @@
+"""
+JSON Patch (RFC 6902) for note contents.
+
+See https://www.rfc-editor.org/rfc/rfc6902 and https://www.rfc-editor.org/rfc/rfc6901 (JSON Pointer).
+"""
+import copy
+from typing import Any
+
+
+class JsonPatchError(ValueError):
+    """The patch is malformed or can not be applied to the document."""
+
+
+def parse_pointer(pointer: str) -> list[str]:
+    """
+    Parse a JSON pointer to reference tokens, e.g. ``'/content/0/text'`` to ``['content', '0', 'text']``.
+    """
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JsonPatchError(f'Invalid JSON pointer: {pointer!r}')
+    if pointer == '':
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def _array_index(array: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == '-':
+        return len(array)
+    # leading zeros and signs are not allowed
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise JsonPatchError(f'Invalid array index: {token!r}')
+    index = int(token)
+    if index > len(array) or (index == len(array) and not allow_end):
+        raise JsonPatchError(f'Array index out of range: {token!r}')
+    return index
+
+
+def _resolve(document: Any, tokens: list[str]) -> Any:
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise JsonPatchError(f'Member {token!r} does not exist')
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_array_index(document, token)]
+        else:
+            raise JsonPatchError(f'Can not reference {token!r} in a scalar value')
+    return document
+
+
+def _get(document: Any, pointer: str) -> Any:
+    return _resolve(document, parse_pointer(pointer))
+
+
+def _add(document: Any, pointer: str, value: Any) -> Any:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        return value  # replace the whole document
+    parent, token = _resolve(document, tokens[:-1]), tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f'Can not add {token!r} to a scalar value')
+    return document
+
+
+def _remove(document: Any, pointer: str) -> tuple[Any, Any]:
+    """
+    :returns: (document, removed value)
+    """
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError('Can not remove the whole document')
+    parent, token = _resolve(document, tokens[:-1]), tokens[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f'Member {token!r} does not exist')
+        return document, parent.pop(token)
+    elif isinstance(parent, list):
+        return document, parent.pop(_array_index(parent, token))
+    else:
+        raise JsonPatchError(f'Can not remove {token!r} from a scalar value')
+
+
+def _operand(operation: dict, name: str) -> Any:
+    if name not in operation:
+        raise JsonPatchError(f'Missing {name!r} in {operation.get("op")!r} operation')
+    return operation[name]
+
+
+def apply_patch(document: Any, patch: list[dict]) -> Any:
+    """
+    Apply the patch to a copy of the document.
+    The patch is applied atomically, the original document is never modified.
+    :returns: the patched document
+    :raises JsonPatchError: if any operation fails
+    """
+    if not isinstance(patch, list):
+        raise JsonPatchError('Patch should be an array of operations')
+
+    document = copy.deepcopy(document)
+    for operation in patch:
+        if not isinstance(operation, dict):
+            raise JsonPatchError('Operation should be an object')
+        op = operation.get('op')
+        path = _operand(operation, 'path')
+
+        if op == 'add':
+            document = _add(document, path, copy.deepcopy(_operand(operation, 'value')))
+        elif op == 'remove':
+            document, _ = _remove(document, path)
+        elif op == 'replace':
+            _get(document, path)  # target must exist
+            if parse_pointer(path):
+                document, _ = _remove(document, path)
+            document = _add(document, path, copy.deepcopy(_operand(operation, 'value')))
+        elif op == 'move':
+            from_ = _operand(operation, 'from')
+            if path != from_ and path.startswith(from_ + '/'):
+                raise JsonPatchError('Can not move a value into one of its children')
+            document, value = _remove(document, from_)
+            document = _add(document, path, value)
+        elif op == 'copy':
+            value = copy.deepcopy(_get(document, _operand(operation, 'from')))
+            document = _add(document, path, value)
+        elif op == 'test':
+            if _get(document, path) != _operand(operation, 'value'):
+                raise JsonPatchError(f'Test operation failed at {path!r}')
+        else:
+            raise JsonPatchError(f'Unknown operation: {op!r}')
+
+    return document
+
+
+def _escape(token: str) -> str:
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+def _same(a: Any, b: Any) -> bool:
+    # bool is a subclass of int in python, so `[true] == [1]`, but they are different in JSON
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(_same, a, b))
+    return a == b
+
+
+def _diff(old: Any, new: Any, path: str, patch: list[dict]) -> None:
+    if _same(old, new):
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                patch.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, f'{path}/{_escape(key)}', patch)
+            else:
+                patch.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+
+    elif isinstance(old, list) and isinstance(new, list):
+        # skip the common head and tail, which is the usual shape of an edit in a document
+        head = 0
+        while head < len(old) and head < len(new) and _same(old[head], new[head]):
+            head += 1
+        tail = 0
+        while tail < len(old) - head and tail < len(new) - head and _same(old[-1 - tail], new[-1 - tail]):
+            tail += 1
+        old_middle, new_middle = old[head:len(old) - tail], new[head:len(new) - tail]
+
+        common = min(len(old_middle), len(new_middle))
+        for i in range(common):
+            _diff(old_middle[i], new_middle[i], f'{path}/{head + i}', patch)
+        # remove from the end, so that the indexes of remaining items do not change
+        for i in reversed(range(common, len(old_middle))):
+            patch.append({'op': 'remove', 'path': f'{path}/{head + i}'})
+        for i in range(common, len(new_middle)):
+            patch.append({'op': 'add', 'path': f'{path}/{head + i}', 'value': new_middle[i]})
+
+    else:
+        patch.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def make_patch(old: Any, new: Any) -> list[dict]:
+    """
+    Make a patch which turns the old document into the new one, i.e. ``apply_patch(old, make_patch(old, new)) == new``.
+    Objects and arrays are compared structurally, so a small edit of a large document makes a small patch.
+    """
+    patch: list[dict] = []
+    _diff(old, new, '', patch)
+    return patch
@@ -0,0 +1,344 @@
+"""
+HTTP load test of the API, run by the ``benchmark_http`` command.
+
+Requests are sent to the WSGI (``ambernote.wsgi``) and ASGI (``ambernote.asgi``) applications in process:
+they go through the whole middleware stack and the real URL routes, but not through a server or the network,
+so the results measure the application, and the benchmark runs anywhere, against SQLite or a local database.
+Concurrent clients are threads for WSGI (as the threads of a server worker) and tasks of an event loop for ASGI.
+
+Clients log in as users of a generated dataset (see :mod:`.dataset`), each in the team or personal notespace
+it can write with the most notes, and keep their session and CSRF cookies like a browser.
+"""
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from io import BytesIO
+from json import dumps
+from time import perf_counter
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from django.db import connections
+from django.db.models import Count, Q
+
+from .benchmark import summarize_latencies
+from .dataset import get_email_suffix
+from .models import Note, NoteSpaceMember
+
+INTERFACES = ('wsgi', 'asgi')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# notes of a client, read and flagged by its requests
+NOTES_PER_CLIENT = 100
+
+
+class ClientContext(NamedTuple):
+    email: str
+    password: str
+    notespace: str  # uuid
+    notes: list[str]  # uuids
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: dict
+    data: Optional[dict] = None
+
+
+class Response(NamedTuple):
+    status: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+
+def _login(context: ClientContext, index: int) -> Request:
+    return Request('POST', '/api/auth/login/', {}, {'email': context.email, 'password': context.password})
+
+
+def _note(context: ClientContext, index: int) -> str:
+    return context.notes[index % len(context.notes)]
+
+
+# name => build the index-th request of a client
+SCENARIOS: dict[str, Callable[[ClientContext, int], Request]] = {
+    'login': _login,
+    'notes_list': lambda context, index: Request('GET', '/api/notes/', {'notespace': context.notespace}),
+    'notes_cursor': lambda context, index: Request(
+        'GET', '/api/notes/', {'notespace': context.notespace, 'pagination': 'cursor'}),
+    'note_retrieve': lambda context, index: Request('GET', f'/api/notes/{_note(context, index)}/', {}),
+    'notelogs_list': lambda context, index: Request('GET', '/api/notelogs/', {'note': _note(context, index)}),
+    'activity': lambda context, index: Request('GET', '/api/notelogs/', {'notespace': context.notespace}),
+    # pins then unpins each note, so that every request changes a note
+    'pin': lambda context, index: Request(
+        'POST', f'/api/notes/{_note(context, index // 2)}/{"unpin" if index % 2 else "pin"}/', {}),
+}
+
+
+class _Cookies:
+    """
+    Cookies of a client, and the headers of its requests.
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.cookies: dict[str, str] = {}
+
+    def headers(self, request: Request, body: bytes) -> list[tuple[str, str]]:
+        headers = [('host', self.host)]
+        if self.cookies:
+            headers.append(('cookie', '; '.join(f'{name}={value}' for name, value in self.cookies.items())))
+        if request.method not in SAFE_METHODS and 'csrftoken' in self.cookies:
+            headers.append(('x-csrftoken', self.cookies['csrftoken']))
+        if body:
+            headers += [('content-type', 'application/json'), ('content-length', str(len(body)))]
+        return headers
+
+    def update(self, headers: list[tuple[str, str]]) -> None:
+        for name, value in headers:
+            if name.lower() != 'set-cookie':
+                continue
+            for key, morsel in SimpleCookie(value).items():
+                if morsel['max-age'] == '0':
+                    self.cookies.pop(key, None)
+                else:
+                    self.cookies[key] = morsel.value
+
+
+def _encode(request: Request) -> bytes:
+    return dumps(request.data).encode() if request.data is not None else b''
+
+
+class WSGIClient:
+    def __init__(self, application, host: str):
+        self.application = application
+        self.cookies = _Cookies(host)
+
+    def send(self, request: Request) -> Response:
+        body = _encode(request)
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': request.path,
+            'QUERY_STRING': urlencode(request.query),
+            'SERVER_NAME': self.cookies.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in self.cookies.headers(request, body):
+            key = name.upper().replace('-', '_')
+            environ[key if key in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{key}'] = value
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'], started['headers'] = int(status.split(' ', 1)[0]), headers
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        self.cookies.update(started['headers'])
+        return Response(started['status'], started['headers'], content)
+
+
+class ASGIClient:
+    def __init__(self, application, host: str):
+        self.application = application
+        self.cookies = _Cookies(host)
+
+    async def send(self, request: Request) -> Response:
+        body = _encode(request)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': request.method,
+            'scheme': 'http',
+            'path': request.path,
+            'raw_path': request.path.encode(),
+            'query_string': urlencode(request.query).encode(),
+            'root_path': '',
+            'headers': [(name.encode(), value.encode()) for name, value in self.cookies.headers(request, body)],
+            'client': ('127.0.0.1', 0),
+            'server': (self.cookies.host, 80),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await asyncio.Future()  # the client never disconnects, the application stops waiting when it is done
+
+        status, headers, chunks = 0, [], []
+
+        async def send(message):
+            nonlocal status, headers
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in message['headers']]
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.application(scope, receive, send)
+        self.cookies.update(headers)
+        return Response(status, headers, b''.join(chunks))
+
+
+def get_contexts(seed: int, password: str, count: int) -> list[ClientContext]:
+    """
+    Contexts of count clients, as different users of the dataset generated with the seed as possible.
+    :raises ValueError: if there is no note to benchmark
+    """
+    members = (
+        NoteSpaceMember.objects
+        .filter(user__email__endswith=get_email_suffix(seed),
+                role__in=[NoteSpaceMember.Role.OWNER, NoteSpaceMember.Role.MEMBER])
+        .annotate(note_count=Count('notespace__notes', filter=Q(notespace__notes__is_deleted=False)))
+        .filter(note_count__gt=0)
+        .select_related('user', 'notespace')
+        .order_by('-note_count', 'user__email')
+    )
+    contexts, seen = [], set()
+    for member in members:
+        if member.user_id in seen:
+            continue
+        seen.add(member.user_id)
+        notes = (
+            Note.objects
+            .filter(notespace=member.notespace, is_deleted=False)
+            .order_by('-created_at', '-id')
+            .values_list('uuid', flat=True)[:NOTES_PER_CLIENT]
+        )
+        contexts.append(ClientContext(member.user.email, password, str(member.notespace.uuid),
+                                      [str(uuid) for uuid in notes]))
+        if len(contexts) == count:
+            break
+    if not contexts:
+        raise ValueError(f'No dataset with seed {seed}, run generate_dataset first')
+    return [contexts[index % len(contexts)] for index in range(count)]
+
+
+class _Outcome(NamedTuple):
+    latencies: list[float]
+    errors: list[str]
+    started_at: float
+    finished_at: float
+
+
+def _check(response: Response, request: Request, errors: list[str]) -> None:
+    if response.status >= 400:
+        errors.append(f'{request.method} {request.path} {response.status}: {response.body[:200]!r}')
+
+
+def _summarize(outcomes: list[_Outcome]) -> tuple[dict, list[str]]:
+    latencies = [latency for outcome in outcomes for latency in outcome.latencies]
+    errors = [error for outcome in outcomes for error in outcome.errors]
+    duration = max(outcome.finished_at for outcome in outcomes) - min(outcome.started_at for outcome in outcomes)
+    return summarize_latencies(latencies, len(errors), duration), errors
+
+
+def run_wsgi(application, contexts: list[ClientContext], scenarios: list[str], requests: int, warmup: int,
+             host: str) -> dict[str, tuple[dict, list[str]]]:
+    """
+    :returns: scenario => (summary, errors)
+    """
+    clients = [WSGIClient(application, host) for _ in contexts]
+    for client, context in zip(clients, contexts):
+        client.send(_login(context, 0))
+
+    def work(index: int, build, barrier: threading.Barrier) -> _Outcome:
+        client, context = clients[index], contexts[index]
+        try:
+            for number in range(warmup):
+                client.send(build(context, number))
+            barrier.wait()
+            latencies, errors = [], []
+            started_at = perf_counter()
+            for number in range(warmup, warmup + requests):
+                request = build(context, number)
+                start = perf_counter()
+                response = client.send(request)
+                latencies.append(perf_counter() - start)
+                _check(response, request, errors)
+            return _Outcome(latencies, errors, started_at, perf_counter())
+        finally:
+            connections.close_all()  # connections of this thread
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        for scenario in scenarios:
+            barrier = threading.Barrier(len(clients))
+            futures = [executor.submit(work, index, SCENARIOS[scenario], barrier) for index in range(len(clients))]
+            results[scenario] = _summarize([future.result() for future in futures])
+    return results
+
+
+def run_asgi(application, contexts: list[ClientContext], scenarios: list[str], requests: int, warmup: int,
+             host: str) -> dict[str, tuple[dict, list[str]]]:
+    """
+    :returns: scenario => (summary, errors)
+    """
+    async def run():
+        clients = [ASGIClient(application, host) for _ in contexts]
+        await asyncio.gather(*(client.send(_login(context, 0)) for client, context in zip(clients, contexts)))
+
+        async def work(index: int, build) -> _Outcome:
+            client, context = clients[index], contexts[index]
+            latencies, errors = [], []
+            started_at = perf_counter()
+            for number in range(warmup, warmup + requests):
+                request = build(context, number)
+                start = perf_counter()
+                response = await client.send(request)
+                latencies.append(perf_counter() - start)
+                _check(response, request, errors)
+            return _Outcome(latencies, errors, started_at, perf_counter())
+
+        async def warm(index: int, build) -> None:
+            for number in range(warmup):
+                await clients[index].send(build(contexts[index], number))
+
+        results = {}
+        for scenario in scenarios:
+            build = SCENARIOS[scenario]
+            await asyncio.gather(*(warm(index, build) for index in range(len(clients))))
+            outcomes = await asyncio.gather(*(work(index, build) for index in range(len(clients))))
+            results[scenario] = _summarize(list(outcomes))
+        return results
+
+    return asyncio.run(run())
+
+
+def run_loadtest(interfaces: list[str], scenarios: list[str], contexts: list[ClientContext], requests: int,
+                 warmup: int = 5, host: str = 'localhost') -> dict[str, tuple[dict, list[str]]]:
+    """
+    Send requests of each scenario from concurrent clients (one for each context) through each interface.
+    :param requests: number of measured requests of each client and scenario, after warmup ones
+    :returns: "<interface>/<scenario>" => (summary, errors)
+    """
+    results = {}
+    for interface in interfaces:
+        if interface == 'wsgi':
+            from ambernote.wsgi import application
+            runner = run_wsgi
+        else:
+            from ambernote.asgi import application
+            runner = run_asgi
+        for scenario, result in runner(application, contexts, scenarios, requests, warmup, host).items():
+            results[f'{interface}/{scenario}'] = result
+    return results
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmark import describe_run, find_regressions, load_results, save_results
+from ...dataset import DatasetSpec
+from ...loadtest import INTERFACES, SCENARIOS, get_contexts, run_loadtest
+
+
+class Command(BaseCommand):
+    help = ('Benchmark API routes through the WSGI and ASGI applications with concurrent clients, '
+            'logged in as users of a dataset made by generate_dataset. '
+            'It reports throughput and latency percentiles, and fails on regressions from a baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=INTERFACES, action='append',
+                            help='Application to benchmark, may be repeated, default all')
+        parser.add_argument('--scenario', choices=list(SCENARIOS), action='append',
+                            help='Scenario to run, may be repeated, default all')
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent clients')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Number of measured requests of each client in each scenario')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Number of requests of each client before measuring each scenario')
+        parser.add_argument('--seed', type=int, default=DatasetSpec().seed, help='Seed of the dataset')
+        parser.add_argument('--password', default=DatasetSpec().password, help='Password of the dataset users')
+        parser.add_argument('--host', default='localhost', help='Host header of requests, must be allowed')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with results in this JSON file, e.g. of the main branch')
+        parser.add_argument('--max-latency-increase', type=float, default=0.25,
+                            help='Fail when a p95 latency is higher than the baseline by more than this fraction')
+        parser.add_argument('--max-throughput-decrease', type=float, default=0.2,
+                            help='Fail when a throughput is lower than the baseline by more than this fraction')
+        parser.add_argument('--max-errors', type=int, default=0, help='Fail when a scenario has more errors')
+
+    def handle(self, *args, **options):
+        for name in ('concurrency', 'requests'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name} must be a positive integer')
+        if options['warmup'] < 0:
+            raise CommandError('--warmup must not be negative')
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING('DEBUG is on, results are not representative of production.'))
+
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = load_results(options['baseline'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        interfaces = options['interface'] or list(INTERFACES)
+        scenarios = options['scenario'] or list(SCENARIOS)
+        try:
+            contexts = get_contexts(options['seed'], options['password'], options['concurrency'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        outcomes = run_loadtest(interfaces, scenarios, contexts, requests=options['requests'],
+                                warmup=options['warmup'], host=options['host'])
+        results = {name: summary for name, (summary, _) in outcomes.items()}
+
+        self.stdout.write(f'{"":24} {"requests":>8} {"errors":>6} {"req/s":>8} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for name, summary in results.items():
+            self.stdout.write(f'{name:24} {summary["requests"]:8} {summary["errors"]:6} {summary["throughput"]:8} '
+                              f'{summary["p50_ms"]:8} {summary["p95_ms"]:8} {summary["p99_ms"]:8}')
+
+        if options['output']:
+            meta = describe_run(
+                benchmark='http', concurrency=options['concurrency'], requests=options['requests'],
+                warmup=options['warmup'], seed=options['seed'],
+            )
+            save_results(options['output'], meta, results)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        failures = []
+        for name, (summary, errors) in outcomes.items():
+            if summary['errors'] > options['max_errors']:
+                failures.append(f'{name}: {summary["errors"]} errors, e.g. {errors[0]}')
+        if baseline is not None:
+            failures += find_regressions(baseline, results, {
+                'p95_ms': options['max_latency_increase'],
+                'throughput': options['max_throughput_decrease'],
+            })
+        if failures:
+            raise CommandError('Benchmark failed:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('No regression.' if baseline is not None else 'Done.'))
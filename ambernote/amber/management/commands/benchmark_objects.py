@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmark import describe_run, find_regressions, load_results, save_results
+from ...microbench import BENCHMARKS, DEFAULT_SIZES, run_microbenchmarks
+
+
+def _sizes(value: str) -> list[int]:
+    return [int(size) for size in value.split(',')]
+
+
+class Command(BaseCommand):
+    help = ('Microbenchmark per-object costs of serializers, payload validation and notespace permission checks '
+            'on in-memory fixtures, and fail on regressions from a baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', choices=list(BENCHMARKS), action='append',
+                            help='Benchmark to run, may be repeated, default all')
+        parser.add_argument('--sizes', type=_sizes, default=list(DEFAULT_SIZES),
+                            help='Comma-separated numbers of objects, default '
+                                 f'{",".join(str(size) for size in DEFAULT_SIZES)}')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs of each benchmark')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the fixtures')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with results in this JSON file, e.g. of the main branch')
+        parser.add_argument('--max-increase', type=float, default=0.25,
+                            help='Fail when a median time is higher than the baseline by more than this fraction')
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0:
+            raise CommandError('--repeat must be a positive integer')
+        if any(size <= 0 for size in options['sizes']):
+            raise CommandError('--sizes must be positive integers')
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING('DEBUG is on, results are not representative of production.'))
+
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = load_results(options['baseline'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        results = run_microbenchmarks(options['benchmark'] or list(BENCHMARKS), options['sizes'],
+                                      repeat=options['repeat'], seed=options['seed'])
+
+        self.stdout.write(f'{"":44} {"median ms":>10} {"min ms":>10} {"us/object":>10}')
+        for name, summary in results.items():
+            self.stdout.write(f'{name:44} {summary["median_ms"]:10} {summary["min_ms"]:10} '
+                              f'{summary["per_object_us"]:10}')
+
+        if options['output']:
+            meta = describe_run(benchmark='objects', repeat=options['repeat'], seed=options['seed'])
+            save_results(options['output'], meta, results)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = find_regressions(baseline, results, {'median_ms': options['max_increase']})
+            if regressions:
+                raise CommandError('Benchmark failed:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regression.' if baseline is not None else 'Done.'))
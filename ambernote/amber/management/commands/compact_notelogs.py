@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...retention import compact_notelogs
+
+
+class Command(BaseCommand):
+    help = ('Delete expired note logs and merge consecutive updates by the same user, '
+            'see NOTELOG_* settings for the policy.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of notes compacted per transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to sleep between transactions')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without changes')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be a positive integer')
+        if options['sleep'] < 0:
+            raise CommandError('--sleep must not be negative')
+
+        result = compact_notelogs(batch_size=options['batch_size'], sleep=options['sleep'],
+                                  dry_run=options['dry_run'])
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Deleted {result.deleted} logs, rewrote {result.rewritten} logs, '
+            f'reclaimed about {result.reclaimed_bytes} bytes.'
+        ))
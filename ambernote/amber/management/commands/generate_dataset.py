@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...dataset import DatasetSpec, generate_dataset, get_email
+
+
+class Command(BaseCommand):
+    help = ('Generate a reproducible synthetic dataset (users, notespaces, tags, notes and their logs) '
+            'for performance work. Do not run it against production databases.')
+
+    def add_arguments(self, parser):
+        default = DatasetSpec()
+        parser.add_argument('--users', type=int, default=default.users,
+                            help='Number of users, each with a personal notespace')
+        parser.add_argument('--team-notespaces', type=int, default=default.team_notespaces,
+                            help='Number of team notespaces')
+        parser.add_argument('--notes', type=int, default=default.notes, help='Number of notes')
+        parser.add_argument('--max-tags', type=int, default=default.max_tags, help='Maximum tags of a notespace')
+        parser.add_argument('--max-note-tags', type=int, default=default.max_note_tags,
+                            help='Maximum tags of a note')
+        parser.add_argument('--days', type=int, default=default.days, help='Days of history')
+        parser.add_argument('--until', type=datetime.fromisoformat,
+                            help='End of the history (ISO 8601), default now; set it for reproducible timestamps')
+        parser.add_argument('--seed', type=int, default=default.seed, help='Seed of the random generator')
+        parser.add_argument('--password', default=default.password, help='Password of every user')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of notes created per transaction')
+        parser.add_argument('--no-index', action='store_true',
+                            help='Do not index notes for search (run rebuild_search_index later)')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'batch_size'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name.replace("_", "-")} must be a positive integer')
+        for name in ('team_notespaces', 'notes', 'max_tags', 'max_note_tags', 'days'):
+            if options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} must not be negative')
+
+        until = options['until']
+        if until is not None and timezone.is_naive(until):
+            until = timezone.make_aware(until, timezone.utc)
+        spec = DatasetSpec(
+            users=options['users'], team_notespaces=options['team_notespaces'], notes=options['notes'],
+            max_tags=options['max_tags'], max_note_tags=options['max_note_tags'], days=options['days'],
+            until=until, seed=options['seed'], password=options['password'],
+        )
+        try:
+            result = generate_dataset(spec, batch_size=options['batch_size'], index=not options['no_index'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.users} users, {result.notespaces} notespaces, {result.members} members, '
+            f'{result.tags} tags, {result.notes} notes, {result.logs} logs and {result.terms} search terms. '
+            f'Users log in as {get_email(spec.seed, 0)} ... {get_email(spec.seed, spec.users - 1)}.'
+        ))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Note
+from ...trash import purge_trash
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete notes which have been in the trash for TRASH_RETENTION_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TRASH_RETENTION_DAYS,
+                            help='Delete notes moved to the trash more than DAYS days ago')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of notes deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to sleep between transactions')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be a positive integer')
+        if options['sleep'] < 0:
+            raise CommandError('--sleep must not be negative')
+
+        deleted = purge_trash(timedelta(days=options['days']), batch_size=options['batch_size'],
+                              sleep=options['sleep'])
+
+        for label, count in sorted(deleted.items()):
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted[Note._meta.label]} notes.'))
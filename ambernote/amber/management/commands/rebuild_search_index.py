@@ -0,0 +1,43 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ...models import Note, NoteSpace
+from ...search import index_notes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of notes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notespace', help='UUID of the notespace to rebuild, default all notespaces')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of notes indexed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be a positive integer')
+
+        notes = Note.objects.order_by('pk')
+        if options['notespace']:
+            try:
+                notespace = NoteSpace.objects.get(uuid=options['notespace'])
+            except (NoteSpace.DoesNotExist, ValidationError):
+                raise CommandError(f'Notespace {options["notespace"]} does not exist')
+            notes = notes.filter(notespace=notespace)
+
+        notes = notes.only('pk', 'notespace_id', 'title', 'is_deleted', 'body__content').select_related('body')
+
+        # walk notes by primary key, so that each batch is a cheap range scan
+        total_notes, total_terms, last_pk = 0, 0, 0
+        while True:
+            batch = list(notes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                total_terms += index_notes(batch)
+            total_notes += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Indexed {total_notes} notes ...')
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total_notes} notes with {total_terms} terms.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...compression import get_compressed_fields, recompress_field
+
+
+class Command(BaseCommand):
+    help = ('Compress large values of compressed JSON fields (e.g. note contents) written before compression '
+            'was enabled, or with another threshold, see JSON_COMPRESSION_THRESHOLD setting.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of rows rewritten per transaction')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to sleep between transactions')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be saved without changes')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be a positive integer')
+        if options['sleep'] < 0:
+            raise CommandError('--sleep must not be negative')
+
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        for field in get_compressed_fields():
+            result = recompress_field(field, batch_size=options['batch_size'], sleep=options['sleep'],
+                                      dry_run=options['dry_run'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{prefix}{field.model._meta.label}.{field.name}: scanned {result.scanned} rows, '
+                f'rewrote {result.rewritten} rows, saved about {result.saved_bytes} bytes '
+                f'({result.bytes_before} -> {result.bytes_after}).'
+            ))
@@ -0,0 +1,102 @@
+"""
+Resolve roles of users in note spaces for permission checks.
+
+Roles are memoized on the request, so that repeated checks of a request cost nothing.
+If a cache shared by all processes is configured (``NOTESPACE_ROLE_CACHE``, by default the cache of
+``CACHE_URL`` if it is set), they are also cached across requests under a version of the note space,
+which is bumped whenever a member of the note space is saved or deleted.
+A cache of each process (e.g. the default local memory cache) is never used:
+a version bumped by one worker would not invalidate the roles cached by the other workers.
+"""
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ambernote.metrics import CACHE_REQUESTS
+from .models import NoteSpaceMember
+
+# cached value of "not a member", None can not be told apart from a cache miss
+NOT_MEMBER = 0
+
+
+def _version_key(notespace_id: int) -> str:
+    return f'amber:notespace:{notespace_id}:roles-version'
+
+
+def _role_key(notespace_id: int, user_id: int, version: int) -> str:
+    return f'amber:notespace:{notespace_id}:role:{user_id}:{version}'
+
+
+def _get_cache():
+    """
+    Get the cache shared by all processes, None if there is none.
+    """
+    alias = settings.NOTESPACE_ROLE_CACHE
+    return caches[alias] if alias is not None else None
+
+
+def _get_version(cache, notespace_id: int) -> int:
+    version = cache.get(_version_key(notespace_id))
+    if version is None:
+        # start from a new version, so that roles cached before the version was evicted are not used
+        cache.add(_version_key(notespace_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(notespace_id))
+    return version
+
+
+def invalidate_roles(notespace_id: int) -> None:
+    """
+    Invalidate cached roles of all users in the note space.
+    """
+    cache = _get_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(_version_key(notespace_id))
+    except ValueError:  # the version is not in the cache
+        cache.set(_version_key(notespace_id), time.time_ns(), timeout=None)
+
+
+def get_role(request, notespace_id: int) -> Optional[int]:
+    """
+    Get the role of request.user in the note space.
+    :returns: NoteSpaceMember.Role, or None if the user is not a member of the note space
+    """
+    user = request.user
+    if not user or not user.is_authenticated:
+        return None
+
+    # memoized on the underlying HttpRequest, which is shared by all DRF Request wrappers
+    memo = getattr(request, '_request', request).__dict__.setdefault('_notespace_roles', {})
+    if notespace_id in memo:
+        CACHE_REQUESTS.inc(('notespace_role', 'memo'))
+        return memo[notespace_id]
+
+    cache = _get_cache()
+    role = version = None
+    if cache is not None:
+        version = _get_version(cache, notespace_id)
+        role = cache.get(_role_key(notespace_id, user.pk, version))
+    CACHE_REQUESTS.inc(('notespace_role', 'hit' if role is not None else 'miss'))
+    if role is None:
+        role = NoteSpaceMember.objects.filter(notespace_id=notespace_id, user=user) \
+                   .values_list('role', flat=True).first() or NOT_MEMBER
+        # do not share what is read in a transaction, it may be rolled back
+        if cache is not None and not transaction.get_connection().in_atomic_block:
+            cache.set(_role_key(notespace_id, user.pk, version), role, timeout=settings.NOTESPACE_ROLE_CACHE_TIMEOUT)
+
+    memo[notespace_id] = role if role != NOT_MEMBER else None
+    return memo[notespace_id]
+
+
+@receiver(post_save, sender=NoteSpaceMember)
+@receiver(post_delete, sender=NoteSpaceMember)
+def on_member_changed(sender, instance: NoteSpaceMember, **kwargs):
+    invalidate_roles(instance.notespace_id)
+    # in case the change is not committed yet, and a role is cached before it is committed
+    transaction.on_commit(lambda: invalidate_roles(instance.notespace_id))
@@ -0,0 +1,222 @@
+"""
+Microbenchmarks of the per-object costs of the API, run by the ``benchmark_objects`` command:
+serializing notes, members and tags, validating note and member payloads, and checking notespace permissions.
+
+Fixtures are built in memory (unsaved instances with their related objects and prefetched tags in place),
+from a seeded random generator, so that the benchmarks measure Python code rather than the database,
+and two runs on the same commit serialize the same objects.
+Validating a note creation looks up its notespace, so it is the only benchmark reading the database,
+a notespace which is rolled back afterwards.
+
+Each benchmark is run once to warm up, then timed ``repeat`` times with the garbage collector disabled
+(as ``timeit`` does), and the median is kept: it is less sensitive to noise than the mean.
+"""
+import gc
+import random
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from time import perf_counter
+from typing import Callable, NamedTuple
+from uuid import UUID
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+from .models import Note, NoteBody, NoteSpace, NoteSpaceMember, Tag
+from .permissions import IsNoteSpaceGuest, IsNoteSpaceMember, IsNoteSpaceOwner
+from .views.member import MemberRetrieveSerializer, MemberUpdateSerializer
+from .views.note import EmbeddedTagSerializer, NoteCreateSerializer, NoteRetrieveSerializer, NoteUpdateSerializer
+
+UserModel = get_user_model()
+
+DEFAULT_SIZES = (1000, 10000)
+NOTESPACES = 10
+TAGS = 50
+# created_at of every fixture, fixed for reproducible representations
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class Fixtures(NamedTuple):
+    user: object
+    notespaces: list[NoteSpace]
+    tags: list[Tag]
+    notes: list[Note]
+    members: list[NoteSpaceMember]
+
+
+def _uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+def _doc(rng: random.Random) -> dict:
+    # about 1 KB, the median size of note contents
+    return {'type': 'doc', 'content': [
+        {'type': 'paragraph', 'content': [{'type': 'text', 'text': ' '.join(
+            rng.choice(('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'note', 'amber', 'tag')) for _ in range(30)
+        )}]}
+        for _ in range(5)
+    ]}
+
+
+def _prefetch(instance, name: str, objs: list) -> None:
+    """
+    Put related objects in place, as prefetch_related() does.
+    """
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = objs
+    queryset._prefetch_done = True
+    instance._prefetched_objects_cache = {name: queryset}
+
+
+def build_fixtures(count: int, seed: int = 0) -> Fixtures:
+    """
+    Build count notes and count members, with their notespaces, tags and users, without the database.
+    """
+    rng = random.Random(seed)
+    user = UserModel(pk=1, uuid=_uuid(rng), email='benchmark@example.com', fullname='Benchmark')
+    notespaces = [
+        NoteSpace(pk=index + 1, uuid=_uuid(rng), type=NoteSpace.Type.TEAM, name=f'notespace {index}',
+                  created_at=EPOCH, updated_at=EPOCH)
+        for index in range(NOTESPACES)
+    ]
+    tags = [
+        Tag(pk=index + 1, uuid=_uuid(rng), notespace=notespaces[index % NOTESPACES], name=f'tag {index}',
+            created_at=EPOCH, updated_at=EPOCH)
+        for index in range(TAGS)
+    ]
+
+    notes = []
+    for index in range(count):
+        notespace = notespaces[index % NOTESPACES]
+        note = Note(pk=index + 1, uuid=_uuid(rng), notespace=notespace, title=f'note {index}',
+                    excerpt='lorem ipsum', word_count=150, revision=rng.randint(1, 20),
+                    is_pinned=rng.random() < 0.05, created_at=EPOCH, updated_at=EPOCH + timedelta(seconds=index))
+        note.body = NoteBody(note=note, content=_doc(rng))
+        _prefetch(note, 'tags', rng.sample(tags, rng.randint(0, 3)))
+        notes.append(note)
+
+    members = [
+        NoteSpaceMember(pk=index + 1, notespace=notespaces[index % NOTESPACES],
+                        user=UserModel(pk=index + 2, uuid=_uuid(rng)), role=rng.choice(NoteSpaceMember.Role.values),
+                        created_at=EPOCH, updated_at=EPOCH)
+        for index in range(count)
+    ]
+    return Fixtures(user, notespaces, tags, notes, members)
+
+
+def _permission_request(fixtures: Fixtures, role: int) -> Request:
+    """
+    Request of the fixture user, whose roles are memoized as after the first check of each notespace.
+    """
+    request = HttpRequest()
+    request.user = fixtures.user
+    request._notespace_roles = {notespace.pk: role for notespace in fixtures.notespaces}
+    drf_request = Request(request)
+    drf_request.user = fixtures.user
+    return drf_request
+
+
+def _check_permissions(permission_class, fixtures: Fixtures) -> Callable[[], object]:
+    permission = permission_class()
+    request = _permission_request(fixtures, NoteSpaceMember.Role.MEMBER)
+    notes = fixtures.notes
+
+    def run():
+        # as a view checks an object: the permission of the view, then the permission of the object
+        return [permission.has_permission(request, None) and permission.has_object_permission(request, None, note)
+                for note in notes]
+
+    return run
+
+
+def _validate(serializer_class, payloads: list[dict], **kwargs) -> Callable[[], object]:
+    def run():
+        results = [serializer_class(data=payload, **kwargs).is_valid() for payload in payloads]
+        if not all(results):  # an invalid payload would measure the error path instead
+            raise ValueError(f'A payload of {serializer_class.__name__} is not valid')
+        return results
+
+    return run
+
+
+def _serialize(serializer_class, instances: list, **kwargs) -> Callable[[], object]:
+    return lambda: serializer_class(instances, many=True, **kwargs).data
+
+
+# name => build the function to time from the fixtures, each processes as many objects as there are notes
+BENCHMARKS: dict[str, Callable[[Fixtures], Callable[[], object]]] = {
+    'serialize/note_retrieve': lambda fixtures: _serialize(NoteRetrieveSerializer, fixtures.notes, context={}),
+    'serialize/note_retrieve_collapsed': lambda fixtures: _serialize(
+        NoteRetrieveSerializer, fixtures.notes, context={'expand': set()}),
+    'serialize/member_retrieve': lambda fixtures: _serialize(MemberRetrieveSerializer, fixtures.members, context={}),
+    'serialize/embedded_tag': lambda fixtures: _serialize(
+        EmbeddedTagSerializer, [fixtures.tags[index % TAGS] for index in range(len(fixtures.notes))]),
+    'validate/note_create': lambda fixtures: _validate(NoteCreateSerializer, [
+        {'notespace': str(fixtures.notespaces[0].uuid), 'title': note.title, 'content': note.content}
+        for note in fixtures.notes
+    ]),
+    'validate/note_update': lambda fixtures: _validate(NoteUpdateSerializer, [
+        {'title': note.title, 'content': note.content} for note in fixtures.notes
+    ], partial=True),
+    'validate/member_update': lambda fixtures: _validate(MemberUpdateSerializer, [
+        {'role': member.role} for member in fixtures.members
+    ]),
+    'permission/owner': lambda fixtures: _check_permissions(IsNoteSpaceOwner, fixtures),
+    'permission/member': lambda fixtures: _check_permissions(IsNoteSpaceMember, fixtures),
+    'permission/guest': lambda fixtures: _check_permissions(IsNoteSpaceGuest, fixtures),
+}
+
+# benchmarks reading the database, run in a transaction rolled back afterwards
+DATABASE_BENCHMARKS = {'validate/note_create'}
+
+
+def time_function(function: Callable[[], object], repeat: int) -> list[float]:
+    """
+    :returns: durations of the repeated calls, in seconds
+    """
+    function()  # warm up, e.g. caches of serializer fields
+    durations = []
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = perf_counter()
+            function()
+            durations.append(perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return durations
+
+
+def _run(name: str, fixtures: Fixtures, repeat: int) -> list[float]:
+    if name not in DATABASE_BENCHMARKS:
+        return time_function(BENCHMARKS[name](fixtures), repeat)
+    with transaction.atomic():
+        for notespace in fixtures.notespaces[:1]:
+            NoteSpace.objects.create(uuid=notespace.uuid, type=notespace.type, name=notespace.name)
+        durations = time_function(BENCHMARKS[name](fixtures), repeat)
+        transaction.set_rollback(True)
+    return durations
+
+
+def run_microbenchmarks(names: list[str], sizes: list[int], repeat: int = 5, seed: int = 0) -> dict[str, dict]:
+    """
+    :returns: "<name>[<size>]" => summary of the timings
+    """
+    results = {}
+    for size in sizes:
+        fixtures = build_fixtures(size, seed)
+        for name in names:
+            durations = sorted(_run(name, fixtures, repeat))
+            results[f'{name}[{size}]'] = {
+                'objects': size,
+                'repeat': repeat,
+                'median_ms': round(median(durations) * 1000, 3),
+                'min_ms': round(durations[0] * 1000, 3),
+                'per_object_us': round(median(durations) / size * 10 ** 6, 3),
+            }
+    return results
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.IntegerField()),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='amber.note')),
+                ('notespace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='amber.notespace')),
+            ],
+            options={
+                'verbose_name': 'note search term',
+                'verbose_name_plural': 'note search terms',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notesearchterm',
+            index=models.Index(fields=['notespace', 'term'], name='amber_notes_notespa_f446f2_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notesearchterm',
+            unique_together={('note', 'term')},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0002_notesearchterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_uuid', models.UUIDField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notespace', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_tombstones', to='amber.notespace')),
+            ],
+            options={
+                'verbose_name': 'note tombstone',
+                'verbose_name_plural': 'note tombstones',
+            },
+        ),
+    ]
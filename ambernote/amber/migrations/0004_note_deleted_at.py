@@ -0,0 +1,29 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:47
+
+from django.db import migrations, models
+
+
+def backfill_deleted_at(apps, schema_editor):
+    # notes in the trash have not been changed since they were moved to the trash (approximately)
+    Note = apps.get_model('amber', 'Note')
+    Note.objects.filter(is_deleted=True).update(deleted_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0003_notetombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['deleted_at'], name='amber_note_deleted_d0454d_idx'),
+        ),
+        migrations.RunPython(backfill_deleted_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-17 14:56
+
+from django.db import migrations, models
+
+from ambernote.amber.text import summarize
+
+
+def backfill_excerpt(apps, schema_editor):
+    Note = apps.get_model('amber', 'Note')
+    notes = []
+    for note in Note.objects.only('id', 'content').iterator(chunk_size=500):
+        note.excerpt, note.word_count = summarize(note.content)
+        notes.append(note)
+        if len(notes) >= 500:
+            Note.objects.bulk_update(notes, ['excerpt', 'word_count'])
+            notes = []
+    Note.objects.bulk_update(notes, ['excerpt', 'word_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0004_note_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='word_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_excerpt, migrations.RunPython.noop),
+    ]
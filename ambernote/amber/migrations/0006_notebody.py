@@ -0,0 +1,58 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def move_content(apps, schema_editor):
+    # copy contents of notes into their bodies, BATCH_SIZE notes at a time
+    Note = apps.get_model('amber', 'Note')
+    NoteBody = apps.get_model('amber', 'NoteBody')
+    last_id = 0
+    while True:
+        rows = list(Note.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:BATCH_SIZE])
+        if not rows:
+            break
+        NoteBody.objects.bulk_create([NoteBody(note_id=note_id, content=content) for note_id, content in rows])
+        last_id = rows[-1][0]
+
+
+def move_content_back(apps, schema_editor):
+    Note = apps.get_model('amber', 'Note')
+    NoteBody = apps.get_model('amber', 'NoteBody')
+    for body in NoteBody.objects.iterator(chunk_size=BATCH_SIZE):
+        Note.objects.filter(id=body.note_id).update(content=body.content)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0005_note_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteBody',
+            fields=[
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='amber.note')),
+                ('content', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'note body',
+                'verbose_name_plural': 'note bodies',
+            },
+        ),
+        # with a default, the column can be added back (then filled from the bodies) to a table with rows
+        migrations.AlterField(
+            model_name='note',
+            name='content',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(move_content, move_content_back),
+        migrations.RemoveField(
+            model_name='note',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:06
+
+import ambernote.amber.compression
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0006_notebody'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notebody',
+            name='content',
+            field=ambernote.amber.compression.CompressedJSONField(),
+        ),
+        migrations.AlterField(
+            model_name='notelog',
+            name='extras',
+            field=ambernote.amber.compression.CompressedJSONField(blank=True, default=dict),
+        ),
+    ]
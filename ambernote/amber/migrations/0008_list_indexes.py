@@ -0,0 +1,37 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0007_compressed_json'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['notespace', 'created_at', 'id'], name='amber_note_notespa_5af3f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notelog',
+            index=models.Index(fields=['note', 'created_at', 'id'], name='amber_notel_note_id_5eb6d2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notespace',
+            index=models.Index(fields=['created_at', 'id'], name='amber_notes_created_4eba98_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notespacemember',
+            index=models.Index(fields=['notespace', 'created_at', 'id'], name='amber_notes_notespa_6959ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notetombstone',
+            index=models.Index(fields=['notespace', 'id'], name='amber_notet_notespa_032c16_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['notespace', 'created_at', 'id'], name='amber_tag_notespa_7684e0_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:09
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_notespace(apps, schema_editor):
+    Note = apps.get_model('amber', 'Note')
+    NoteLog = apps.get_model('amber', 'NoteLog')
+    notespace = Subquery(Note.objects.filter(pk=OuterRef('note_id')).values('notespace_id')[:1])
+    last_id = NoteLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    # in ranges of ids, so that each statement updates a bounded number of rows
+    for start in range(0, last_id, 10000):
+        NoteLog.objects.filter(id__gt=start, id__lte=start + 10000).update(notespace_id=notespace)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('amber', '0008_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notelog',
+            name='notespace',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='note_logs', to='amber.notespace'),
+        ),
+        migrations.RunPython(backfill_notespace, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-17 15:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # apart from the backfill, as PostgreSQL can not alter a table with pending (deferred) foreign key checks
+
+    dependencies = [
+        ('amber', '0009_notelog_notespace'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notelog',
+            name='notespace',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='note_logs', to='amber.notespace'),
+        ),
+        migrations.AddIndex(
+            model_name='notelog',
+            index=models.Index(fields=['notespace', 'created_at', 'id'], name='amber_notel_notespa_9be38c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notelog',
+            index=models.Index(fields=['notespace', 'user', 'created_at', 'id'], name='amber_notel_notespa_fe4827_idx'),
+        ),
+    ]
@@ -1,10 +1,14 @@
 import logging
+from typing import Optional
 from uuid import uuid4
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
+from .compression import CompressedJSONField
+from .text import EXCERPT_LENGTH, summarize
+
 UserModel = get_user_model()
 
 logger = logging.getLogger(__name__)
@@ -19,6 +23,8 @@ class NoteSpace(models.Model):
 
         indexes = [
             models.Index(fields=['type']),
+            # list (ordered by -created_at, -id)
+            models.Index(fields=['created_at', 'id']),
         ]
 
     class Type(models.IntegerChoices):
@@ -48,6 +54,8 @@ class NoteSpaceMember(models.Model):
         unique_together = ('notespace', 'user')
         indexes = [
             models.Index(fields=['role']),
+            # list of a notespace (ordered by -created_at, -id)
+            models.Index(fields=['notespace', 'created_at', 'id']),
         ]
 
     class Role(models.IntegerChoices):
@@ -74,6 +82,10 @@ class Tag(models.Model):
         verbose_name_plural = _('tags')
 
         unique_together = ('notespace', 'name')
+        indexes = [
+            # list of a notespace (ordered by -created_at, -id)
+            models.Index(fields=['notespace', 'created_at', 'id']),
+        ]
 
     uuid = models.UUIDField(unique=True, editable=False, default=uuid4)
     notespace = models.ForeignKey(NoteSpace, on_delete=models.CASCADE, related_name='tags')
@@ -86,6 +98,10 @@ class Tag(models.Model):
         return self.name
 
 
+# fields of a note, changing which increments the revision
+CONTENTS_FIELDS = ('title', 'content')
+
+
 class Note(models.Model):
     """Note model"""
 
@@ -93,9 +109,18 @@ class Note(models.Model):
         verbose_name = _('note')
         verbose_name_plural = _('notes')
 
+        indexes = [
+            models.Index(fields=['deleted_at']),
+            # list of a notespace (ordered by -created_at, -id)
+            models.Index(fields=['notespace', 'created_at', 'id']),
+        ]
+
     uuid = models.UUIDField(unique=True, editable=False, default=uuid4)
     title = models.CharField(max_length=255, blank=True)
-    content = models.JSONField()
+    # The content is stored in NoteBody (see the `content` property)
+    # Summary of the content for lists, updated when the content is saved
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='')
+    word_count = models.IntegerField(default=0)
 
     # Incremented when the note's "contents" is changed (title and content)
     # May be used to detect conflicts
@@ -104,6 +129,8 @@ class Note(models.Model):
     is_archived = models.BooleanField(default=False)
     is_pinned = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)  # In the trash, not deleted permanently
+    # When the note is moved to the trash, it is deleted permanently after TRASH_RETENTION_DAYS
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     notespace = models.ForeignKey(NoteSpace, on_delete=models.CASCADE, related_name='notes')
     tags = models.ManyToManyField(Tag, related_name='notes')
@@ -117,19 +144,159 @@ class Note(models.Model):
         else:
             return f'Untitled ({self.uuid})'
 
+    @property
+    def content(self):
+        """
+        Content of the note, loaded from its body on first access
+        (or joined by `select_related('body')`).
+        """
+        try:
+            return self.body.content
+        except NoteBody.DoesNotExist:  # a new note
+            return None
+
+    @content.setter
+    def content(self, value):
+        if self._has_body():
+            self.body.content = value
+        else:  # the current body is not loaded to be replaced
+            self.body = NoteBody(content=value)
+
+    def _has_body(self) -> bool:
+        # a body is loaded or assigned, a new note caches None once its missing body is read
+        return Note.body.related.get_cached_value(self, default=None) is not None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_contents()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        self._remember_contents()
+
+    def _remember_contents(self):
+        # title as loaded from (or saved to) the database, the content is remembered by the body
+        if 'title' in self.__dict__:
+            self.__dict__['_loaded_title'] = self.title
+
+    def mark_contents_saved(self):
+        """
+        Mark the current title and content as saved, after they are saved without `save()`, e.g. by `update()`.
+        """
+        self._remember_contents()
+        if Note.body.is_cached(self):
+            self.body._remember_content()
+
+    def get_changed_contents(self, fields=CONTENTS_FIELDS) -> list[str]:
+        """
+        Get names of contents fields changed since the note was loaded from the database.
+        The database is only queried for fields whose loaded values are not known,
+        e.g. the instance is not loaded from the database.
+        """
+        changed, unknown = [], []
+        if 'title' in fields and 'title' in self.__dict__:  # otherwise neither loaded nor assigned
+            if '_loaded_title' not in self.__dict__:
+                unknown.append('title')
+            elif self.__dict__['_loaded_title'] != self.title:
+                changed.append('title')
+        if 'content' in fields and Note.body.is_cached(self):  # otherwise neither loaded nor assigned
+            content_changed = self.body.is_content_changed()
+            if content_changed is None:
+                unknown.append('content')
+            elif content_changed:
+                changed.append('content')
+
+        if unknown:
+            lookups = {'title': 'title', 'content': 'body__content'}
+            original = Note.objects.filter(pk=self.pk).values(*(lookups[field] for field in unknown)).first()
+            if original is not None:
+                changed += [field for field in unknown if original[lookups[field]] != getattr(self, field)]
+        return changed
+
+    def update_summary(self):
+        """
+        Update the excerpt and word count from the content.
+        """
+        self.excerpt, self.word_count = summarize(self.content)
+
     def save(self, *args, **kwargs):
         # increment revision if title or content is changed
-        rev_increment = False
+        adding = self._state.adding
+        changed = []
         if self.pk:  # if the note already exists
-            original = Note.objects.get(pk=self.pk)
-            if original.title != self.title or original.content != self.content:
-                rev_increment = True
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                changed = self.get_changed_contents()
+            else:
+                changed = self.get_changed_contents([field for field in CONTENTS_FIELDS if field in update_fields])
+                # the content is not a column of the note
+                kwargs['update_fields'] = set(update_fields) - {'content'}
+                if changed:
+                    kwargs['update_fields'] |= {'revision', 'updated_at'}
+                if 'content' in changed:
+                    kwargs['update_fields'] |= {'excerpt', 'word_count'}
+            if changed:
                 self.revision += 1
+        if adding and not self._has_body():
+            # e.g. a note added in django-admin, which has no content field
+            self.body = NoteBody(content={})
+        if adding or 'content' in changed:
+            self.update_summary()
+
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if adding or 'content' in changed:
+                self.body.save(force_insert=adding)
+        self._remember_contents()
+
+        if changed:
+            logger.debug(f'Note {self.uuid} revision incremented to {self.revision}')
 
-        super().save(*args, **kwargs)
 
-        if rev_increment:
-            logger.debug(f'Note {self.uuid} revision incremented to {self.revision}')
+class NoteBody(models.Model):
+    """
+    Content of a note, stored apart from the note,
+    so that lists and scans over the (small, frequently filtered) notes never read it.
+    """
+
+    class Meta:
+        verbose_name = _('note body')
+        verbose_name_plural = _('note bodies')
+
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    content = CompressedJSONField()
+
+    def __str__(self):
+        return str(self.note_id)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_content()
+        return instance
+
+    def _remember_content(self):
+        # keep a reference to the loaded content, nothing is computed until it is compared on save.
+        # Contents are replaced rather than modified in place (e.g. patches are applied to a copy),
+        # a content modified in place is not detected.
+        if 'content' in self.__dict__:
+            self.__dict__['_loaded_content'] = self.content
+
+    def is_content_changed(self) -> Optional[bool]:
+        """
+        Check if the content is changed since it was loaded from the database.
+        :returns: None if it is not known, e.g. the body is not loaded from the database
+        """
+        if self._state.adding or '_loaded_content' not in self.__dict__:
+            return None
+        loaded = self.__dict__['_loaded_content']
+        return self.content is not loaded and self.content != loaded
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_content()
 
 
 class NoteLog(models.Model):
@@ -141,6 +308,11 @@ class NoteLog(models.Model):
 
         indexes = [
             models.Index(fields=['action']),
+            # list of a note (ordered by -created_at, -id), and expired logs of each note
+            models.Index(fields=['note', 'created_at', 'id']),
+            # activity of a notespace, of all users or of a user (ordered by -created_at, -id)
+            models.Index(fields=['notespace', 'created_at', 'id']),
+            models.Index(fields=['notespace', 'user', 'created_at', 'id']),
         ]
 
     class Action(models.IntegerChoices):
@@ -158,10 +330,64 @@ class NoteLog(models.Model):
     uuid = models.UUIDField(unique=True, editable=False, default=uuid4)
     user = models.ForeignKey(UserModel, on_delete=models.CASCADE, related_name='note_logs')
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='logs')
+    # notespace of the note, so that the activity of a notespace is listed without joining its notes
+    notespace = models.ForeignKey(NoteSpace, on_delete=models.CASCADE, related_name='note_logs')
     action = models.IntegerField(choices=Action.choices)
-    extras = models.JSONField(blank=True, default=dict)
+    extras = CompressedJSONField(blank=True, default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.action} ({self.note})'
+
+    def save(self, *args, **kwargs):
+        if self.notespace_id is None and self.note_id is not None:
+            self.notespace_id = self.note.notespace_id
+        super().save(*args, **kwargs)
+
+
+class NoteSearchTerm(models.Model):
+    """
+    Inverted index entry for note full-text search,
+    one row for each distinct term in a note's title and content.
+    """
+
+    class Meta:
+        verbose_name = _('note search term')
+        verbose_name_plural = _('note search terms')
+
+        unique_together = ('note', 'term')
+        indexes = [
+            models.Index(fields=['notespace', 'term']),
+        ]
+
+    notespace = models.ForeignKey(NoteSpace, on_delete=models.CASCADE, related_name='+')
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    # Term frequency, occurrences in title are weighted higher than in content
+    weight = models.IntegerField()
+
+    def __str__(self):
+        return f'{self.term} ({self.note})'
+
+
+class NoteTombstone(models.Model):
+    """
+    Record of a permanently deleted note, so that sync clients can drop their local copy.
+    """
+
+    class Meta:
+        verbose_name = _('note tombstone')
+        verbose_name_plural = _('note tombstones')
+
+        indexes = [
+            # tombstones of a notespace since a sync token
+            models.Index(fields=['notespace', 'id']),
+        ]
+
+    notespace = models.ForeignKey(NoteSpace, on_delete=models.CASCADE, related_name='note_tombstones')
+    note_uuid = models.UUIDField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Deleted ({self.note_uuid})'
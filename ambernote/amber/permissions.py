@@ -2,55 +2,47 @@ from typing import Optional
 
 from rest_framework.permissions import IsAuthenticated
 
+from .membership import get_role
 from .models import NoteSpace, NoteSpaceMember
 
 
 class NoteSpaceMemberPermissionMixin:
-    def get_member(self, user, obj) -> Optional[NoteSpaceMember]:
+    def get_role(self, request, obj) -> Optional[int]:
         """
-        Get note space member object for request.user and obj related note space.
+        Get the role of request.user in obj related note space.
+        :returns: NoteSpaceMember.Role, or None if the user is not a member
         """
         if isinstance(obj, NoteSpace):
-            space = obj
-        elif hasattr(obj, 'notespace'):
-            if not isinstance(obj.notespace, NoteSpace):
-                return None
-            space = obj.notespace
+            notespace_id = obj.pk
         else:
+            # use the foreign key, so that the note space is not loaded
+            notespace_id = getattr(obj, 'notespace_id', None)
+        if notespace_id is None:
             return None
-
-        member = NoteSpaceMember.objects.filter(notespace=space, user=user).first()
-        return member
+        return get_role(request, notespace_id)
 
 
 class IsNoteSpaceOwner(NoteSpaceMemberPermissionMixin, IsAuthenticated):
     """ Allows access only to note space owners. """
 
     def has_object_permission(self, request, view, obj):
-        member = self.get_member(request.user, obj)
-        if member is None:
-            return False
-        return member.role == NoteSpaceMember.Role.OWNER
+        return self.get_role(request, obj) == NoteSpaceMember.Role.OWNER
 
 
 class IsNoteSpaceMember(NoteSpaceMemberPermissionMixin, IsAuthenticated):
     """ Allows access only to note space members. """
 
     def has_object_permission(self, request, view, obj):
-        member = self.get_member(request.user, obj)
-        if member is None:
-            return False
-        return member.role in (NoteSpaceMember.Role.OWNER, NoteSpaceMember.Role.MEMBER)
+        return self.get_role(request, obj) in (NoteSpaceMember.Role.OWNER, NoteSpaceMember.Role.MEMBER)
 
 
 class IsNoteSpaceGuest(NoteSpaceMemberPermissionMixin, IsAuthenticated):
     """ Allows access only to note space guests. """
 
     def has_object_permission(self, request, view, obj):
-        member = self.get_member(request.user, obj)
-        if member is None:
-            return False
-        return member.role in (NoteSpaceMember.Role.OWNER, NoteSpaceMember.Role.MEMBER, NoteSpaceMember.Role.GUEST)
+        return self.get_role(request, obj) in (
+            NoteSpaceMember.Role.OWNER, NoteSpaceMember.Role.MEMBER, NoteSpaceMember.Role.GUEST,
+        )
 
 
 class IsAdminUserOrSelf(IsAuthenticated):
@@ -0,0 +1,271 @@
+"""
+Retention and compaction of note logs.
+
+Logs older than the retention of their action are deleted, and runs of consecutive UPDATED logs
+by the same user (e.g. autosaves of an editing session) are merged into the last log of the run.
+The latest log of a note is always kept, so that the note is still returned by the initial sync,
+and retained UPDATED logs are re-encoded against the previous retained version,
+so that every retained version can still be rebuilt (see :mod:`.history`).
+
+Only notes with a log to expire or a run to merge are selected, so compacted notes are not read again,
+and the logs of a selected note are loaded from the nearest snapshot before its first log to delete:
+the older history is left as it is, and the cost of a run depends on the logs to compact rather than
+on the size of the history.
+
+It is run by the ``compact_notelogs`` command, and :func:`compact_notelogs` may be called
+by any scheduler as well.
+"""
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .history import SNAPSHOT_INTERVAL, NoteVersion, apply_log, encode_update, get_snapshot
+from .models import Note, NoteLog
+
+logger = logging.getLogger(__name__)
+
+CONTENT_ACTIONS = (NoteLog.Action.CREATED, NoteLog.Action.UPDATED)
+
+# rows in each DELETE / UPDATE statement
+DELETE_BATCH_SIZE = 1000
+UPDATE_BATCH_SIZE = 100
+
+
+class CompactionPolicy(NamedTuple):
+    # action => logs created before it are deleted
+    expire_before: dict[int, datetime]
+    # consecutive UPDATED logs created before it are merged
+    merge_before: datetime
+    # maximum time span of a merged run
+    merge_window: timedelta
+
+    @classmethod
+    def from_settings(cls) -> 'CompactionPolicy':
+        now = timezone.now()
+        retention = settings.NOTELOG_RETENTION_DAYS
+        return cls(
+            expire_before={
+                action.value: now - timedelta(days=retention[action.name])
+                for action in NoteLog.Action
+                if retention.get(action.name) is not None
+            },
+            merge_before=now - timedelta(hours=settings.NOTELOG_MERGE_AFTER_HOURS),
+            merge_window=timedelta(minutes=settings.NOTELOG_MERGE_WINDOW_MINUTES),
+        )
+
+
+class CompactionResult(NamedTuple):
+    deleted: int = 0  # number of deleted logs
+    rewritten: int = 0  # number of re-encoded logs
+    reclaimed_bytes: int = 0  # estimated size of reclaimed extras
+
+    def __add__(self, other):
+        return CompactionResult(*(a + b for a, b in zip(self, other)))
+
+
+def _size(extras: dict) -> int:
+    return len(json.dumps(extras, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def _select_deleted(logs: list[NoteLog], policy: CompactionPolicy) -> set[int]:
+    """
+    Select logs (ordered by id) of a note to delete.
+    """
+    deleted = set()
+    for log in logs[:-1]:  # the latest log is always kept
+        expire_before = policy.expire_before.get(log.action)
+        if expire_before is not None and log.created_at < expire_before:
+            deleted.add(log.id)
+
+    # merge runs of UPDATED logs by the same user, only the last log of a run is kept
+    run_start = None
+    for prev, log in zip(logs, logs[1:]):
+        if (prev.action == log.action == NoteLog.Action.UPDATED and prev.user_id == log.user_id
+                and log.created_at < policy.merge_before
+                and log.created_at - (run_start or prev).created_at <= policy.merge_window):
+            run_start = run_start or prev
+            deleted.add(prev.id)
+        else:
+            run_start = None
+    return deleted
+
+
+def compact_note(logs: list[NoteLog], policy: CompactionPolicy) -> tuple[set[int], list[NoteLog]]:
+    """
+    Compact logs (ordered by id) of a note.
+    :returns: (ids of logs to delete, logs with re-encoded extras to save)
+    """
+    deleted = _select_deleted(logs, policy)
+    if not deleted:
+        return deleted, []
+
+    # rebuild every version of the note
+    versions: dict[int, Optional[NoteVersion]] = {}
+    version = None
+    for log in logs:
+        if log.action in CONTENT_ACTIONS:
+            version = apply_log(version, log)
+            versions[log.id] = version
+
+    if any(version is None for version in versions.values()):
+        # history is incomplete (e.g. logs written before content was logged), keep content logs as they are
+        return {pk for pk in deleted if pk not in versions}, []
+
+    # re-encode retained content logs whose previous content log is deleted
+    rewritten = []
+    previous, previous_deleted, chain = None, False, 0
+    for log in logs:
+        if log.action not in CONTENT_ACTIONS:
+            continue
+        if log.id in deleted:
+            previous_deleted = True
+            continue
+
+        version = versions[log.id]
+        if previous_deleted:  # it must be an UPDATED log, CREATED log is the first one
+            log.extras = encode_update(previous, version, force_snapshot=chain + 1 >= SNAPSHOT_INTERVAL)
+            rewritten.append(log)
+        chain = 0 if get_snapshot(log) is not None else chain + 1
+        previous, previous_deleted = version, False
+
+    return deleted, rewritten
+
+
+def _expired_candidates(policy: CompactionPolicy):
+    """
+    Logs to expire, but the latest log of each note.
+    """
+    if not policy.expire_before:
+        return NoteLog.objects.none()
+    expired = Q()
+    for action, expire_before in policy.expire_before.items():
+        expired |= Q(action=action, created_at__lt=expire_before)
+    later = NoteLog.objects.filter(note_id=OuterRef('note_id'), id__gt=OuterRef('id'))
+    return NoteLog.objects.filter(expired).filter(Exists(later))
+
+
+def _merged_candidates(policy: CompactionPolicy):
+    """
+    UPDATED logs merged into the next log, which is an UPDATED log by the same user within the window.
+    A log may be kept when its run is longer than the window, it is merged by a next run then.
+    """
+    following = NoteLog.objects.filter(note_id=OuterRef('note_id'), id__gt=OuterRef('id')).order_by('id')
+    return (
+        NoteLog.objects
+        .filter(action=NoteLog.Action.UPDATED, created_at__lt=policy.merge_before)
+        .annotate(
+            next_action=Subquery(following.values('action')[:1]),
+            next_user_id=Subquery(following.values('user_id')[:1]),
+            next_created_at=Subquery(following.values('created_at')[:1]),
+        )
+        .filter(
+            next_action=NoteLog.Action.UPDATED,
+            next_user_id=F('user_id'),
+            next_created_at__lt=policy.merge_before,
+            next_created_at__lte=F('created_at') + policy.merge_window,
+        )
+    )
+
+
+def _select_notes(policy: CompactionPolicy, last_note_id: int, batch_size: int) -> dict[int, int]:
+    """
+    Select the next notes (by primary key) which have logs to compact.
+    :returns: note id => id of its first log to delete
+    """
+    first_ids: dict[int, int] = {}
+    max_note_id = None
+    for candidates in (_expired_candidates(policy), _merged_candidates(policy)):
+        rows = list(
+            candidates
+            .filter(note_id__gt=last_note_id)
+            .values('note_id')
+            .annotate(first_id=Min('id'))
+            .order_by('note_id')
+            .values_list('note_id', 'first_id')[:batch_size]
+        )
+        for note_id, first_id in rows:
+            first_ids[note_id] = min(first_ids.get(note_id, first_id), first_id)
+        if len(rows) == batch_size:  # notes after it may have candidates of this kind as well
+            max_note_id = rows[-1][0] if max_note_id is None else min(max_note_id, rows[-1][0])
+    return {
+        note_id: first_id for note_id, first_id in sorted(first_ids.items())
+        if max_note_id is None or note_id <= max_note_id
+    }
+
+
+def _window_start(note_id: int, first_id: int) -> int:
+    """
+    Get the id of the nearest snapshot before the first log to delete of the note,
+    the logs before it are neither changed nor needed to rebuild the versions after it.
+    :returns: 0 if there is no snapshot nearby, to load the whole history
+    """
+    previous = (
+        NoteLog.objects
+        .filter(note_id=note_id, id__lt=first_id, action__in=CONTENT_ACTIONS)
+        .only('id', 'action', 'extras')
+        .order_by('-id')[:SNAPSHOT_INTERVAL]
+    )
+    for log in previous:
+        if get_snapshot(log) is not None:
+            return log.id
+    return 0
+
+
+def compact_notelogs(policy: Optional[CompactionPolicy] = None, batch_size: int = 100, sleep: float = 0,
+                     dry_run: bool = False) -> CompactionResult:
+    """
+    Compact logs of all notes, `batch_size` notes in each transaction.
+    Sleep `sleep` seconds between transactions to leave room for other queries.
+    """
+    policy = policy or CompactionPolicy.from_settings()
+
+    result = CompactionResult()
+    last_note_id = 0
+    while True:
+        first_ids = _select_notes(policy, last_note_id, batch_size)
+        if not first_ids:
+            break
+        last_note_id = max(first_ids)
+
+        with transaction.atomic():
+            # lock the notes, so that no log is added while compacting
+            list(Note.objects.filter(id__in=first_ids).select_for_update().values_list('id'))
+            windows = Q()
+            for note_id, first_id in first_ids.items():
+                windows |= Q(note_id=note_id, id__gte=_window_start(note_id, first_id))
+            logs = NoteLog.objects.filter(windows).order_by('note_id', 'id') \
+                .only('id', 'note_id', 'user_id', 'action', 'extras', 'created_at')
+
+            by_note: dict[int, list[NoteLog]] = {}
+            for log in logs:
+                by_note.setdefault(log.note_id, []).append(log)
+
+            deleted, rewritten = set(), []
+            reclaimed = 0
+            for note_logs in by_note.values():
+                sizes = {log.id: _size(log.extras) for log in note_logs}
+                note_deleted, note_rewritten = compact_note(note_logs, policy)
+                deleted |= note_deleted
+                rewritten += note_rewritten
+                reclaimed += sum(sizes[pk] for pk in note_deleted)
+                reclaimed += sum(sizes[log.id] - _size(log.extras) for log in note_rewritten)
+
+            if not dry_run:
+                deleted_ids = sorted(deleted)
+                for i in range(0, len(deleted_ids), DELETE_BATCH_SIZE):
+                    NoteLog.objects.filter(id__in=deleted_ids[i:i + DELETE_BATCH_SIZE]).delete()
+                NoteLog.objects.bulk_update(rewritten, ['extras'], batch_size=UPDATE_BATCH_SIZE)
+
+        result += CompactionResult(len(deleted), len(rewritten), reclaimed)
+        logger.debug(f'Compacted logs of notes up to {last_note_id}: {result}')
+        if sleep:
+            time.sleep(sleep)
+
+    return result
@@ -0,0 +1,112 @@
+"""
+Full-text search over note titles and contents.
+
+Notes are indexed into an inverted index (see :class:`NoteSearchTerm`) which is
+maintained incrementally when a note is created, updated, trashed or restored,
+and can be rebuilt in bulk with the ``rebuild_search_index`` command.
+Only plain ORM queries are used, so it works the same on SQLite, MySQL and PostgreSQL.
+"""
+import re
+from collections import Counter
+from typing import Iterable, Iterator
+
+from django.db.models import Count, QuerySet, Sum
+
+from .models import Note, NoteSearchTerm, NoteSpace
+from .text import CJK_CHARS, extract_text
+
+# An occurrence in the title counts as many occurrences in the content
+TITLE_WEIGHT = 5
+
+MAX_TERM_LENGTH = NoteSearchTerm._meta.get_field('term').max_length
+
+# CJK text has no word separators, so runs of CJK characters are matched separately
+# and split into bigrams; other words are runs of letters and digits.
+_TOKEN_RE = re.compile(f'(?P<cjk>[{CJK_CHARS}]+)|(?P<word>[^\\W_{CJK_CHARS}]+)')
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """
+    Split text into normalized search terms.
+    """
+    for match in _TOKEN_RE.finditer(text.lower()):
+        if match.group('cjk'):
+            run = match.group('cjk')
+            if len(run) == 1:
+                yield run
+            for i in range(len(run) - 1):
+                yield run[i:i + 2]
+        else:
+            yield match.group('word')[:MAX_TERM_LENGTH]
+
+
+def build_terms(note: Note) -> list[NoteSearchTerm]:
+    """
+    Build (unsaved) search terms of the note.
+    """
+    weights: Counter[str] = Counter()
+    for term in tokenize(note.title):
+        weights[term] += TITLE_WEIGHT
+    for text in extract_text(note.content):
+        weights.update(tokenize(text))
+
+    return [
+        NoteSearchTerm(notespace_id=note.notespace_id, note_id=note.pk, term=term, weight=weight)
+        for term, weight in weights.items()
+    ]
+
+
+def index_notes(notes: Iterable[Note], batch_size: int = 1000) -> int:
+    """
+    (Re)index notes, trashed notes are removed from the index.
+    Should be called in a transaction.
+    :returns: number of terms created
+    """
+    notes = list(notes)
+    NoteSearchTerm.objects.filter(note__in=[note.pk for note in notes]).delete()
+    terms = [term for note in notes if not note.is_deleted for term in build_terms(note)]
+    NoteSearchTerm.objects.bulk_create(terms, batch_size=batch_size)
+    return len(terms)
+
+
+def index_note(note: Note) -> None:
+    """
+    (Re)index the note after it is created, updated or restored from trash.
+    Should be called in a transaction.
+    """
+    index_notes([note])
+
+
+def unindex_notes(note_ids: Iterable[int]) -> None:
+    """
+    Remove notes from the index, e.g. after they are moved to trash.
+    """
+    NoteSearchTerm.objects.filter(note__in=list(note_ids)).delete()
+
+
+def unindex_note(note: Note) -> None:
+    """
+    Remove the note from the index, e.g. after it is moved to trash.
+    """
+    unindex_notes([note.pk])
+
+
+def search_notes(notespace: NoteSpace, query: str) -> QuerySet:
+    """
+    Search notes in the notespace which contain all terms of the query.
+    :returns: queryset of dicts ``{'note_id': ..., 'score': ...}``, the best matches first
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return NoteSearchTerm.objects.none().values('note_id')
+
+    # ranking is computed on the index table alone, notes are only loaded for the requested page
+    return (
+        NoteSearchTerm.objects
+        .filter(notespace=notespace, term__in=terms)
+        .values('note_id')
+        .annotate(score=Sum('weight'), matched=Count('term'))
+        .filter(matched=len(terms))
+        .order_by('-score', '-note_id')
+        .values('note_id', 'score')
+    )
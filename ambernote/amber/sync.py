@@ -0,0 +1,116 @@
+"""
+Incremental (delta) sync of notes.
+
+Every change of a note made through the API is recorded as a :class:`NoteLog`,
+and every permanently deleted note leaves a :class:`NoteTombstone`.
+A sync token holds marks on the ids of both tables, so the changes since a token
+are found with range scans whose cost depends on the number of changes only.
+
+Ids are taken when rows are inserted, but rows are only visible when their transaction commits,
+so a row may become visible after a sync returned a higher id (on MySQL and PostgreSQL).
+To not skip it forever, the token also holds a "settled" mark: the last id created
+more than ``SYNC_SAFETY_WINDOW_SECONDS`` ago, whose transaction is assumed to be committed.
+The pages of a sync round move on from the last returned id, and the next round starts again from
+the settled mark, so rows of the last moments are returned again. Clients keep the note of the latest
+``revision`` and ``updated_at`` (or drop it if its tombstone is returned).
+Changes whose transaction commits more than the window after it inserted them may still be skipped.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Note, NoteLog, NoteSpace, NoteTombstone
+
+
+class SyncToken(NamedTuple):
+    # the last returned ids, pages of a sync round move on from them
+    last_log_id: int = 0
+    last_tombstone_id: int = 0
+    # ids up to which every row is assumed to be committed, a new round starts from them
+    settled_log_id: int = 0
+    settled_tombstone_id: int = 0
+
+
+class Changes(NamedTuple):
+    notes: list[Note]  # created or changed notes, in their current state
+    tombstones: list[NoteTombstone]  # permanently deleted notes
+    token: SyncToken  # token for the next sync
+    has_more: bool  # more changes are available with the next token
+
+
+def encode_token(token: SyncToken) -> str:
+    payload = json.dumps(list(token), separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_token(encoded: str) -> SyncToken:
+    """
+    :raises ValueError: if the token is malformed
+    """
+    try:
+        values = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+    except (TypeError, UnicodeError, json.JSONDecodeError):
+        raise ValueError('Invalid sync token')
+    if not isinstance(values, list) or len(values) not in (2, len(SyncToken._fields)) \
+            or not all(isinstance(value, int) and value >= 0 for value in values):
+        raise ValueError('Invalid sync token')
+    if len(values) == 2:  # a token without settled marks, issued before they were added
+        values += values
+    return SyncToken(*values)
+
+
+def _settled_id(queryset, cutoff, last_id: int, previous_id: int) -> int:
+    """
+    Get the last id created before the cutoff, but not after the last returned id.
+    """
+    settled_id = queryset.filter(id__lte=last_id, created_at__lt=cutoff).order_by('-id') \
+        .values_list('id', flat=True).first()
+    return max(previous_id, settled_id or 0)
+
+
+def get_changes(notespace: NoteSpace, token: SyncToken, limit: int) -> Changes:
+    """
+    Get at most `limit` changed notes and `limit` tombstones in the notespace since the token.
+    An empty token returns every note of the notespace.
+    """
+    # the latest log of each note changed since the token, oldest first
+    changed = list(
+        NoteLog.objects
+        .filter(notespace=notespace, id__gt=token.last_log_id)
+        .values('note_id')
+        .annotate(last_log_id=Max('id'))
+        .order_by('last_log_id')[:limit + 1]
+    )
+    tombstones = list(
+        NoteTombstone.objects
+        .filter(notespace=notespace, id__gt=token.last_tombstone_id)
+        .order_by('id')[:limit + 1]
+    )
+    has_more = len(changed) > limit or len(tombstones) > limit
+    changed, tombstones = changed[:limit], tombstones[:limit]
+
+    notes = Note.objects.select_related('notespace', 'body').prefetch_related('tags') \
+        .in_bulk([row['note_id'] for row in changed])
+    last_log_id = changed[-1]['last_log_id'] if changed else token.last_log_id
+    last_tombstone_id = tombstones[-1].id if tombstones else token.last_tombstone_id
+    if has_more:  # the next page of the round
+        next_token = token._replace(last_log_id=last_log_id, last_tombstone_id=last_tombstone_id)
+    else:  # the next round, from the settled marks
+        cutoff = timezone.now() - timedelta(seconds=settings.SYNC_SAFETY_WINDOW_SECONDS)
+        settled_log_id = _settled_id(NoteLog.objects.filter(notespace=notespace), cutoff,
+                                     last_log_id, token.settled_log_id)
+        settled_tombstone_id = _settled_id(NoteTombstone.objects.filter(notespace=notespace), cutoff,
+                                           last_tombstone_id, token.settled_tombstone_id)
+        next_token = SyncToken(settled_log_id, settled_tombstone_id, settled_log_id, settled_tombstone_id)
+    return Changes(
+        # a note may be deleted between the two queries, its tombstone will be returned next time
+        notes=[notes[row['note_id']] for row in changed if row['note_id'] in notes],
+        tombstones=tombstones,
+        token=next_token,
+        has_more=has_more,
+    )
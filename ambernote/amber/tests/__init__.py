@@ -1,5 +1,19 @@
+from .compression import CompressionTestCase
+from .dataset import DatasetTestCase
+from .fields import FieldsTestCase
+from .indexes import IndexUsageTestCase
+from .loadtest import LoadTestTestCase
 from .member import MemberTestCase
+from .membership import MembershipTestCase
+from .metrics import MetricsTestCase
+from .microbench import MicrobenchTestCase
 from .note import NoteTestCase
+from .notelog import NoteLogTestCase
 from .notespace import NoteSpaceTestCase
+from .pagination import PaginationTestCase
+from .queries import QueryBudgetTestCase
+from .search import SearchTestCase
+from .sync import SyncTestCase
 from .tag import TagTestCase
+from .timing import ServerTimingTestCase
 from .user import UserTestCase
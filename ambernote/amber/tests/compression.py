@@ -0,0 +1,96 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ambernote.amber.compression import FRAME_KEY, compress_json, decompress_json, is_frame
+from ambernote.amber.models import Note, NoteBody, NoteLog, NoteSpace
+from ambernote.authx.models import User
+
+
+def doc(*paragraphs):
+    return {'type': 'doc', 'content': [
+        {'type': 'paragraph', 'content': [{'type': 'text', 'text': text}]} for text in paragraphs
+    ]}
+
+
+def stored(queryset, field: str):
+    """
+    Get the value as stored in the database, without decompression.
+    """
+    return json.loads(queryset.values_list(Cast(field, TextField()), flat=True).get())
+
+
+@override_settings(JSON_COMPRESSION_THRESHOLD=1024)
+class CompressionTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_compress_json(self):
+        small = doc('hello')
+        self.assertIs(compress_json(small), small)
+
+        large = doc(*(f'paragraph {i}' for i in range(100)))
+        frame = compress_json(large)
+        self.assertTrue(is_frame(frame))
+        self.assertLess(len(json.dumps(frame)), len(json.dumps(large)) / 4)
+        self.assertEqual(decompress_json(frame), large)
+
+        # a value which looks like a frame is framed, so that it is read back as it is
+        lookalike = {FRAME_KEY: 'not compressed'}
+        self.assertTrue(is_frame(compress_json(lookalike)))
+        self.assertEqual(decompress_json(compress_json(lookalike)), lookalike)
+
+    def test_transparent(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        content = doc(*(f'paragraph {i}' for i in range(100)))
+        data = {'notespace': NoteSpace.objects.filter(pk=1).first().uuid, 'title': 'large', 'content': content}
+        response = self.client.post('/api/notes/', data=data, format='json')
+        self.assertEqual(response.status_code, 201)
+        note = Note.objects.order_by('-id').first()
+
+        # stored compressed, read as it is
+        self.assertTrue(is_frame(stored(NoteBody.objects.filter(pk=note.pk), 'content')))
+        self.assertEqual(Note.objects.get(pk=note.pk).content, content)
+        response = self.client.get(f'/api/notes/{note.uuid}/')
+        self.assertEqual(response.json()['content'], content)
+
+        log = note.logs.get()
+        self.assertTrue(is_frame(stored(NoteLog.objects.filter(pk=log.pk), 'extras')))
+        response = self.client.get(f'/api/notelogs/{log.uuid}/version/')
+        self.assertEqual(response.json()['content'], content)
+
+        # shrinks below the threshold
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data={'content': doc('short')}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stored(NoteBody.objects.filter(pk=note.pk), 'content'), doc('short'))
+
+    def test_recompress_json(self):
+        content = doc(*(f'paragraph {i}' for i in range(100)))
+        with override_settings(JSON_COMPRESSION_THRESHOLD=10 ** 9):  # written before compression was enabled
+            NoteBody.objects.filter(pk=1).update(content=content)
+        self.assertFalse(is_frame(stored(NoteBody.objects.filter(pk=1), 'content')))
+
+        out = StringIO()
+        call_command('recompress_json', '--dry-run', stdout=out)
+        self.assertIn('[dry run] amber.NoteBody.content: scanned 1 rows, rewrote 1 rows', out.getvalue())
+        self.assertFalse(is_frame(stored(NoteBody.objects.filter(pk=1), 'content')))
+
+        out = StringIO()
+        call_command('recompress_json', '--batch-size', '1', stdout=out)
+        self.assertIn('amber.NoteBody.content: scanned 1 rows, rewrote 1 rows', out.getvalue())
+        self.assertTrue(is_frame(stored(NoteBody.objects.filter(pk=1), 'content')))
+        self.assertEqual(NoteBody.objects.get(pk=1).content, content)
+
+        # nothing left to do
+        out = StringIO()
+        call_command('recompress_json', stdout=out)
+        self.assertIn('amber.NoteBody.content: scanned 1 rows, rewrote 0 rows, saved about 0 bytes', out.getvalue())
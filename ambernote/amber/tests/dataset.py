@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase
+
+from ambernote.amber.dataset import DatasetSpec, generate_dataset, get_email
+from ambernote.amber.history import reconstruct
+from ambernote.amber.models import Note, NoteLog, NoteSearchTerm, NoteSpace, NoteSpaceMember
+from ambernote.amber.text import summarize
+
+SPEC = DatasetSpec(users=6, team_notespaces=3, notes=60, until=datetime(2026, 1, 1, tzinfo=timezone.utc), seed=42)
+
+
+def dump() -> list:
+    """
+    Generated notes, without auto-incremented ids.
+    """
+    return [
+        (note.uuid, note.title, note.content, note.revision, note.is_deleted, note.created_at, note.updated_at,
+         sorted(note.tags.values_list('name', flat=True)),
+         list(note.logs.order_by('id').values_list('uuid', 'user__email', 'action', 'created_at')))
+        for note in Note.objects.order_by('uuid').select_related('body')
+    ]
+
+
+class DatasetTestCase(TestCase):
+
+    def test_generate_dataset(self):
+        result = generate_dataset(SPEC, batch_size=7)
+        self.assertEqual((result.users, result.notespaces, result.notes), (6, 9, 60))
+        self.assertEqual(Note.objects.count(), 60)
+        self.assertEqual(NoteLog.objects.count(), result.logs)
+        self.assertEqual(NoteSearchTerm.objects.count(), result.terms)
+
+        # a team notespace has an owner, personal notespaces only their owner
+        for notespace in NoteSpace.objects.all():
+            roles = list(notespace.members.values_list('role', flat=True))
+            self.assertIn(NoteSpaceMember.Role.OWNER, roles)
+            if notespace.type == NoteSpace.Type.PERSONAL:
+                self.assertEqual(roles, [NoteSpaceMember.Role.OWNER])
+
+        for note in Note.objects.select_related('body'):
+            # as created by the API
+            self.assertEqual((note.excerpt, note.word_count), summarize(note.content))
+            self.assertEqual(note.is_deleted, note.deleted_at is not None)
+            self.assertEqual(note.search_terms.exists(), not note.is_deleted and note.word_count + len(note.title) > 0)
+            logs = list(note.logs.order_by('id'))
+            self.assertEqual(logs[0].action, NoteLog.Action.CREATED)
+            self.assertTrue(all(log.notespace_id == note.notespace_id for log in logs))
+            self.assertEqual([log.created_at for log in logs], sorted(log.created_at for log in logs))
+            # the history rebuilds the note
+            last = [log for log in logs if log.action in (NoteLog.Action.CREATED, NoteLog.Action.UPDATED)][-1]
+            version = reconstruct(last)
+            self.assertEqual((version.title, version.content), (note.title, note.content))
+
+        # users can log in
+        self.assertTrue(self.client.login(email=get_email(SPEC.seed, 0), password=SPEC.password))
+
+    def test_reproducible(self):
+        with transaction.atomic():
+            generate_dataset(SPEC, index=False)
+            first = dump()
+            transaction.set_rollback(True)
+
+        generate_dataset(SPEC, batch_size=1000, index=False)
+        self.assertEqual(dump(), first)
+        self.assertNotEqual(first, [])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('generate_dataset', '--users', '2', '--team-notespaces', '1', '--notes', '5', '--seed', '7',
+                     stdout=out)
+        self.assertIn('Created 2 users, 3 notespaces', out.getvalue())
+        self.assertIn('5 notes', out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, 'A dataset with seed 7 exists'):
+            call_command('generate_dataset', '--users', '2', '--seed', '7', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, '--batch-size must be a positive integer'):
+            call_command('generate_dataset', '--batch-size', '0', stdout=StringIO())
@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import Note, NoteSpace, Tag
+from ambernote.authx.models import User
+
+
+class FieldsTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(User.objects.filter(pk=2).first())  # as owner
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+        self.note = Note.objects.filter(pk=1).first()
+        self.note.tags.add(Tag.objects.filter(pk=1).first())
+
+    def test_fields(self):
+        params = {'notespace': self.notespace.uuid, 'fields': 'uuid,title,unknown'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notes/', data=params)
+        self.assertEqual(response.status_code, 200)
+        for item in response.json()['results']:
+            self.assertEqual(set(item), {'uuid', 'title'})
+        # neither the content is loaded nor the tags are fetched
+        self.assertFalse(any('"content"' in query['sql'] for query in queries))
+        self.assertFalse(any('amber_tag' in query['sql'] for query in queries))
+
+        # also with keyset pagination
+        response = self.client.get('/api/notes/', data={**params, 'pagination': 'cursor', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['results'][0]), {'uuid', 'title'})
+
+        response = self.client.get(f'/api/notes/{self.note.uuid}/', data={'fields': 'revision'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'revision': self.note.revision})
+        self.assertIn('ETag', response)
+
+    def test_user_fields(self):
+        user = User.objects.filter(pk=2).first()
+        response = self.client.get(f'/api/users/{user.uuid}/', data={'fields': 'fullname'})
+        self.assertEqual(response.json(), {'fullname': user.fullname})
+
+        admin = User.objects.filter(pk=1).first()
+        self.client.force_login(admin)  # as admin
+        response = self.client.get('/api/users/me/', data={'fields': 'uuid,is_staff'})
+        self.assertEqual(response.json(), {'uuid': str(admin.uuid), 'is_staff': True})
+        response = self.client.get('/api/users/', data={'fields': 'email'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(set(item) == {'email'} for item in response.json()['results']))
+
+    def test_expand(self):
+        tag = Tag.objects.filter(pk=1).first()
+        response = self.client.get(f'/api/notes/{self.note.uuid}/')
+        self.assertEqual(response.json()['tags'], [{'uuid': str(tag.uuid), 'name': tag.name}])
+        response = self.client.get(f'/api/notes/{self.note.uuid}/', data={'expand': ''})
+        self.assertEqual(response.json()['tags'], [str(tag.uuid)])
+        response = self.client.get(f'/api/notes/{self.note.uuid}/', data={'expand': 'tags'})
+        self.assertEqual(response.json()['tags'], [{'uuid': str(tag.uuid), 'name': tag.name}])
+
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        response = self.client.get(f'/api/notespaces/{self.notespace.uuid}/', data={'fields': 'name,members',
+                                                                                      'expand': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'name': self.notespace.name,
+            'members': [str(uuid) for uuid in self.notespace.members.values_list('user__uuid', flat=True)],
+        })
+        # users of collapsed members are prefetched
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notespaces/', data={'expand': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum('authx_user' in query['sql'] for query in queries), 2)  # and the request user
@@ -0,0 +1,106 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import Note, NoteSpace
+from ambernote.authx.models import User
+
+
+# Each explainer returns the problems found in the plan of a query, as (kind, detail),
+# kind is "scan" (full table scan) or "sort".
+
+def _explain_sqlite(cursor, sql: str) -> list[tuple[str, str]]:
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+    problems = []
+    for row in cursor.fetchall():
+        detail = row[-1]
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            problems.append(('scan', detail))
+        elif 'TEMP B-TREE FOR ORDER BY' in detail or 'TEMP B-TREE FOR LAST' in detail:
+            problems.append(('sort', detail))
+    return problems
+
+
+def _explain_postgresql(cursor, sql: str) -> list[tuple[str, str]]:
+    # the tables are tiny, tell the planner to use any index it can instead of scanning them
+    cursor.execute('SET LOCAL enable_seqscan = off')
+    cursor.execute('SET LOCAL enable_sort = off')
+    cursor.execute(f'EXPLAIN {sql}')
+    lines = [row[0].strip().lstrip('-> ') for row in cursor.fetchall()]
+    return [('scan' if line.startswith('Seq Scan') else 'sort', line)
+            for line in lines if line.startswith(('Seq Scan', 'Sort', 'Incremental Sort'))]
+
+
+def _explain_mysql(cursor, sql: str) -> list[tuple[str, str]]:
+    # the tables are tiny, tell the optimizer that index lookups are cheap
+    cursor.execute('SET SESSION max_seeks_for_key = 1')
+    cursor.execute(f'EXPLAIN {sql}')
+    columns = [column[0].lower() for column in cursor.description]
+    problems = []
+    for row in cursor.fetchall():
+        row = dict(zip(columns, row))
+        if row['type'] == 'ALL':
+            problems.append(('scan', row['table']))
+        if 'filesort' in (row['extra'] or ''):
+            problems.append(('sort', row['table']))
+    return problems
+
+
+class IndexUsageTestCase(TestCase):
+    """
+    Every filtered query of a list endpoint reads its tables through an index, and a page is read in index order:
+    the query plan has neither a full table scan (unless the query reads the whole table) nor a sort.
+    It checks the plans of the database the suite runs on (SQLite, PostgreSQL or MySQL).
+    """
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    explainers = {
+        'sqlite': _explain_sqlite,
+        'postgresql': _explain_postgresql,
+        'mysql': _explain_mysql,
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.filter(pk=1).first()
+        self.client.force_login(self.user)  # as admin
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+        self.note = Note.objects.filter(pk=1).first()
+
+    def _explain(self, sql: str) -> list[tuple[str, str]]:
+        explainer = self.explainers.get(connection.vendor)
+        if explainer is None:
+            self.skipTest(f'Query plans of {connection.vendor} are not checked')
+        with connection.cursor() as cursor:
+            problems = explainer(cursor, sql)
+        if ' WHERE ' not in sql:  # e.g. the count of all notespaces, which reads every row anyway
+            problems = [(kind, detail) for kind, detail in problems if kind != 'scan']
+        return problems
+
+    def test_list_endpoints(self):
+        endpoints = {
+            'notes': ('/api/notes/', {'notespace': self.notespace.uuid}),
+            'notes_cursor': ('/api/notes/', {'notespace': self.notespace.uuid, 'pagination': 'cursor'}),
+            'notes_summary': ('/api/notes/', {'notespace': self.notespace.uuid, 'view': 'summary'}),
+            'tags': ('/api/tags/', {'notespace': self.notespace.uuid}),
+            'tags_cursor': ('/api/tags/', {'notespace': self.notespace.uuid, 'pagination': 'cursor'}),
+            'members': ('/api/members/', {'notespace': self.notespace.uuid}),
+            'notelogs': ('/api/notelogs/', {'note': self.note.uuid}),
+            'notelogs_cursor': ('/api/notelogs/', {'note': self.note.uuid, 'pagination': 'cursor'}),
+            'activity': ('/api/notelogs/', {'notespace': self.notespace.uuid}),
+            'activity_cursor': ('/api/notelogs/', {'notespace': self.notespace.uuid, 'pagination': 'cursor'}),
+            'activity_user': ('/api/notelogs/', {'notespace': self.notespace.uuid, 'user': self.user.uuid}),
+            'activity_action': ('/api/notelogs/', {'notespace': self.notespace.uuid, 'action': '2'}),
+            'notespaces': ('/api/notespaces/', {}),
+        }
+        for name, (url, params) in endpoints.items():
+            with self.subTest(name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, data=params)
+                self.assertEqual(response.status_code, 200)
+                for query in queries:
+                    if query['sql'].startswith('SELECT'):
+                        self.assertEqual(self._explain(query['sql']), [], query['sql'])
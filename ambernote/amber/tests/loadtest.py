@@ -0,0 +1,70 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase
+
+from ambernote.amber.benchmark import find_regressions, percentile, save_results
+from ambernote.amber.dataset import DatasetSpec, generate_dataset
+from ambernote.amber.models import NoteLog
+
+
+class LoadTestTestCase(TransactionTestCase):
+    """
+    Clients of the WSGI interface are threads with their own database connections,
+    so that the dataset is committed rather than created in the transaction of a test.
+    """
+
+    def setUp(self):
+        generate_dataset(DatasetSpec(users=3, team_notespaces=1, notes=20, seed=3), index=False)
+
+    def _benchmark(self, *args) -> str:
+        out = StringIO()
+        call_command('benchmark_http', '--seed', '3', '--host', 'testserver', '--requests', '2', '--warmup', '1',
+                     *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_benchmark_http(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory, 'results.json'))
+            scenarios = ('notes_list', 'notes_cursor', 'note_retrieve', 'notelogs_list', 'activity')
+            output = self._benchmark('--concurrency', '2', '--output', path,
+                                     *(arg for scenario in scenarios for arg in ('--scenario', scenario)))
+            self.assertIn('wsgi/notes_list', output)
+            self.assertIn('asgi/activity', output)
+
+            stored = json.loads(Path(path).read_text())
+            self.assertEqual(stored['meta']['concurrency'], 2)
+            for interface in ('wsgi', 'asgi'):
+                for scenario in scenarios:
+                    result = stored['results'][f'{interface}/{scenario}']
+                    # 2 clients of 2 requests, all successful
+                    self.assertEqual((result['requests'], result['errors']), (4, 0), f'{interface}/{scenario}')
+                    self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+            # writes of concurrent clients fail on the in-memory test database (locked tables are not waited for)
+            output = self._benchmark('--concurrency', '1', '--scenario', 'login', '--scenario', 'pin')
+            self.assertIn('asgi/pin', output)
+            # flag actions went through the CSRF check of session authentication
+            self.assertTrue(NoteLog.objects.filter(action=NoteLog.Action.PINNED).exists())
+
+            # much faster than now: fails
+            save_results(path, {}, {'wsgi/notes_list': {'p95_ms': 0.001, 'throughput': 10 ** 9}})
+            with self.assertRaisesMessage(CommandError, 'wsgi/notes_list: p95_ms 0.001 ->'):
+                self._benchmark('--interface', 'wsgi', '--scenario', 'notes_list', '--baseline', path)
+
+    def test_no_dataset(self):
+        with self.assertRaisesMessage(CommandError, 'No dataset with seed 4'):
+            call_command('benchmark_http', '--seed', '4', stdout=StringIO(), stderr=StringIO())
+
+    def test_find_regressions(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+        baseline = {'a': {'p95_ms': 10, 'throughput': 100}, 'b': {'p95_ms': 10}}
+        results = {'a': {'p95_ms': 12, 'throughput': 70}, 'b': {'p95_ms': 20}, 'c': {'p95_ms': 1}}
+        self.assertEqual(find_regressions(baseline, results, {'p95_ms': 0.25, 'throughput': 0.2}), [
+            'a: throughput 100 -> 70 (-30%, limit 20%)',
+            'b: p95_ms 10 -> 20 (+100%, limit 25%)',
+        ])
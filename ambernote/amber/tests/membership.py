@@ -0,0 +1,77 @@
+from django.core.cache import caches
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from ambernote.authx.models import User
+from ..membership import get_role
+from ..models import NoteSpaceMember
+
+
+# two workers of the same (shared) cache server, whose cache instances are distinct
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'roles'},
+    'worker2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'roles'},
+}
+
+
+@override_settings(CACHES=SHARED_CACHES, NOTESPACE_ROLE_CACHE='default')
+class MembershipTestCase(TransactionTestCase):
+    # not wrapped in a transaction, so that roles are shared in the cache
+    fixtures = [
+        'testdata-1.yaml',
+    ]
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def _request(self, pk):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=pk)
+        return request
+
+    def test_memoized_in_request(self):
+        request = self._request(4)  # as guest
+        with self.assertNumQueries(1):
+            self.assertEqual(get_role(request, 1), NoteSpaceMember.Role.GUEST)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role(request, 1), NoteSpaceMember.Role.GUEST)
+
+    def test_shared_between_requests(self):
+        get_role(self._request(5), 1)  # not belong to notespace
+        request = self._request(5)
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_role(request, 1))
+
+    def test_invalidated_on_change(self):
+        self.assertEqual(get_role(self._request(4), 1), NoteSpaceMember.Role.GUEST)
+
+        member = NoteSpaceMember.objects.get(notespace_id=1, user_id=4)
+        member.role = NoteSpaceMember.Role.OWNER
+        member.save()
+        self.assertEqual(get_role(self._request(4), 1), NoteSpaceMember.Role.OWNER)
+
+        member.delete()
+        self.assertIsNone(get_role(self._request(4), 1))
+
+        NoteSpaceMember.objects.create(notespace_id=1, user_id=5, role=NoteSpaceMember.Role.MEMBER)
+        self.assertEqual(get_role(self._request(5), 1), NoteSpaceMember.Role.MEMBER)
+
+    def test_shared_between_workers(self):
+        self.assertEqual(get_role(self._request(4), 1), NoteSpaceMember.Role.GUEST)
+        with override_settings(NOTESPACE_ROLE_CACHE='worker2'):
+            self.assertEqual(get_role(self._request(4), 1), NoteSpaceMember.Role.GUEST)
+            self.assertIsNot(caches['worker2'], caches['default'])
+
+        # revoked by the first worker, checked by the second one
+        NoteSpaceMember.objects.filter(notespace_id=1, user_id=4).get().delete()
+        with override_settings(NOTESPACE_ROLE_CACHE='worker2'):
+            self.assertIsNone(get_role(self._request(4), 1))
+
+    @override_settings(NOTESPACE_ROLE_CACHE=None)
+    def test_without_shared_cache(self):
+        # only memoized in each request
+        get_role(self._request(4), 1)
+        request = self._request(4)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_role(request, 1), NoteSpaceMember.Role.GUEST)
+        NoteSpaceMember.objects.filter(notespace_id=1, user_id=4).update(role=NoteSpaceMember.Role.MEMBER)
+        self.assertEqual(get_role(self._request(4), 1), NoteSpaceMember.Role.MEMBER)
@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import NoteSpace
+from ambernote.authx.models import User
+from ambernote.metrics import ARCHIVE_NAME, CACHE_REQUESTS, REGISTRY, REQUEST_DURATION, REQUESTS, Counter, Registry, \
+    mark_process_dead
+
+
+def sample(name: str, labels: tuple[str, ...], index: int = 0) -> float:
+    values = REGISTRY.snapshot().get((name, labels))
+    return values[index] if values else 0.0
+
+
+class MetricsTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+
+    def test_metrics(self):
+        labels = ('NoteViewSet', 'list', 'GET', '200')
+        before = sample(REQUESTS.name, labels)
+        lookups = sample(CACHE_REQUESTS.name, ('notespace_role', 'hit')) \
+            + sample(CACHE_REQUESTS.name, ('notespace_role', 'miss'))
+        self.client.get('/api/notes/', data={'notespace': self.notespace.uuid})
+        self.client.get('/api/notes/', data={'notespace': self.notespace.uuid})
+        self.assertEqual(sample(REQUESTS.name, labels), before + 2)
+        # a role lookup in each request (not cached in tests, as they run in transactions)
+        self.assertEqual(sample(CACHE_REQUESTS.name, ('notespace_role', 'hit'))
+                         + sample(CACHE_REQUESTS.name, ('notespace_role', 'miss')), lookups + 2)
+
+        errors = sample(REQUESTS.name, ('NoteViewSet', 'archive', 'POST', '404'))
+        self.client.post('/api/notes/00000000-0000-0000-0000-000000000000/archive/')
+        self.assertEqual(sample(REQUESTS.name, ('NoteViewSet', 'archive', 'POST', '404')), errors + 1)
+
+        self.assertEqual(self.client.get('/metrics').status_code, 401)  # not a staff user
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('# TYPE ambernote_http_request_duration_seconds histogram', text)
+        self.assertIn(
+            f'ambernote_http_requests_total{{view="NoteViewSet",action="list",method="GET",status="200"}} '
+            f'{before + 2}', text)
+        count = sum(REGISTRY.snapshot()[(REQUEST_DURATION.name, ('NoteViewSet', 'list'))][:-1])
+        self.assertIn(f'ambernote_http_request_duration_seconds_bucket{{view="NoteViewSet",action="list",'
+                      f'le="+Inf"}} {count}', text)
+        self.assertIn('ambernote_db_queries_total{view="NoteViewSet",action="list"}', text)
+
+    def _write_snapshot(self, path: Path, count: float):
+        labels = ['NoteViewSet', 'list', 'GET', '200']
+        path.write_text(json.dumps([[REQUESTS.name, labels, [count]]]))
+
+    def _scrape_total(self, directory: str) -> float:
+        with override_settings(METRICS_DIR=directory):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        line = next(line for line in response.content.decode().splitlines()
+                    if line.startswith('ambernote_http_requests_total{view="NoteViewSet",action="list",method="GET",'
+                                       'status="200"}'))
+        return float(line.split()[-1])
+
+    def test_multiprocess(self):
+        labels = ('NoteViewSet', 'list', 'GET', '200')
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        self.client.get('/api/notes/', data={'notespace': self.notespace.uuid})
+        with tempfile.TemporaryDirectory() as directory:
+            # the snapshots of other workers, one of them had the pid of this process
+            self._write_snapshot(Path(directory, '1-a.json'), 5)
+            self._write_snapshot(Path(directory, f'{os.getpid()}-b.json'), 7)
+            total = self._scrape_total(directory)
+            self.assertEqual(total, sample(REQUESTS.name, labels) + 12)
+            self.assertTrue(Path(directory, f'{REGISTRY.process_name}.json').exists())
+            self.assertTrue(Path(directory, f'{os.getpid()}-b.json').exists())
+
+            # a killed worker, then this worker exits: their counts are kept in the archive
+            mark_process_dead(1, directory)
+            self.assertFalse(Path(directory, '1-a.json').exists())
+            self.assertEqual(self._scrape_total(directory), total)
+            REGISTRY.archive(directory)
+            self.assertEqual(sorted(path.name for path in Path(directory).glob('*.json')),
+                             sorted([ARCHIVE_NAME, f'{os.getpid()}-b.json']))
+            archived = {(name, tuple(labels)): values
+                        for name, labels, values in json.loads(Path(directory, ARCHIVE_NAME).read_text())}
+            self.assertEqual(archived[(REQUESTS.name, labels)], [5 + sample(REQUESTS.name, labels)])
+
+    def test_archive(self):
+        registry = Registry()
+        counter = Counter('test_total', 'Test.', registry=registry)
+        with tempfile.TemporaryDirectory() as directory:
+            self._write_snapshot(Path(directory, '1-a.json'), 5)
+            mark_process_dead(1, directory)
+            # a worker flushed its metrics, then counted once more before exiting
+            for _ in range(2):
+                counter.inc()
+            registry.flush(directory)
+            counter.inc()
+            registry.archive(directory)
+
+            self.assertEqual([path.name for path in Path(directory).glob('*.json')], [ARCHIVE_NAME])
+            self.assertEqual(json.loads(Path(directory, ARCHIVE_NAME).read_text()), [
+                [REQUESTS.name, ['NoteViewSet', 'list', 'GET', '200'], [5]],
+                [counter.name, [], [3]],
+            ])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
@@ -0,0 +1,50 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ambernote.amber.benchmark import save_results
+from ambernote.amber.microbench import BENCHMARKS, DATABASE_BENCHMARKS, build_fixtures
+from ambernote.amber.models import NoteSpace
+from ambernote.amber.views.note import NoteRetrieveSerializer
+
+
+class MicrobenchTestCase(TestCase):
+
+    def test_fixtures(self):
+        fixtures = build_fixtures(20, seed=1)
+        # reproducible
+        data = NoteRetrieveSerializer(fixtures.notes, many=True, context={}).data
+        self.assertEqual(json.dumps(data, default=str),
+                         json.dumps(NoteRetrieveSerializer(build_fixtures(20, seed=1).notes, many=True,
+                                                           context={}).data, default=str))
+        self.assertEqual(data[0]['content'], fixtures.notes[0].content)
+
+        # in memory
+        for name, build in BENCHMARKS.items():
+            if name not in DATABASE_BENCHMARKS:
+                with self.subTest(name), self.assertNumQueries(0):
+                    build(fixtures)()
+
+    def test_benchmark_objects(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory, 'results.json'))
+            out = StringIO()
+            call_command('benchmark_objects', '--sizes', '5,10', '--repeat', '2', '--output', path,
+                         stdout=out, stderr=StringIO())
+            self.assertIn('serialize/note_retrieve[10]', out.getvalue())
+
+            results = json.loads(Path(path).read_text())['results']
+            self.assertEqual(set(results), {f'{name}[{size}]' for name in BENCHMARKS for size in (5, 10)})
+            self.assertEqual(results['permission/guest[10]']['objects'], 10)
+            # the notespace of note creations is rolled back
+            self.assertFalse(NoteSpace.objects.filter(name='notespace 0').exists())
+
+            # much faster than now: fails
+            save_results(path, {}, {'serialize/embedded_tag[5]': {'median_ms': 0.000001}})
+            with self.assertRaisesMessage(CommandError, 'serialize/embedded_tag[5]: median_ms'):
+                call_command('benchmark_objects', '--sizes', '5', '--repeat', '1', '--benchmark',
+                             'serialize/embedded_tag', '--baseline', path, stdout=StringIO(), stderr=StringIO())
@@ -1,7 +1,15 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 
-from ambernote.amber.models import Note, NoteLog, NoteSpace
+from ambernote.amber.history import reconstruct
+from ambernote.amber.models import Note, NoteLog, NoteSpace, NoteTombstone, Tag
 from ambernote.authx.models import User
 
 
@@ -60,6 +68,377 @@ class NoteTestCase(TestCase):
         self._test_read_note_denied()
         self._test_destroy_note_denied()
 
+    def test_bulk_action(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        notespace = NoteSpace.objects.filter(pk=1).first()
+        other_notespace = NoteSpace.objects.create(name='other notespace')
+        notes = [Note.objects.create(notespace=notespace, title=f'note {i}', content={}) for i in range(3)]
+        notes[0].is_pinned = True
+        notes[0].save()
+        other_note = Note.objects.create(notespace=other_notespace, title='other note', content={})
+        missing_uuid = '00000000-0000-0000-0000-000000000000'
+
+        data = {
+            'action': 'pin',
+            'notes': [str(note.uuid) for note in notes] + [str(other_note.uuid), missing_uuid],
+        }
+        response = self.client.post('/api/notes/bulk/', data=data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['uuid'], item['ok'], item['status']) for item in response.json()],
+            [
+                (str(notes[0].uuid), True, 'unchanged'),
+                (str(notes[1].uuid), True, 'updated'),
+                (str(notes[2].uuid), True, 'updated'),
+                (str(other_note.uuid), False, 'denied'),
+                (missing_uuid, False, 'not_found'),
+            ],
+        )
+
+        # check saved data
+        for note in notes[1:]:
+            note.refresh_from_db()
+            self.assertTrue(note.is_pinned)
+            self.assertEqual(note.logs.order_by('-created_at').first().action, NoteLog.Action.PINNED)
+        other_note.refresh_from_db()
+        self.assertFalse(other_note.is_pinned)
+        self.assertEqual(notes[0].logs.count(), 0)
+
+    def test_bulk_action_denied(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        note = Note.objects.filter(pk=1).first()
+        response = self.client.post('/api/notes/bulk/', data={'action': 'archive', 'notes': [note.uuid]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['status'], 'denied')
+        note.refresh_from_db()
+        self.assertFalse(note.is_archived)
+
+        self.client.logout()
+        response = self.client.post('/api/notes/bulk/', data={'action': 'archive', 'notes': [note.uuid]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_update_tags(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        notespace = NoteSpace.objects.filter(pk=1).first()
+        tag1 = Tag.objects.filter(pk=1).first()
+        tag2 = Tag.objects.create(notespace=notespace, name='tag 2')
+        notes = [Note.objects.create(notespace=notespace, title=f'note {i}', content={}) for i in range(2)]
+        notes[0].tags.add(tag1)
+
+        def _update_tags(mode, tags):
+            data = {
+                'notespace': notespace.uuid,
+                'mode': mode,
+                'notes': [note.uuid for note in notes],
+                'tags': [tag.uuid for tag in tags],
+            }
+            response = self.client.post('/api/notes/tags/', data=data, format='json')
+            self.assertEqual(response.status_code, 200)
+            return [item['status'] for item in response.json()]
+
+        self.assertEqual(_update_tags('add', [tag1, tag2]), ['updated', 'updated'])
+        self.assertCountEqual(notes[0].tags.all(), [tag1, tag2])
+        self.assertCountEqual(notes[1].tags.all(), [tag1, tag2])
+        self.assertEqual(_update_tags('add', [tag1]), ['unchanged', 'unchanged'])
+
+        self.assertEqual(_update_tags('remove', [tag1]), ['updated', 'updated'])
+        self.assertCountEqual(notes[0].tags.all(), [tag2])
+        log = notes[0].logs.order_by('-created_at').first()
+        self.assertEqual(log.action, NoteLog.Action.UNTAGGED)
+        self.assertEqual(log.extras['tags'], [{'uuid': str(tag1.uuid), 'name': tag1.name}])
+
+        notes[1].tags.set([tag1, tag2])
+        self.assertEqual(_update_tags('set', [tag1]), ['updated', 'updated'])
+        self.assertCountEqual(notes[0].tags.all(), [tag1])
+        self.assertCountEqual(notes[1].tags.all(), [tag1])
+
+        self.assertEqual(_update_tags('set', []), ['updated', 'updated'])
+        self.assertFalse(Note.tags.through.objects.filter(note__in=notes).exists())
+
+    def test_update_tags_denied(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        data = {
+            'notespace': NoteSpace.objects.filter(pk=1).first().uuid,
+            'mode': 'add',
+            'notes': [Note.objects.filter(pk=1).first().uuid],
+            'tags': [Tag.objects.filter(pk=1).first().uuid],
+        }
+        response = self.client.post('/api/notes/tags/', data=data, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_patch_content(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        note = Note.objects.create(
+            notespace=NoteSpace.objects.filter(pk=1).first(),
+            title='patch note',
+            content={'type': 'doc', 'content': [{'type': 'paragraph', 'content': [{'type': 'text', 'text': 'a'}]}]},
+        )
+        data = {
+            'revision': note.revision,
+            'patch': [
+                {'op': 'replace', 'path': '/content/0/content/0/text', 'value': 'b'},
+                {'op': 'add', 'path': '/content/-', 'value': {'type': 'paragraph'}},
+            ],
+        }
+        response = self.client.patch(f'/api/notes/{note.uuid}/content/', data=data, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        note.refresh_from_db()
+        self.assertEqual(response.json()['revision'], note.revision)
+        self.assertEqual(note.content, {'type': 'doc', 'content': [
+            {'type': 'paragraph', 'content': [{'type': 'text', 'text': 'b'}]},
+            {'type': 'paragraph'},
+        ]})
+        log = note.logs.order_by('-created_at').first()
+        self.assertEqual(log.action, NoteLog.Action.UPDATED)
+
+        # the note has been changed since the base revision
+        response = self.client.patch(f'/api/notes/{note.uuid}/content/', data=data, format='json')
+        self.assertEqual(response.status_code, 409)
+
+        # invalid patch
+        data = {'revision': note.revision, 'patch': [{'op': 'remove', 'path': '/missing'}]}
+        response = self.client.patch(f'/api/notes/{note.uuid}/content/', data=data, format='json')
+        self.assertEqual(response.status_code, 400)
+        note.refresh_from_db()
+        self.assertEqual(len(note.content['content']), 2)
+
+    def test_update_if_match(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        note = Note.objects.filter(pk=1).first()
+        response = self.client.get(f'/api/notes/{note.uuid}/')
+        etag = response['ETag']
+
+        # updated by someone else in the meantime
+        other = Note.objects.filter(pk=1).first()
+        other.title = 'changed by someone else'
+        other.save()
+
+        data = {'title': 'stale update'}
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)  # Precondition Failed
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json', HTTP_IF_MATCH=f'W/{etag}')
+        self.assertEqual(response.status_code, 412)
+        note.refresh_from_db()
+        self.assertEqual(note.title, other.title)
+        self.assertFalse(note.logs.filter(action=NoteLog.Action.UPDATED).exists())
+
+        # match by the current ETag, then by the revision
+        etag = self.client.get(f'/api/notes/{note.uuid}/')['ETag']
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        note.refresh_from_db()
+        self.assertEqual(note.title, data['title'])
+        self.assertEqual(note.revision, other.revision + 1)
+        self.assertEqual(response['ETag'], self.client.get(f'/api/notes/{note.uuid}/')['ETag'])
+
+        data = {'title': 'update by revision'}
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json',
+                                     HTTP_IF_MATCH=f'"{note.revision}"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json', HTTP_IF_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        # without If-Match, the ETag is returned as well
+        response = self.client.put(f'/api/notes/{note.uuid}/', data={'title': 'put', 'content': {}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.client.get(f'/api/notes/{note.uuid}/')['ETag'])
+
+    def test_conditional_get(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        note = Note.objects.filter(pk=1).first()
+        response = self.client.get(f'/api/notes/{note.uuid}/')
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/notes/{note.uuid}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)  # Not Modified
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any('"content"' in query['sql'] for query in queries))
+
+        note.is_pinned = not note.is_pinned
+        note.save()
+        response = self.client.get(f'/api/notes/{note.uuid}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # list
+        params = {'notespace': note.notespace.uuid}
+        etag = self.client.get('/api/notes/', data=params)['ETag']
+        response = self.client.get('/api/notes/', data=params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/notes/', data={**params, 'limit': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        Note.objects.create(notespace=note.notespace, title='new note', content={})
+        response = self.client.get('/api/notes/', data=params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+        Note.objects.filter(title='new note').delete()
+        response = self.client.get('/api/notes/', data=params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # the page is only loaded with its ETag if it has changed
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notes/', data=params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"title"' in query['sql'] for query in queries))
+        params = {**params, 'pagination': 'cursor'}
+        etag = self.client.get('/api/notes/', data=params)['ETag']
+        response = self.client.get('/api/notes/', data=params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_conditional_get_tags(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        note = Note.objects.filter(pk=1).first()
+        tag = Tag.objects.filter(pk=1).first()
+        note.tags.add(tag)
+        urls = {
+            f'/api/notes/{note.uuid}/': {},
+            '/api/notes/': {'notespace': note.notespace.uuid},
+            '/api/notes/?pagination=cursor': {'notespace': note.notespace.uuid},
+        }
+        etags = {url: self.client.get(url, data=params)['ETag'] for url, params in urls.items()}
+        for url, params in urls.items():
+            response = self.client.get(url, data=params, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304, url)
+
+        # the embedded tag is renamed, then deleted, the note itself is not updated
+        tag.name = 'renamed'
+        tag.save()
+        for url, params in urls.items():
+            response = self.client.get(url, data=params, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            etags[url] = response['ETag']
+        tag.delete()
+        for url, params in urls.items():
+            response = self.client.get(url, data=params, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.json()['tags'] if params == {} else response.json()['results'][0]['tags'], [])
+
+    def test_list_summary(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        notespace = NoteSpace.objects.filter(pk=1).first()
+        words = ' '.join(f'word{i}' for i in range(100))
+        note = Note.objects.create(notespace=notespace, title='long note', content={'type': 'doc', 'content': [
+            {'type': 'paragraph', 'content': [{'type': 'text', 'text': 'He'}, {'type': 'text', 'text': 'llo'}]},
+            {'type': 'paragraph', 'content': [{'type': 'text', 'text': words}]},
+        ]})
+        self.assertEqual(note.word_count, 101)
+        self.assertTrue(note.excerpt.startswith('Hello word0 word1 '))
+        self.assertTrue(note.excerpt.endswith('\u2026'))
+        self.assertLessEqual(len(note.excerpt), 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notes/', data={'notespace': notespace.uuid, 'view': 'summary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('"content"' in query['sql'] for query in queries))
+        result = next(item for item in response.json()['results'] if item['uuid'] == str(note.uuid))
+        self.assertNotIn('content', result)
+        self.assertEqual(result['excerpt'], note.excerpt)
+        self.assertEqual(result['word_count'], note.word_count)
+
+        # updated with the content
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        data = {'content': {'type': 'doc', 'content': [{'type': 'text', 'text': 'short'}]}}
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json')
+        self.assertEqual(response.status_code, 200)
+        note.refresh_from_db()
+        self.assertEqual((note.excerpt, note.word_count), ('short', 1))
+
+        data = {'content': {'type': 'doc', 'content': [{'type': 'text', 'text': 'two words'}]}}
+        response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json',
+                                     HTTP_IF_MATCH=f'"{note.revision}"')
+        self.assertEqual(response.status_code, 200)
+        note.refresh_from_db()
+        self.assertEqual((note.excerpt, note.word_count), ('two words', 2))
+
+    def test_patch_content_denied(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        note = Note.objects.filter(pk=1).first()
+        data = {'revision': note.revision, 'patch': [{'op': 'replace', 'path': '', 'value': {}}]}
+        response = self.client.patch(f'/api/notes/{note.uuid}/content/', data=data, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        # a malformed patch is not validated for users denied
+        for pk in (4, 5):  # as guest, not belong to notespace
+            self.client.force_login(User.objects.filter(pk=pk).first())
+            response = self.client.patch(f'/api/notes/{note.uuid}/content/', data={'patch': 'malformed'},
+                                         format='json')
+            self.assertEqual(response.status_code, 403)
+
+    def test_purge_trash(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        notespace = NoteSpace.objects.filter(pk=1).first()
+        notes = [Note.objects.create(notespace=notespace, title=f'note {i}', content={}) for i in range(3)]
+        notes[0].tags.add(Tag.objects.filter(pk=1).first())
+        for note in notes:
+            self.client.post(f'/api/notes/{note.uuid}/delete/')
+        self.client.post(f'/api/notes/{notes[2].uuid}/restore/')
+        notes[2].refresh_from_db()
+        self.assertIsNone(notes[2].deleted_at)
+
+        # notes[0] has been in the trash for a long time
+        Note.objects.filter(pk=notes[0].pk).update(deleted_at=timezone.now() - timedelta(days=31))
+
+        call_command('purge_trash', stdout=StringIO())
+        self.assertFalse(Note.objects.filter(pk=notes[0].pk).exists())
+        self.assertFalse(NoteLog.objects.filter(note_id=notes[0].pk).exists())
+        self.assertTrue(NoteTombstone.objects.filter(note_uuid=notes[0].uuid).exists())
+        self.assertEqual(Note.objects.filter(pk__in=[notes[1].pk, notes[2].pk]).count(), 2)
+
+    def test_add_note_without_content(self):
+        notespace = NoteSpace.objects.filter(pk=1).first()
+        note = Note(notespace=notespace, title='no content')
+        self.assertIsNone(note.content)
+        note.save()
+        self.assertEqual(Note.objects.select_related('body').get(pk=note.pk).content, {})
+        self.assertEqual((note.excerpt, note.word_count), ('', 0))
+
+        # as django-admin adds notes
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        response = self.client.post('/dj-admin/amber/note/add/', data={
+            'notespace': notespace.pk, 'title': 'added in admin', 'uuid': '8b0d4a3e-3f1c-4a53-9a55-1c2b2f6f2a10',
+            'revision': 1, 'word_count': 0, 'tags': [1],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Note.objects.get(title='added in admin').content, {})
+
+    def test_revision(self):
+        note = Note.objects.filter(pk=1).first()
+        revision = note.revision
+
+        # nothing is re-read from the database to detect changes
+        with self.assertNumQueries(1):
+            note.is_pinned = not note.is_pinned
+            note.save(update_fields=['is_pinned', 'updated_at'])
+        with self.assertNumQueries(1):
+            note.save()
+        self.assertEqual(note.revision, revision)
+
+        self.assertEqual(note.content, 'test content')  # the body is loaded on first access
+        note.content = {'type': 'doc', 'content': []}
+        with self.assertNumQueries(2):  # the note and its body
+            note.save()
+        self.assertEqual(note.revision, revision + 1)
+        note.content = {'type': 'doc', 'content': []}  # an equal content
+        with self.assertNumQueries(1):
+            note.save()
+        self.assertEqual(note.revision, revision + 1)
+        note.title = note.title + ' changed'
+        note.save(update_fields=['title'])
+        note.refresh_from_db()
+        self.assertEqual(note.revision, revision + 2)
+
+        # contents are not loaded
+        note = Note.objects.only('id', 'revision', 'is_archived').get(pk=1)
+        note.is_archived = not note.is_archived
+        with self.assertNumQueries(1):
+            note.save(update_fields=['is_archived'])
+        self.assertEqual(note.revision, revision + 2)
+
     def _test_add_note_success(self):
         data = {
             'notespace': NoteSpace.objects.filter(pk=1).first().uuid,
@@ -126,8 +505,7 @@ class NoteTestCase(TestCase):
 
     def _test_update_note_success(self):
         note = Note.objects.filter(pk=1).first()
-        old_title = note.title
-        old_content = note.content
+        revision = note.revision
 
         data = {
             'title': 'test update note',
@@ -143,14 +521,15 @@ class NoteTestCase(TestCase):
         note.refresh_from_db()
         self.assertEqual(note.title, data['title'])
         self.assertEqual(note.content, data['content'])
+        self.assertEqual(note.revision, revision + 1)
 
         # check log
         log = note.logs.order_by('-created_at').first()
         self.assertEqual(log.action, NoteLog.Action.UPDATED)
-        self.assertEqual(log.extras['old']['title'], old_title)
-        self.assertEqual(log.extras['old']['content'], old_content)
-        self.assertEqual(log.extras['new']['title'], data['title'])
-        self.assertEqual(log.extras['new']['content'], data['content'])
+        version = reconstruct(log)
+        self.assertEqual(version.title, data['title'])
+        self.assertEqual(version.content, data['content'])
+        self.assertEqual(version.revision, note.revision)
 
     def _test_update_note_denied(self):
         note = Note.objects.filter(pk=1).first()
@@ -0,0 +1,178 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ambernote.amber.history import SNAPSHOT_INTERVAL, reconstruct
+from ambernote.amber.models import Note, NoteLog, NoteSpace
+from ambernote.amber.retention import CompactionResult, compact_note, compact_notelogs
+from ambernote.authx.models import User
+
+
+def doc(*paragraphs):
+    return {'type': 'doc', 'content': [
+        {'type': 'paragraph', 'content': [{'type': 'text', 'text': text}]} for text in paragraphs
+    ]}
+
+
+class NoteLogTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_versions(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        data = {'notespace': NoteSpace.objects.filter(pk=1).first().uuid, 'title': 'v0', 'content': doc('p0')}
+        response = self.client.post('/api/notes/', data=data, format='json')
+        self.assertEqual(response.status_code, 201)
+        note = Note.objects.order_by('-id').first()
+
+        # edit the note many times, each time a paragraph is appended
+        paragraphs = ['p0']
+        versions = {note.logs.get().uuid: ('v0', doc(*paragraphs))}
+        for i in range(1, SNAPSHOT_INTERVAL * 2):
+            paragraphs.append(f'p{i}')
+            data = {'title': f'v{i}' if i % 3 == 0 else note.title, 'content': doc(*paragraphs)}
+            response = self.client.patch(f'/api/notes/{note.uuid}/', data=data, format='json')
+            self.assertEqual(response.status_code, 200)
+            note.refresh_from_db()
+            log = note.logs.order_by('-id').first()
+            versions[log.uuid] = (note.title, note.content)
+
+        # logs mostly store patches, not full copies
+        # (extras may be compressed at rest, so their keys are checked after loading)
+        logs = NoteLog.objects.filter(note=note, action=NoteLog.Action.UPDATED)
+        self.assertLess(sum('snapshot' in log.extras for log in logs), sum('patch' in log.extras for log in logs))
+
+        for log_uuid, (title, content) in versions.items():
+            response = self.client.get(f'/api/notelogs/{log_uuid}/version/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['title'], title)
+            self.assertEqual(response.json()['content'], content)
+
+    def _add_note(self) -> Note:
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        data = {'notespace': NoteSpace.objects.filter(pk=1).first().uuid, 'title': 'note', 'content': doc()}
+        self.client.post('/api/notes/', data=data, format='json')
+        return Note.objects.order_by('-id').first()
+
+    def test_compact_notelogs(self):
+        note = self._add_note()
+
+        # an editing session 200 days ago
+        paragraphs = []
+        for i in range(5):
+            paragraphs.append(f'p{i}')
+            self.client.patch(f'/api/notes/{note.uuid}/', data={'content': doc(*paragraphs)}, format='json')
+        session_version = Note.objects.get(pk=note.pk).content
+        self.client.post(f'/api/notes/{note.uuid}/pin/')
+        self.client.post(f'/api/notes/{note.uuid}/unpin/')
+
+        long_ago = timezone.now() - timedelta(days=200)
+        for i, log in enumerate(note.logs.order_by('id')):
+            NoteLog.objects.filter(pk=log.pk).update(created_at=long_ago + timedelta(minutes=i))
+
+        # an update by another user today
+        self.client.force_login(User.objects.filter(pk=2).first())  # as owner
+        self.client.patch(f'/api/notes/{note.uuid}/', data={'content': doc('today')}, format='json')
+
+        out = StringIO()
+        call_command('compact_notelogs', stdout=out)
+        self.assertIn('Deleted 6 logs', out.getvalue())
+
+        logs = list(note.logs.order_by('id'))
+        self.assertEqual([log.action for log in logs], [
+            NoteLog.Action.CREATED,
+            NoteLog.Action.UPDATED,  # merged editing session
+            NoteLog.Action.UPDATED,
+        ])
+        self.assertEqual(reconstruct(logs[0]).content, doc())
+        self.assertEqual(reconstruct(logs[1]).content, session_version)
+        self.assertEqual(reconstruct(logs[2]).content, doc('today'))
+
+        # compacted notes are not selected again
+        with self.assertNumQueries(2):
+            self.assertEqual(compact_notelogs(), CompactionResult())
+
+    def test_compact_notelogs_window(self):
+        note = self._add_note()
+        owner = User.objects.filter(pk=2).first()
+
+        # a long history which is not compacted (updates by two users in turn), then an editing session
+        paragraphs = []
+        for i in range(SNAPSHOT_INTERVAL * 2 + 5):
+            if i < SNAPSHOT_INTERVAL * 2:
+                self.client.force_login(owner if i % 2 else User.objects.filter(pk=3).first())
+            paragraphs.append(f'p{i}')
+            self.client.patch(f'/api/notes/{note.uuid}/', data={'content': doc(*paragraphs)}, format='json')
+        long_ago = timezone.now() - timedelta(days=200)
+        for i, log in enumerate(note.logs.order_by('id')):
+            NoteLog.objects.filter(pk=log.pk).update(created_at=long_ago + timedelta(minutes=i))
+        self.client.patch(f'/api/notes/{note.uuid}/', data={'content': doc('today')}, format='json')
+        versions = {log.id: reconstruct(log) for log in note.logs.all()}
+
+        with mock.patch('ambernote.amber.retention.compact_note', wraps=compact_note) as compact:
+            self.assertEqual(compact_notelogs().deleted, 5)
+        # logs are loaded from the nearest snapshot before the session
+        loaded = compact.call_args.args[0]
+        self.assertLessEqual(len(loaded), SNAPSHOT_INTERVAL + 6)
+        self.assertIsNotNone(loaded[0].extras.get('snapshot'))
+
+        # retained versions are unchanged
+        logs = list(note.logs.all())
+        self.assertEqual(len(logs), len(versions) - 5)
+        for log in logs:
+            self.assertEqual(reconstruct(log), versions[log.id])
+
+    def test_version_denied(self):
+        self.client.force_login(User.objects.filter(pk=5).first())  # not belong to notespace
+        log = NoteLog.objects.filter(pk=1).first()
+        response = self.client.get(f'/api/notelogs/{log.uuid}/version/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_activity(self):
+        notespace = NoteSpace.objects.filter(pk=1).first()
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        for title in ('a', 'b'):
+            self.client.post('/api/notes/', data={'notespace': notespace.uuid, 'title': title, 'content': doc()},
+                             format='json')
+        note = Note.objects.order_by('-id').first()
+        self.client.post(f'/api/notes/{note.uuid}/pin/')
+        member = User.objects.filter(pk=3).first()
+
+        # logs of all notes of the notespace, latest first
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        response = self.client.get('/api/notelogs/', data={'notespace': notespace.uuid})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]['action'], NoteLog.Action.PINNED)
+        self.assertEqual({log['note'] for log in results}, {str(note.uuid) for note in notespace.notes.all()})
+
+        response = self.client.get('/api/notelogs/', data={
+            'notespace': notespace.uuid, 'user': member.uuid, 'action': '1,9', 'pagination': 'cursor', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([log['action'] for log in response.json()['results']],
+                         [NoteLog.Action.PINNED, NoteLog.Action.CREATED])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([log['action'] for log in response.json()['results']], [NoteLog.Action.CREATED])
+
+        # a log can be retrieved by members of its notespace
+        response = self.client.get(f'/api/notelogs/{results[0]["uuid"]}/')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/notelogs/', data={'notespace': notespace.uuid, 'action': 'pinned'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/notelogs/')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(User.objects.filter(pk=5).first())  # not belong to notespace
+        response = self.client.get('/api/notelogs/', data={'notespace': notespace.uuid})
+        self.assertEqual(response.status_code, 403)
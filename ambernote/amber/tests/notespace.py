@@ -21,6 +21,19 @@ class NoteSpaceTestCase(TestCase):
         self._test_update_notespace_success()
         self._test_delete_notespace_success()
 
+    def test_conditional_get_members(self):
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        etag = self.client.get('/api/notespaces/')['ETag']
+        response = self.client.get('/api/notespaces/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # the role of an embedded member changes, the notespace itself is not updated
+        member = NoteSpaceMember.objects.filter(pk=2).first()
+        member.role = NoteSpaceMember.Role.GUEST
+        member.save()
+        response = self.client.get('/api/notespaces/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
     def test_owner(self):
         self.client.force_login(User.objects.filter(pk=2).first())  # as owner
         self._test_add_notespace_denied()
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import Note, NoteSpace
+from ambernote.authx.models import User
+
+
+class PaginationTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+
+        # add notes, some of them share the same created_at to test tie-breaking by id
+        now = timezone.now()
+        for i in range(24):
+            note = Note.objects.create(notespace=self.notespace, title=f'note {i}', content={})
+            Note.objects.filter(pk=note.pk).update(created_at=now - timedelta(seconds=i // 3))
+
+        self.expected = list(
+            Note.objects.filter(notespace=self.notespace).order_by('-created_at', '-id').values_list('uuid', flat=True)
+        )
+
+    def _list(self, url='/api/notes/', **params):
+        response = self.client.get(url, data=params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_offset_pagination(self):
+        data = self._list(notespace=self.notespace.uuid, limit=10)
+        self.assertEqual(data['count'], len(self.expected))
+        self.assertEqual(len(data['results']), 10)
+
+    def test_cursor_pagination(self):
+        data = self._list(notespace=self.notespace.uuid, pagination='cursor', limit=7)
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+
+        seen = [item['uuid'] for item in data['results']]
+        pages = [data]
+        while data['next']:
+            data = self._list(data['next'])
+            seen += [item['uuid'] for item in data['results']]
+            pages.append(data)
+        self.assertEqual(seen, [str(uuid) for uuid in self.expected])
+
+        # walk back from the last page
+        data = pages[-1]
+        for page in reversed(pages[:-1]):
+            data = self._list(data['previous'])
+            self.assertEqual(data['results'], page['results'])
+
+    def test_cursor_pagination_concurrent_insert(self):
+        first = self._list(notespace=self.notespace.uuid, pagination='cursor', limit=5)
+
+        # a new note is inserted before the client requests the next page
+        Note.objects.create(notespace=self.notespace, title='new note', content={})
+
+        second = self._list(first['next'])
+        self.assertEqual(
+            [item['uuid'] for item in first['results'] + second['results']],
+            [str(uuid) for uuid in self.expected[:10]],
+        )
+
+    def test_cursor_pagination_invalid_cursor(self):
+        response = self.client.get('/api/notes/', data={'notespace': self.notespace.uuid, 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_pagination_notelogs(self):
+        note = Note.objects.filter(pk=1).first()
+        data = self._list('/api/notelogs/', note=note.uuid, pagination='cursor')
+        self.assertEqual(len(data['results']), note.logs.count())
+        self.assertIsNone(data['next'])
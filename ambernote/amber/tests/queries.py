@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import Note, NoteLog, NoteSpace, NoteSpaceMember, Tag
+from ambernote.amber.search import index_note
+from ambernote.authx.models import User
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    List endpoints run a fixed number of queries whatever the page size,
+    a query added for each item (N+1) or beyond the budget fails the suite.
+    """
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    # the budget includes loading the session and the user, and checking the role
+    budgets = {
+        'notes': 7,
+        'notes_summary': 7,
+        'search': 7,
+        'sync': 9,  # and the settled marks of logs and tombstones
+        'tags': 6,
+        'members': 6,
+        'notelogs': 7,
+        'activity': 6,
+        'notespaces': 7,
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+        self.user = User.objects.filter(pk=1).first()
+        self.tag = Tag.objects.filter(pk=1).first()
+        self.note = Note.objects.filter(pk=1).first()
+
+    def _add_items(self, count: int):
+        start = Note.objects.count()
+        for i in range(start, start + count):
+            note = Note.objects.create(notespace=self.notespace, title=f'budget {i}', content={})
+            note.tags.add(self.tag, Tag.objects.create(notespace=self.notespace, name=f'budget {i}'))
+            index_note(note)
+            NoteLog.objects.create(note=self.note, user=self.user, action=NoteLog.Action.UPDATED)
+            space = NoteSpace.objects.create(name=f'budget {i}')
+            user = User.objects.create(email=f'budget{i}@example.com')
+            NoteSpaceMember.objects.create(notespace=space, user=user, role=NoteSpaceMember.Role.OWNER)
+            NoteSpaceMember.objects.create(notespace=self.notespace, user=user, role=NoteSpaceMember.Role.GUEST)
+
+    def _count_queries(self, url: str, params: dict) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data={**params, 'limit': 100})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_budgets(self):
+        endpoints = {
+            'notes': ('/api/notes/', {'notespace': self.notespace.uuid}),
+            'notes_summary': ('/api/notes/', {'notespace': self.notespace.uuid, 'view': 'summary'}),
+            'search': ('/api/notes/search/', {'notespace': self.notespace.uuid, 'q': 'budget'}),
+            'sync': ('/api/notes/sync/', {'notespace': self.notespace.uuid}),
+            'tags': ('/api/tags/', {'notespace': self.notespace.uuid}),
+            'members': ('/api/members/', {'notespace': self.notespace.uuid}),
+            'notelogs': ('/api/notelogs/', {'note': self.note.uuid}),
+            'activity': ('/api/notelogs/', {'notespace': self.notespace.uuid}),
+            'notespaces': ('/api/notespaces/', {}),
+        }
+        self._add_items(2)
+        few = {name: self._count_queries(*endpoint) for name, endpoint in endpoints.items()}
+        self._add_items(20)
+        many = {name: self._count_queries(*endpoint) for name, endpoint in endpoints.items()}
+        for name in endpoints:
+            self.assertEqual(few[name], many[name], f'{name}: queries grow with the number of items')
+            self.assertLessEqual(many[name], self.budgets[name], f'{name}: over the query budget')
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import Note, NoteSearchTerm, NoteSpace
+from ambernote.authx.models import User
+
+
+def doc(text):
+    return {'type': 'doc', 'content': [{'type': 'paragraph', 'content': [{'type': 'text', 'text': text}]}]}
+
+
+class SearchTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+
+    def _add_note(self, title, text):
+        data = {'notespace': self.notespace.uuid, 'title': title, 'content': doc(text)}
+        response = self.client.post('/api/notes/', data=data, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Note.objects.filter(notespace=self.notespace).order_by('-id').first()
+
+    def _search(self, q):
+        response = self.client.get('/api/notes/search/', data={'notespace': self.notespace.uuid, 'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [item['uuid'] for item in response.json()['results']]
+
+    def test_search(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        apple = self._add_note('Apple pie', 'Bake the apple pie for forty minutes.')
+        banana = self._add_note('Shopping list', 'Apples, bananas and milk. Apple juice.')
+        chinese = self._add_note('周末计划', '去公园散步')
+
+        # title matches rank higher, all terms are required
+        self.assertEqual(self._search('apple'), [str(apple.uuid), str(banana.uuid)])
+        self.assertEqual(self._search('APPLE juice'), [str(banana.uuid)])
+        self.assertEqual(self._search('公园'), [str(chinese.uuid)])
+        self.assertEqual(self._search('nothing'), [])
+
+        # update
+        response = self.client.patch(f'/api/notes/{banana.uuid}/', data={'content': doc('Milk only')}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._search('apple'), [str(apple.uuid)])
+        self.assertEqual(self._search('milk'), [str(banana.uuid)])
+
+        # trash and restore
+        self.client.post(f'/api/notes/{apple.uuid}/delete/')
+        self.assertEqual(self._search('apple'), [])
+        self.client.post(f'/api/notes/{apple.uuid}/restore/')
+        self.assertEqual(self._search('apple'), [str(apple.uuid)])
+
+    def test_search_denied(self):
+        self.client.force_login(User.objects.filter(pk=5).first())  # not belong to notespace
+        response = self.client.get('/api/notes/search/', data={'notespace': self.notespace.uuid, 'q': 'test'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_search_missing_query(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        response = self.client.get('/api/notes/search/', data={'notespace': self.notespace.uuid})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_search_index(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        self.assertFalse(NoteSearchTerm.objects.exists())  # notes in fixture are not indexed
+
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        note = Note.objects.filter(pk=1).first()
+        self.assertEqual(self._search('test content'), [str(note.uuid)])
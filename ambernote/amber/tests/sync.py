@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import Note, NoteLog, NoteSpace
+from ambernote.amber.sync import SyncToken, decode_token, encode_token
+from ambernote.authx.models import User
+
+
+class SyncTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+
+    def _sync(self, token=None, **params):
+        params['notespace'] = self.notespace.uuid
+        if token is not None:
+            params['token'] = token
+        response = self.client.get('/api/notes/sync/', data=params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _add_note(self, title):
+        data = {'notespace': self.notespace.uuid, 'title': title, 'content': {}}
+        response = self.client.post('/api/notes/', data=data, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Note.objects.filter(notespace=self.notespace).order_by('-id').first()
+
+    @override_settings(SYNC_SAFETY_WINDOW_SECONDS=0)
+    def test_sync(self):
+        self.client.force_login(User.objects.filter(pk=1).first())  # as admin
+        note = Note.objects.filter(pk=1).first()
+
+        # initial sync returns all notes
+        data = self._sync()
+        self.assertEqual([item['uuid'] for item in data['notes']], [str(note.uuid)])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+
+        # nothing changed
+        token = data['token']
+        data = self._sync(token)
+        self.assertEqual(data['notes'], [])
+        self.assertEqual(data['token'], token)
+
+        # changes since last sync
+        new_note = self._add_note('new note')
+        self.client.post(f'/api/notes/{note.uuid}/archive/')
+        data = self._sync(token)
+        self.assertEqual([item['uuid'] for item in data['notes']], [str(new_note.uuid), str(note.uuid)])
+        self.assertTrue(data['notes'][1]['is_archived'])
+
+        # permanently deleted notes
+        token = data['token']
+        self.client.delete(f'/api/notes/{new_note.uuid}/')
+        data = self._sync(token)
+        self.assertEqual(data['notes'], [])
+        self.assertEqual([item['uuid'] for item in data['deleted']], [str(new_note.uuid)])
+
+    def test_sync_has_more(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        for i in range(3):
+            self._add_note(f'note {i}')
+
+        seen, token, has_more = [], None, True
+        while has_more:
+            data = self._sync(token, limit=2)
+            self.assertLessEqual(len(data['notes']), 2)
+            seen += [item['uuid'] for item in data['notes']]
+            token, has_more = data['token'], data['has_more']
+        self.assertCountEqual(seen, [str(uuid) for uuid in Note.objects.values_list('uuid', flat=True)])
+
+    def test_sync_late_commit(self):
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        first, second = self._add_note('first'), self._add_note('second')
+        # the log of the first note is committed after the second note was synced
+        late_log = NoteLog.objects.get(note=first)
+        late_log_id = late_log.id
+        late_log.delete()
+        data = self._sync()
+        self.assertEqual([item['uuid'] for item in data['notes']][-1:], [str(second.uuid)])
+        self.assertNotIn(str(first.uuid), [item['uuid'] for item in data['notes']])
+        late_log.id = late_log_id
+        late_log.save(force_insert=True)
+
+        # changes in the safety window are returned again
+        data = self._sync(data['token'])
+        self.assertEqual([item['uuid'] for item in data['notes']], [str(first.uuid), str(second.uuid)])
+
+        # changes older than the window are settled
+        NoteLog.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        data = self._sync(data['token'])
+        self.assertEqual(len(data['notes']), 2)
+        data = self._sync(data['token'])
+        self.assertEqual(data['notes'], [])
+
+    def test_sync_token(self):
+        token = SyncToken(5, 2, 3, 1)
+        self.assertEqual(decode_token(encode_token(token)), token)
+        # tokens without settled marks
+        self.assertEqual(decode_token(encode_token(SyncToken(5, 2)[:2])), SyncToken(5, 2, 5, 2))
+        with self.assertRaises(ValueError):
+            decode_token(encode_token((1, 2, 3)))
+
+    def test_sync_invalid_token(self):
+        self.client.force_login(User.objects.filter(pk=4).first())  # as guest
+        response = self.client.get('/api/notes/sync/', data={'notespace': self.notespace.uuid, 'token': 'invalid'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sync_denied(self):
+        self.client.force_login(User.objects.filter(pk=5).first())  # not belong to notespace
+        response = self.client.get('/api/notes/sync/', data={'notespace': self.notespace.uuid})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,56 @@
+import json
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ambernote.amber.models import NoteSpace
+from ambernote.authx.models import User
+
+
+def parse_server_timing(header: str) -> dict[str, dict[str, str]]:
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class ServerTimingTestCase(TestCase):
+    fixtures = (
+        'testdata-1.yaml',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(User.objects.filter(pk=3).first())  # as member
+        self.notespace = NoteSpace.objects.filter(pk=1).first()
+
+    def test_server_timing(self):
+        with self.assertLogs('ambernote.timing', level='INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notes/', data={'notespace': self.notespace.uuid})
+        self.assertEqual(response.status_code, 200)
+
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(set(metrics), {'db', 'perm', 'serialize', 'total', 'db-queries'})
+        self.assertEqual(metrics['db-queries']['desc'], f'"{len(queries)}"')
+        self.assertLessEqual(float(metrics['serialize']['dur']), float(metrics['total']['dur']))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'note-list')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], len(queries))
+        self.assertNotIn('queries', record)
+
+    @override_settings(SERVER_TIMING_SLOW_MS=0, SERVER_TIMING_SLOW_SAMPLE_RATE=1)
+    def test_slow_request(self):
+        with self.assertLogs('ambernote.timing', level='WARNING') as logs:
+            self.client.get('/api/notes/', data={'notespace': self.notespace.uuid})
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record['queries']), record['db_queries'])
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in record['queries']))
+
+    def test_not_api(self):
+        response = self.client.get('/dj-admin/login/')
+        self.assertNotIn('Server-Timing', response)
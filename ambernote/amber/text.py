@@ -0,0 +1,76 @@
+"""
+Plain text of note contents.
+
+Content is a document tree (e.g. ProseMirror JSON) whose text nodes are ``{"type": "text", "text": "..."}``,
+other nodes (paragraphs, headings, list items...) are blocks containing them.
+"""
+import re
+from typing import Any, Iterator
+
+# Length of note excerpts shown in lists, in characters
+EXCERPT_LENGTH = 200
+
+# Hiragana, Katakana, CJK Unified Ideographs (and Extension A), Hangul Syllables.
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af'
+# CJK text has no word separators, so each CJK character counts as a word
+_WORD_RE = re.compile(f'[{CJK_CHARS}]|[^\\W_{CJK_CHARS}]+')
+
+
+def extract_text(content) -> Iterator[str]:
+    """
+    Extract texts from note content.
+    """
+    if isinstance(content, str):
+        yield content
+    elif isinstance(content, dict):
+        if isinstance(content.get('text'), str):
+            yield content['text']
+        for key, value in content.items():
+            if key != 'text' and isinstance(value, (dict, list)):
+                yield from extract_text(value)
+    elif isinstance(content, list):
+        for value in content:
+            yield from extract_text(value)
+
+
+def _extract_blocks(content, blocks: list[str]) -> None:
+    # texts in the same block are joined as they are (a word may be split by marks), blocks are separated
+    if isinstance(content, str):
+        blocks += [content, '']
+    elif isinstance(content, dict):
+        if isinstance(content.get('text'), str):
+            blocks[-1] += content['text']
+            return
+        blocks.append('')
+        for value in content.values():
+            if isinstance(value, (dict, list)):
+                _extract_blocks(value, blocks)
+        blocks.append('')
+    elif isinstance(content, list):
+        for value in content:
+            _extract_blocks(value, blocks)
+
+
+def plain_text(content) -> str:
+    """
+    Get the plain text of note content, blocks are separated by a space and whitespaces are collapsed.
+    """
+    blocks = ['']
+    _extract_blocks(content, blocks)
+    return ' '.join(' '.join(blocks).split())
+
+
+def summarize(content: Any) -> tuple[str, int]:
+    """
+    Summarize note content.
+    :returns: (excerpt of at most EXCERPT_LENGTH characters, word count)
+    """
+    text = plain_text(content)
+    word_count = sum(1 for _ in _WORD_RE.finditer(text))
+    if len(text) <= EXCERPT_LENGTH:
+        return text, word_count
+
+    excerpt = text[:EXCERPT_LENGTH - 1]
+    if text[EXCERPT_LENGTH - 1] != ' ' and ' ' in excerpt:
+        excerpt = excerpt.rsplit(' ', 1)[0]  # do not cut a word
+    return excerpt.rstrip() + '\u2026', word_count  # with an ellipsis
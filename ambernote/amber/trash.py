@@ -0,0 +1,63 @@
+"""
+Permanent deletion of notes which have been in the trash for a period of time.
+
+It is run by the ``purge_trash`` command, and :func:`purge_trash` may be called by any scheduler as well.
+"""
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Note, NoteTombstone
+
+logger = logging.getLogger(__name__)
+
+
+def purge_trash(older_than: Optional[timedelta] = None, batch_size: int = 100, sleep: float = 0) -> Counter:
+    """
+    Permanently delete notes moved to the trash before `older_than` ago (default TRASH_RETENTION_DAYS),
+    `batch_size` notes in each transaction, with their tags, logs and search terms.
+    Tombstones are left for sync clients.
+    Sleep `sleep` seconds between transactions to leave room for other queries.
+    :returns: number of deleted rows by model label
+    """
+    if older_than is None:
+        older_than = timedelta(days=settings.TRASH_RETENTION_DAYS)
+    cutoff = timezone.now() - older_than
+    expired = Note.objects.filter(is_deleted=True, deleted_at__lt=cutoff)
+
+    deleted: Counter = Counter()
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # lock the notes, so that they can not be restored while being deleted
+            notes = list(
+                expired
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .select_for_update(skip_locked=True)
+                .values_list('id', 'uuid', 'notespace_id')[:batch_size]
+            )
+            if not notes:
+                break
+            last_id = notes[-1][0]
+
+            NoteTombstone.objects.bulk_create([
+                NoteTombstone(notespace_id=notespace_id, note_uuid=uuid)
+                for _, uuid, notespace_id in notes
+            ])
+            # related rows (tags, logs and search terms) are deleted by cascade with a DELETE statement for each table,
+            # only primary keys of notes are loaded, not their contents
+            _, counts = Note.objects.filter(id__in=[note_id for note_id, _, _ in notes]).only('id').delete()
+            deleted.update(counts)
+
+        logger.debug(f'Purged notes up to {last_id}: {dict(deleted)}')
+        if sleep:
+            time.sleep(sleep)
+
+    return deleted
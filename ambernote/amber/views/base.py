@@ -1,9 +1,17 @@
+import copy
+from typing import Optional
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
 from django.http import Http404
 from django.utils.translation import gettext_lazy as _
 from drf_yasg import openapi
-from rest_framework import exceptions, permissions, viewsets
+from rest_framework import exceptions, permissions, serializers, viewsets
 from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
+from ambernote.pagination import KeysetPagination
+from ambernote.timing import TimedSerializerMixin, timer
+from ..etags import not_modified_response, page_etag
 from ..models import NoteSpace
 from ..permissions import IsNoteSpaceGuest, IsNoteSpaceOwner
 
@@ -15,20 +23,216 @@ NoteSpaceParameter = openapi.Parameter(
     required=True,
 )
 
-NoteParameter = openapi.Parameter(
-    name='note',
+PaginationParameter = openapi.Parameter(
+    name='pagination',
     in_=openapi.IN_QUERY,
     type=openapi.TYPE_STRING,
-    description=_('UUID of the note'),
-    required=True,
+    enum=['offset', 'cursor'],
+    description=_('Pagination mode, "cursor" pages by (created_at, id) and skips counting (default: offset)'),
+    required=False,
+)
+
+CursorParameter = openapi.Parameter(
+    name='cursor',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('Opaque cursor taken from the "next" or "previous" link, implies cursor pagination'),
+    required=False,
+)
+
+FieldsParameter = openapi.Parameter(
+    name='fields',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('Comma-separated fields to return, e.g. "uuid,title" (default: all fields)'),
+    required=False,
+)
+
+ExpandParameter = openapi.Parameter(
+    name='expand',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('Comma-separated relations to embed, other relations are returned as identifiers '
+                  '(default: all relations are embedded)'),
+    required=False,
 )
 
 
+def _parse_names(value: Optional[str]) -> Optional[set[str]]:
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def _is_to_one(model, name: str) -> bool:
+    try:
+        model_field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return model_field.many_to_one or model_field.one_to_one
+
+
+def _loads_related(field: serializers.Field) -> bool:
+    """
+    Check if the serializer field reads related objects, rather than their primary keys only.
+    """
+    if isinstance(field, serializers.ManyRelatedField):
+        field = field.child_relation
+    if isinstance(field, serializers.RelatedField):
+        return not field.use_pk_only_optimization()
+    return isinstance(field, serializers.BaseSerializer)
+
+
+class DynamicFieldsSerializerMixin(TimedSerializerMixin):
+    """
+    Serializer mixin pruning fields by the `fields` and `expand` query parameters (passed by the view in the context).
+    As it is the mixin of every representation of the API, it also times the serialization.
+
+    Relations in `collapsed_fields` are embedded if they are expanded (or `expand` is not given),
+    otherwise they are replaced by the collapsed field, e.g. a list of uuids.
+    Only the serializer at the top level is pruned, not the ones nested in it.
+    """
+    collapsed_fields: dict[str, serializers.Field] = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if parent is not None:
+            return fields
+
+        requested, expand = self.context.get('fields'), self.context.get('expand')
+        if requested is not None:
+            fields = type(fields)((name, field) for name, field in fields.items() if name in requested)
+        if expand is not None:
+            for name, field in self.collapsed_fields.items():
+                if name in fields and name not in expand:
+                    fields[name] = copy.deepcopy(field)
+        return fields
+
+    @classmethod
+    def prune_queryset(cls, queryset, context: dict, required_fields=()):
+        """
+        Plan the queryset from the serialized fields, so that a page costs a fixed number of queries:
+        related objects are joined (to-one) or prefetched (to-many, with the related objects of their own),
+        only if they are serialized. Model fields are only pruned if `fields` is given.
+        :param required_fields: model fields always loaded, e.g. for permission checks
+        """
+        model = queryset.model
+        only, select, prefetch = {model._meta.pk.name, *required_fields}, [], []
+        for field in cls(context=context).fields.values():
+            if len(field.source_attrs) == 2 and _is_to_one(model, field.source_attrs[0]):
+                # a field of a related object, e.g. "body.content"
+                select.append(field.source_attrs[0])
+                if only is not None:
+                    only.add('__'.join(field.source_attrs))
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:  # e.g. "*" or a property, which may need any field
+                only = None
+                continue
+
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.append(field.source)
+                child = getattr(field, 'child', None)
+                if isinstance(child, serializers.ModelSerializer):
+                    related_model = model_field.related_model
+                    prefetch += [
+                        f'{field.source}__{child_field.source}'
+                        for child_field in child.fields.values()
+                        if _is_to_one(related_model, child_field.source) and _loads_related(child_field)
+                    ]
+                # related objects read by a collapsed field, e.g. the users of members
+                relation = getattr(field, 'child_relation', None)
+                prefetch += [f'{field.source}__{lookup}' for lookup in getattr(relation, 'related_lookups', ())]
+            elif model_field.concrete:
+                if only is not None:
+                    only.add(field.source)
+                if model_field.is_relation and _loads_related(field):
+                    select.append(field.source)
+
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if only is not None and context.get('fields') is not None:
+            queryset = queryset.only(*only)
+        return queryset
+
+
 class BaseViewSet(viewsets.ModelViewSet):
     """Base viewset for all models"""
 
     ordering = ('-created_at',)
 
+    # model fields always loaded (see DynamicFieldsSerializerMixin.prune_queryset)
+    required_fields = ()
+
+    # embedded to-many relations, whose changes change the ETag of a list (see etags.page_etag)
+    etag_relations: tuple[str, ...] = ()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        params = getattr(self.request, 'query_params', {})
+        context['fields'] = _parse_names(params.get('fields'))
+        context['expand'] = _parse_names(params.get('expand'))
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if self.action in ('list', 'retrieve') and issubclass(serializer_class, DynamicFieldsSerializerMixin):
+            # fields in the ordering are also read by keyset pagination, and the update time by ETags
+            ordering = [field.lstrip('-') for field in queryset.query.order_by if isinstance(field, str)]
+            required_fields = {*self.required_fields, *ordering, 'updated_at'}
+            queryset = serializer_class.prune_queryset(queryset, self.get_serializer_context(), required_fields)
+        return queryset
+
+    def _etag_queryset(self, queryset):
+        """
+        Plan the queryset of the list to only load what the ETag of a page is made of.
+        """
+        paginator_ordering = getattr(self.paginator, 'ordering', ())
+        ordering = [field.lstrip('-') for field in (*queryset.query.order_by, *paginator_ordering)
+                    if isinstance(field, str)]
+        relations = [lookup for lookup in queryset._prefetch_related_lookups if lookup in self.etag_relations]
+        return queryset.select_related(None).prefetch_related(None).prefetch_related(*relations) \
+            .only(queryset.model._meta.pk.name, 'updated_at', *ordering)
+
+    def _page_etag(self, page: list) -> str:
+        # what else the page depends on: the total count (limit/offset) or the surrounding pages (keyset)
+        state = tuple(getattr(self.paginator, name, None) for name in ('count', 'has_next', 'has_previous'))
+        key = f'{self.request.get_full_path()}|{self.request.accepted_media_type}'
+        return page_etag(page, key, state, self.etag_relations)
+
+    def list(self, request, *args, **kwargs):
+        """
+        List objects with an ETag of the page, and respond 304 Not Modified without loading them
+        (but their ids and update times) if they have not changed since the ETag sent by If-None-Match.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if 'If-None-Match' in request.headers:
+            etag_queryset = self._etag_queryset(queryset)
+            page = self.paginate_queryset(etag_queryset)
+            response = not_modified_response(request, self._page_etag(page if page is not None else etag_queryset))
+            if response is not None:
+                return response
+
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else list(queryset)
+        serializer = self.get_serializer(objects, many=True)
+        response = self.get_paginated_response(serializer.data) if page is not None else Response(serializer.data)
+        response['ETag'] = self._page_etag(objects)
+        return response
+
+    def check_permissions(self, request):
+        with timer('perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timer('perm'):
+            super().check_object_permissions(request, obj)
+
     def get_permissions(self):
         if self.action == 'list':
             return self.get_list_permissions()
@@ -71,20 +275,65 @@ class BaseViewSet(viewsets.ModelViewSet):
 
 
 class NoteSpaceRelatedModelViewSetMixin:
+    cursor_pagination_class = KeysetPagination
+
+    # the notespace is needed for permission checks
+    required_fields = ('notespace',)
+
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination for LIST action when the client asks for it with `?pagination=cursor`
+        (or follows a cursor link), otherwise the default limit/offset pagination.
+        """
+        if not hasattr(self, '_paginator'):
+            params = getattr(self.request, 'query_params', {})
+            cursor_requested = (params.get('pagination') == 'cursor'
+                                or self.cursor_pagination_class.cursor_query_param in params)
+            if self.action == 'list' and cursor_requested:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def get_query_notespace(self) -> NoteSpace:
+        """
+        Get the notespace passed by the `notespace` query parameter.
+        :raises ParseError: if the parameter is missing
+        :raises Http404: if the notespace does not exist
+        """
+        # check if the notespace is passed as a query parameter
+        if 'notespace' not in self.request.query_params:
+            raise exceptions.ParseError('Missing notespace parameter')
+
+        try:
+            return NoteSpace.objects.get(uuid=self.request.query_params['notespace'])
+        except (NoteSpace.DoesNotExist, DjangoValidationError):
+            raise Http404
+
+    def has_notespace_perms(self, notespace=None) -> bool:
+        """
+        Check if the user has permission to access the notespace.
+        """
+        with timer('perm'):
+            perms = self.get_permissions()
+            for perm in perms:
+                if callable(perm):
+                    perm = perm()
+                if hasattr(perm, 'has_object_permission') and notespace is not None:
+                    if not perm.has_object_permission(self.request, self, notespace):
+                        return False
+                if hasattr(perm, 'has_permission') and not perm.has_permission(self.request, self):
+                    return False
+            return True
+
     def check_notespace_perms(self, notespace=None) -> None:
         """
         Check if the user has permission to access the notespace.
         :raises PermissionDenied: if request.user does not have required permissions
         """
-        perms = self.get_permissions()
-        for perm in perms:
-            if callable(perm):
-                perm = perm()
-            if hasattr(perm, 'has_object_permission') and notespace is not None:
-                if not perm.has_object_permission(self.request, self, notespace):
-                    self.permission_denied(self.request, message='Permission denied')
-            if hasattr(perm, 'has_permission') and not perm.has_permission(self.request, self):
-                self.permission_denied(self.request, message='Permission denied')
+        if not self.has_notespace_perms(notespace):
+            self.permission_denied(self.request, message='Permission denied')
 
     def list(self, request, *args, **kwargs):
         """
@@ -92,14 +341,7 @@ class NoteSpaceRelatedModelViewSetMixin:
         Action "list" only perform permission check on global level.
         So we need to check the object level permission manually here.
         """
-        # check if the notespace is passed as a query parameter
-        if 'notespace' not in self.request.query_params:
-            raise exceptions.ParseError('Missing notespace parameter')
-
-        try:
-            notespace = NoteSpace.objects.get(uuid=self.request.query_params['notespace'])
-        except NoteSpace.DoesNotExist:
-            raise Http404
+        notespace = self.get_query_notespace()
 
         # check if the user has permission to access the notespace
         self.check_notespace_perms(notespace)
@@ -3,11 +3,12 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework import serializers
 
 from ambernote.authx.models import User
-from .base import BaseViewSet, NoteSpaceParameter, NoteSpaceRelatedModelViewSetMixin
+from .base import BaseViewSet, CursorParameter, DynamicFieldsSerializerMixin, FieldsParameter, NoteSpaceParameter, \
+    NoteSpaceRelatedModelViewSetMixin, PaginationParameter
 from ..models import NoteSpace, NoteSpaceMember
 
 
-class MemberRetrieveSerializer(serializers.ModelSerializer):
+class MemberRetrieveSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = NoteSpaceMember
         fields = ('id', 'notespace', 'user', 'role', 'created_at', 'updated_at')
@@ -50,6 +51,6 @@ class MemberViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
         operation_description=_(
             'List all members of the notespace (Role 1 is owner, 2 is member, 3 is guest).'
         ),
-        manual_parameters=[NoteSpaceParameter])
+        manual_parameters=[NoteSpaceParameter, PaginationParameter, CursorParameter, FieldsParameter])
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -1,14 +1,59 @@
+from collections import defaultdict
+
 from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import permissions, serializers, status
+from rest_framework import exceptions, permissions, serializers, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from .base import BaseViewSet, NoteSpaceParameter, NoteSpaceRelatedModelViewSetMixin
-from ..models import Note, NoteLog, NoteSpace, Tag
-from ..permissions import IsNoteSpaceMember
+from .base import BaseViewSet, CursorParameter, DynamicFieldsSerializerMixin, ExpandParameter, FieldsParameter, \
+    NoteSpaceParameter, NoteSpaceRelatedModelViewSetMixin, PaginationParameter
+from ..etags import not_modified_response, note_etag, parse_if_match
+from ..history import build_created_extras, build_updated_extras
+from ..jsonpatch import JsonPatchError, apply_patch
+from ..models import Note, NoteBody, NoteLog, NoteSpace, NoteTombstone, Tag
+from ..permissions import IsNoteSpaceGuest, IsNoteSpaceMember
+from ..search import index_note, index_notes, search_notes, unindex_note, unindex_notes
+from ..sync import SyncToken, decode_token, encode_token, get_changes
+
+SearchQueryParameter = openapi.Parameter(
+    name='q',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('Search query, notes containing all words of the query are returned'),
+    required=True,
+)
+
+ListViewParameter = openapi.Parameter(
+    name='view',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    enum=['full', 'summary'],
+    description=_('"summary" returns an excerpt and word count instead of the content (default: full)'),
+    required=False,
+)
+
+SyncTokenParameter = openapi.Parameter(
+    name='token',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('Sync token returned by the previous sync, omit it to get all notes'),
+    required=False,
+)
+
+SyncLimitParameter = openapi.Parameter(
+    name='limit',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_INTEGER,
+    description=_('Maximum number of changed notes (and deleted notes) returned (default: 100, max: 1000)'),
+    required=False,
+)
 
 
 class EmbeddedTagSerializer(serializers.ModelSerializer):
@@ -24,20 +69,139 @@ class NoteCreateSerializer(serializers.ModelSerializer):
         fields = ('title', 'content', 'notespace')
         write_only_fields = fields
 
+    content = serializers.JSONField()
     notespace = serializers.SlugRelatedField(slug_field='uuid', queryset=NoteSpace.objects.all())
 
 
-class NoteRetrieveSerializer(serializers.ModelSerializer):
+class NoteRetrieveSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Note
-        fields = ('uuid', 'title', 'content', 'revision', 'notespace',
-                  'is_archived', 'is_pinned', 'is_deleted', 'tags',
+        fields = ('uuid', 'title', 'content', 'excerpt', 'word_count', 'revision', 'notespace',
+                  'is_archived', 'is_pinned', 'is_deleted', 'deleted_at', 'tags',
                   'created_at', 'updated_at')
         read_only_fields = fields
 
+    content = serializers.JSONField(source='body.content', read_only=True)
     notespace = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
     tags = EmbeddedTagSerializer(many=True, read_only=True)
 
+    collapsed_fields = {
+        'tags': serializers.SlugRelatedField(slug_field='uuid', many=True, read_only=True),
+    }
+
+
+class NoteSummarySerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
+    """
+    Note without its content, for lists.
+    """
+
+    class Meta:
+        model = Note
+        fields = ('uuid', 'title', 'excerpt', 'word_count', 'revision', 'notespace',
+                  'is_archived', 'is_pinned', 'is_deleted', 'deleted_at', 'tags',
+                  'created_at', 'updated_at')
+        read_only_fields = fields
+
+    notespace = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
+    tags = EmbeddedTagSerializer(many=True, read_only=True)
+
+    collapsed_fields = {
+        'tags': serializers.SlugRelatedField(slug_field='uuid', many=True, read_only=True),
+    }
+
+
+class NoteSearchResultSerializer(NoteRetrieveSerializer):
+    class Meta(NoteRetrieveSerializer.Meta):
+        fields = NoteRetrieveSerializer.Meta.fields + ('score',)
+        read_only_fields = fields
+
+    score = serializers.IntegerField(read_only=True)
+
+
+class NoteTombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NoteTombstone
+        fields = ('uuid', 'deleted_at')
+        read_only_fields = fields
+
+    uuid = serializers.UUIDField(source='note_uuid', read_only=True)
+    deleted_at = serializers.DateTimeField(source='created_at', read_only=True)
+
+
+class NoteSyncSerializer(serializers.Serializer):
+    token = serializers.CharField(read_only=True, help_text=_('Token for the next sync'))
+    has_more = serializers.BooleanField(read_only=True, help_text=_('Sync again with the token immediately'))
+    notes = NoteRetrieveSerializer(many=True, read_only=True, help_text=_('Created or changed notes'))
+    deleted = NoteTombstoneSerializer(many=True, read_only=True, help_text=_('Permanently deleted notes'))
+
+
+class NoteBulkActionSerializer(serializers.Serializer):
+    # action name => (flag name, flag value, log action)
+    FLAG_ACTIONS = {
+        'archive': ('is_archived', True, NoteLog.Action.ARCHIVED),
+        'unarchive': ('is_archived', False, NoteLog.Action.UNARCHIVED),
+        'pin': ('is_pinned', True, NoteLog.Action.PINNED),
+        'unpin': ('is_pinned', False, NoteLog.Action.UNPINNED),
+        'delete': ('is_deleted', True, NoteLog.Action.DELETED),
+        'restore': ('is_deleted', False, NoteLog.Action.RESTORED),
+    }
+
+    action = serializers.ChoiceField(choices=list(FLAG_ACTIONS))
+    notes = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=1000,
+                                  help_text=_('UUIDs of the notes'))
+
+
+class NoteBulkResultSerializer(serializers.Serializer):
+    class Status:
+        UPDATED = 'updated'
+        UNCHANGED = 'unchanged'  # the flag already has the value
+        NOT_FOUND = 'not_found'
+        DENIED = 'denied'
+
+    uuid = serializers.UUIDField(read_only=True)
+    ok = serializers.BooleanField(read_only=True)
+    status = serializers.ChoiceField(
+        choices=[Status.UPDATED, Status.UNCHANGED, Status.NOT_FOUND, Status.DENIED], read_only=True)
+
+
+class NoteTagsSerializer(serializers.Serializer):
+    class Mode:
+        SET = 'set'  # replace all tags of the notes
+        ADD = 'add'
+        REMOVE = 'remove'
+
+    notespace = serializers.SlugRelatedField(slug_field='uuid', queryset=NoteSpace.objects.all())
+    mode = serializers.ChoiceField(choices=[Mode.SET, Mode.ADD, Mode.REMOVE])
+    notes = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=1000,
+                                  help_text=_('UUIDs of the notes'))
+    tags = serializers.ListField(child=serializers.UUIDField(), max_length=100,
+                                 help_text=_('UUIDs of the tags'))
+
+    def validate(self, attrs):
+        uuids = set(attrs['tags'])
+        tags = list(Tag.objects.filter(notespace=attrs['notespace'], uuid__in=uuids))
+        if len(tags) != len(uuids):
+            missing = uuids - {tag.uuid for tag in tags}
+            raise serializers.ValidationError({
+                'tags': [f'Tag {uuid} does not exist in the notespace.' for uuid in sorted(map(str, missing))],
+            })
+        attrs['tags'] = tags
+        return attrs
+
+
+class NoteTagsResultSerializer(serializers.Serializer):
+    class Status:
+        UPDATED = 'updated'
+        UNCHANGED = 'unchanged'
+        NOT_FOUND = 'not_found'
+
+    uuid = serializers.UUIDField(read_only=True)
+    ok = serializers.BooleanField(read_only=True)
+    status = serializers.ChoiceField(choices=[Status.UPDATED, Status.UNCHANGED, Status.NOT_FOUND], read_only=True)
+    added = serializers.ListField(child=serializers.UUIDField(), read_only=True, help_text=_('UUIDs of added tags'))
+    removed = serializers.ListField(child=serializers.UUIDField(), read_only=True,
+                                    help_text=_('UUIDs of removed tags'))
+
 
 class NoteUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -45,41 +209,123 @@ class NoteUpdateSerializer(serializers.ModelSerializer):
         fields = ('title', 'content')
         write_only_fields = fields
 
+    content = serializers.JSONField()
+
     def update(self, instance, validated_data):
+        """
+        Update the note, or if `expected_revisions` is passed (see `save`),
+        update it only if its revision is still one of them.
+        :raises NotePreconditionFailed: if the revision is not expected
+        """
+        expected_revisions = validated_data.pop('expected_revisions', None)
         with transaction.atomic():
             # check if really updated
-            if any([
+            changed = any([
                 instance.title != validated_data.get('title', instance.title),
                 instance.content != validated_data.get('content', instance.content),
-            ]):
-                instance.revision += 1  # increase revision
+            ])
+            old_title, old_content = instance.title, instance.content
+            if expected_revisions is None:
+                instance = super().update(instance, validated_data)  # revision is increased by Note.save
+            else:
+                self._compare_and_swap(instance, validated_data, expected_revisions, changed)
+            if changed:
                 NoteLog.objects.create(
                     note=instance,
                     user=self.context['request'].user,
                     action=NoteLog.Action.UPDATED,
-                    extras={
-                        'old': {
-                            'title': instance.title,
-                            'content': instance.content,
-                        },
-                        'new': {
-                            'title': validated_data.get('title', instance.title),
-                            'content': validated_data.get('content', instance.content),
-                        },
-                    },
+                    extras=build_updated_extras(old_title, old_content, instance),
                 )
-            return super().update(instance, validated_data)
+                if not instance.is_deleted:
+                    index_note(instance)
+            return instance
+
+    @staticmethod
+    def _compare_and_swap(instance: Note, validated_data: dict, expected_revisions: list[int], changed: bool):
+        """
+        Update contents of the note by a single conditional UPDATE, no row is locked.
+        """
+        notes = Note.objects.filter(pk=instance.pk, revision__in=expected_revisions)
+        if not changed:
+            if not notes.exists():
+                raise NotePreconditionFailed()
+            return
+
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        values = {field: value for field, value in validated_data.items() if field != 'content'}
+        if 'content' in validated_data:
+            instance.update_summary()
+            values.update(excerpt=instance.excerpt, word_count=instance.word_count)
+
+        updated_at = timezone.now()
+        if not notes.update(revision=F('revision') + 1, updated_at=updated_at, **values):
+            raise NotePreconditionFailed()
+        if 'content' in validated_data:
+            # the note row is locked by the update above until the transaction ends
+            NoteBody.objects.filter(note_id=instance.pk).update(content=validated_data['content'])
+
+        if len(expected_revisions) == 1:
+            instance.revision = expected_revisions[0] + 1
+            instance.updated_at = updated_at
+        else:  # which of them matched is unknown
+            instance.refresh_from_db(fields=['revision', 'updated_at'])
+        instance.mark_contents_saved()
+
+
+class NoteContentPatchSerializer(serializers.Serializer):
+    revision = serializers.IntegerField(min_value=1, help_text=_('Revision of the note the patch is based on'))
+    title = serializers.CharField(max_length=255, allow_blank=True, required=False, help_text=_('New title'))
+    patch = serializers.ListField(child=serializers.DictField(), allow_empty=True,
+                                  help_text=_('JSON Patch (RFC 6902) operations applied to the content'))
+
+
+class NoteRevisionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Note
+        fields = ('uuid', 'revision', 'updated_at')
+        read_only_fields = fields
+
+
+class NoteRevisionConflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('The note has been changed since the base revision.')
+    default_code = 'revision_conflict'
+
+
+class NotePreconditionFailed(exceptions.APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _('The note has been changed, it does not match If-Match.')
+    default_code = 'precondition_failed'
 
 
 class NoteViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
     lookup_field = 'uuid'
     queryset = Note.objects.order_by('-created_at')
+    # needed for permission checks and ETags
+    required_fields = ('notespace', 'uuid', 'revision', 'updated_at')
+    etag_relations = ('tags',)
+
+    sync_default_limit = 100
+    sync_max_limit = 1000
+
+    def is_summary_view(self) -> bool:
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('update', 'partial_update', 'patch_content'):
+            # the content is compared with the new one
+            queryset = queryset.select_related('body')
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create']:
             return NoteCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return NoteUpdateSerializer
+        elif self.is_summary_view():
+            return NoteSummarySerializer
         # otherwise
         return NoteRetrieveSerializer
 
@@ -99,7 +345,7 @@ class NoteViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
         """
         Note can be destroyed by any member of the notespace.
         User should set is_deleted to True instead of destroying the note.
-        And system will destroy the note after a period of time.
+        And system will destroy the note after a period of time (see `purge_trash` command).
         Only admin can destroy the note immediately.
         """
         return [IsAdminUser()]
@@ -118,19 +364,151 @@ class NoteViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
                 note=note,
                 user=self.request.user,
                 action=NoteLog.Action.CREATED,
-                extras={
-                    'title': note.title,
-                    'content': note.content,
-                },
+                extras=build_created_extras(note),
             )
+            index_note(note)
 
     @swagger_auto_schema(
         operation_description=_(
             'List all notes in the notespace. '
             'Permission required notespace guest or above.'),
-        manual_parameters=[NoteSpaceParameter])
+        manual_parameters=[NoteSpaceParameter, ListViewParameter, PaginationParameter, CursorParameter,
+                           FieldsParameter, ExpandParameter])
     def list(self, request, *args, **kwargs):
-        super().list(request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Get the note with its ETag. '
+            'With an If-None-Match header, 304 is returned if the note has not changed. '
+            'Permission required notespace guest or above.'),
+        manual_parameters=[FieldsParameter, ExpandParameter])
+    def retrieve(self, request, *args, **kwargs):
+        if 'If-None-Match' in request.headers:
+            # check the ETag first, so that the note is only loaded with its content and tags if it has changed
+            note = get_object_or_404(Note.objects.only(*self.required_fields), uuid=kwargs[self.lookup_field])
+            self.check_object_permissions(request, note)
+            response = not_modified_response(request, note_etag(note))
+            if response is not None:
+                return response
+
+        note = self.get_object()
+        serializer = self.get_serializer(note)
+        return Response(serializer.data, headers={'ETag': note_etag(note)})
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Update the title and content. '
+            'With an If-Match header (an ETag of the note, or a revision), the note is only updated '
+            'if its revision still matches, otherwise 412 is returned. '
+            'Permission required notespace member or above.'),
+        request_body=NoteUpdateSerializer)
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        note = self.get_object()
+        serializer = self.get_serializer(note, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        if getattr(note, '_prefetched_objects_cache', None):
+            # invalidate the prefetched tags, as UpdateModelMixin does
+            note._prefetched_objects_cache = {}
+        return Response(serializer.data, headers={'ETag': note_etag(serializer.instance)})
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Update the title or content. '
+            'With an If-Match header (an ETag of the note, or a revision), the note is only updated '
+            'if its revision still matches, otherwise 412 is returned. '
+            'Permission required notespace member or above.'),
+        request_body=NoteUpdateSerializer)
+    def partial_update(self, request, *args, **kwargs):
+        return super().partial_update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        expected_revisions = parse_if_match(self.request.headers.get('If-Match'), serializer.instance.uuid)
+        if expected_revisions is None:
+            serializer.save()
+        elif not expected_revisions:
+            raise NotePreconditionFailed()
+        else:
+            serializer.save(expected_revisions=expected_revisions)
+
+    def perform_destroy(self, instance):
+        # leave a tombstone for sync clients
+        with transaction.atomic():
+            NoteTombstone.objects.create(notespace_id=instance.notespace_id, note_uuid=instance.uuid)
+            instance.delete()
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Get notes created or changed (including moved to trash) and notes permanently deleted '
+            'in the notespace since the last sync. '
+            'Sync again with the returned token until has_more is false. '
+            'Changes of the last moments are returned again by the next sync, keep the latest revision of notes. '
+            'Permission required notespace guest or above.'),
+        manual_parameters=[NoteSpaceParameter, SyncTokenParameter, SyncLimitParameter],
+        responses={200: NoteSyncSerializer()})
+    @action(methods=['get'], detail=False, url_path='sync', pagination_class=None,
+            permission_classes=[IsAdminUser | IsNoteSpaceGuest])
+    def sync(self, request, *args, **kwargs):
+        notespace = self.get_query_notespace()
+        self.check_notespace_perms(notespace)
+
+        token = SyncToken()
+        if request.query_params.get('token'):
+            try:
+                token = decode_token(request.query_params['token'])
+            except ValueError as e:
+                raise exceptions.ParseError(str(e))
+
+        try:
+            limit = min(int(request.query_params.get('limit', self.sync_default_limit)), self.sync_max_limit)
+        except ValueError:
+            raise exceptions.ParseError('Invalid limit parameter')
+        if limit <= 0:
+            raise exceptions.ParseError('Invalid limit parameter')
+
+        changes = get_changes(notespace, token, limit)
+        serializer = NoteSyncSerializer({
+            'token': encode_token(changes.token),
+            'has_more': changes.has_more,
+            'notes': changes.notes,
+            'deleted': changes.tombstones,
+        }, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Search notes in the notespace by title and content, the best matches first. '
+            'Notes in the trash are not searched. '
+            'Permission required notespace guest or above.'),
+        manual_parameters=[NoteSpaceParameter, SearchQueryParameter],
+        responses={200: NoteSearchResultSerializer(many=True)})
+    @action(methods=['get'], detail=False, url_path='search',
+            permission_classes=[IsAdminUser | IsNoteSpaceGuest])
+    def search(self, request, *args, **kwargs):
+        notespace = self.get_query_notespace()
+        self.check_notespace_perms(notespace)
+
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            raise exceptions.ParseError('Missing q parameter')
+
+        # paginate the ranking, then load notes of the current page only
+        page = self.paginate_queryset(search_notes(notespace, query))
+        context = self.get_serializer_context()
+        notes = NoteSearchResultSerializer.prune_queryset(Note.objects.all(), context) \
+            .in_bulk([row['note_id'] for row in page])
+        results = []
+        for row in page:
+            note = notes.get(row['note_id'])
+            if note is None:  # deleted after ranking
+                continue
+            note.score = row['score']
+            results.append(note)
+
+        serializer = NoteSearchResultSerializer(results, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
 
     @action(methods=['post'], detail=True, url_path='archive',
             permission_classes=[IsAdminUser | IsNoteSpaceMember])
@@ -180,13 +558,210 @@ class NoteViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
         """
         return self._update_note_flag(request, 'is_deleted', False, NoteLog.Action.RESTORED)
 
+    @swagger_auto_schema(
+        operation_description=_(
+            'Update the content by a JSON Patch (RFC 6902) instead of sending the whole content. '
+            'The patch is rejected with 409 if the note has been changed since the base revision. '
+            'Permission required notespace member or above.'),
+        request_body=NoteContentPatchSerializer,
+        responses={200: NoteRevisionSerializer()})
+    @action(methods=['patch'], detail=True, url_path='content',
+            permission_classes=[IsAdminUser | IsNoteSpaceMember])
+    def patch_content(self, request, *args, **kwargs):
+        # check permissions before validating, so that the payload is not validated for users denied
+        note = self.get_object()
+        serializer = NoteContentPatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        revision = serializer.validated_data['revision']
+        if note.revision != revision:
+            raise NoteRevisionConflict(f'{NoteRevisionConflict.default_detail} '
+                                       f'The current revision is {note.revision}.')
+        try:
+            content = apply_patch(note.content, serializer.validated_data['patch'])
+        except JsonPatchError as e:
+            raise serializers.ValidationError({'patch': [str(e)]})
+
+        validated_data = {'content': content, 'expected_revisions': [revision]}
+        if 'title' in serializer.validated_data:
+            validated_data['title'] = serializer.validated_data['title']
+        try:
+            # the note is only updated if no one has changed it since it was read
+            NoteUpdateSerializer(context=self.get_serializer_context()).update(note, validated_data)
+        except NotePreconditionFailed:
+            raise NoteRevisionConflict()
+
+        return Response(NoteRevisionSerializer(note).data, headers={'ETag': note_etag(note)})
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Archive, unarchive, pin, unpin, move to trash or restore many notes at once. '
+            'Permission required notespace member or above, checked for each notespace of the notes. '
+            'Returns the result of each note.'),
+        request_body=NoteBulkActionSerializer,
+        responses={200: NoteBulkResultSerializer(many=True)})
+    @action(methods=['post'], detail=False, url_path='bulk', pagination_class=None,
+            permission_classes=[IsAdminUser | IsNoteSpaceMember])
+    def bulk(self, request, *args, **kwargs):
+        serializer = NoteBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        flag_name, flag_value, log_action = NoteBulkActionSerializer.FLAG_ACTIONS[serializer.validated_data['action']]
+        uuids = list(dict.fromkeys(serializer.validated_data['notes']))  # remove duplicates, keep order
+
+        Status = NoteBulkResultSerializer.Status
+        statuses = dict.fromkeys(uuids, Status.NOT_FOUND)
+        with transaction.atomic():
+            rows = list(
+                Note.objects
+                .filter(uuid__in=uuids)
+                .select_for_update()
+                .values_list('id', 'uuid', 'notespace_id', flag_name)
+            )
+
+            # check permission once for each notespace
+            notespaces = NoteSpace.objects.in_bulk({row[2] for row in rows})
+            allowed = {pk: self.has_notespace_perms(notespace) for pk, notespace in notespaces.items()}
+
+            changed_ids = []
+            for note_id, uuid, notespace_id, old_value in rows:
+                if not allowed[notespace_id]:
+                    statuses[uuid] = Status.DENIED
+                elif old_value == flag_value:
+                    statuses[uuid] = Status.UNCHANGED
+                else:
+                    statuses[uuid] = Status.UPDATED
+                    changed_ids.append(note_id)
+
+            if changed_ids:
+                now = timezone.now()
+                # queryset.update() does not touch auto_now fields
+                changes = {flag_name: flag_value, 'updated_at': now}
+                if flag_name == 'is_deleted':
+                    changes['deleted_at'] = now if flag_value else None
+                Note.objects.filter(id__in=changed_ids).update(**changes)
+                notespace_ids = {note_id: notespace_id for note_id, _, notespace_id, _ in rows}
+                NoteLog.objects.bulk_create([
+                    NoteLog(note_id=note_id, notespace_id=notespace_ids[note_id], user=request.user, action=log_action)
+                    for note_id in changed_ids
+                ])
+                if flag_name == 'is_deleted':
+                    # notes in the trash are not searchable
+                    if flag_value:
+                        unindex_notes(changed_ids)
+                    else:
+                        index_notes(Note.objects.filter(id__in=changed_ids).only(
+                            'id', 'notespace_id', 'title', 'is_deleted', 'body__content').select_related('body'))
+
+        results = NoteBulkResultSerializer([
+            {'uuid': uuid, 'ok': status in (Status.UPDATED, Status.UNCHANGED), 'status': status}
+            for uuid, status in statuses.items()
+        ], many=True)
+        return Response(results.data)
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Set, add or remove tags of many notes at once. '
+            'Notes and tags should belong to the notespace. '
+            'Permission required notespace member or above. '
+            'Returns the result of each note.'),
+        request_body=NoteTagsSerializer,
+        responses={200: NoteTagsResultSerializer(many=True)})
+    @action(methods=['post'], detail=False, url_path='tags', pagination_class=None,
+            permission_classes=[IsAdminUser | IsNoteSpaceMember])
+    def update_tags(self, request, *args, **kwargs):
+        serializer = NoteTagsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        notespace = serializer.validated_data['notespace']
+        self.check_notespace_perms(notespace)
+
+        mode = serializer.validated_data['mode']
+        tags = {tag.id: tag for tag in serializer.validated_data['tags']}
+        uuids = list(dict.fromkeys(serializer.validated_data['notes']))  # remove duplicates, keep order
+        Mode, Status = NoteTagsSerializer.Mode, NoteTagsResultSerializer.Status
+        NoteTag = Note.tags.through
+
+        with transaction.atomic():
+            notes = dict(Note.objects.filter(notespace=notespace, uuid__in=uuids).values_list('uuid', 'id'))
+            note_ids = list(notes.values())
+
+            existing = NoteTag.objects.filter(note_id__in=note_ids)
+            if mode != Mode.SET:
+                existing = existing.filter(tag_id__in=tags)
+            existing_pairs = set(existing.values_list('note_id', 'tag_id'))
+
+            wanted_pairs = {(note_id, tag_id) for note_id in note_ids for tag_id in tags}
+            if mode == Mode.ADD:
+                added_pairs, removed_pairs = wanted_pairs - existing_pairs, set()
+            elif mode == Mode.REMOVE:
+                added_pairs, removed_pairs = set(), existing_pairs
+            else:
+                added_pairs, removed_pairs = wanted_pairs - existing_pairs, existing_pairs - wanted_pairs
+
+            if removed_pairs:
+                removing = existing if mode == Mode.REMOVE else existing.exclude(tag_id__in=tags)
+                removing.delete()
+            if added_pairs:
+                NoteTag.objects.bulk_create([
+                    NoteTag(note_id=note_id, tag_id=tag_id) for note_id, tag_id in added_pairs
+                ])
+
+            # removed tags may be not in the request (set mode)
+            removed_tags = Tag.objects.in_bulk({tag_id for _, tag_id in removed_pairs} - set(tags))
+            removed_tags.update(tags)
+
+            added, removed = defaultdict(list), defaultdict(list)
+            for note_id, tag_id in sorted(added_pairs):
+                added[note_id].append(tags[tag_id])
+            for note_id, tag_id in sorted(removed_pairs):
+                removed[note_id].append(removed_tags[tag_id])
+
+            # one log for each note and action
+            NoteLog.objects.bulk_create([
+                NoteLog(note_id=note_id, notespace=notespace, user=request.user, action=log_action, extras={
+                    'tags': [{'uuid': str(tag.uuid), 'name': tag.name} for tag in note_tags],
+                })
+                for changes, log_action in ((added, NoteLog.Action.TAGGED), (removed, NoteLog.Action.UNTAGGED))
+                for note_id, note_tags in changes.items()
+            ])
+
+            changed_ids = added.keys() | removed.keys()
+            if changed_ids:
+                # tags are a part of note representation
+                Note.objects.filter(id__in=changed_ids).update(updated_at=timezone.now())
+
+        results = []
+        for uuid in uuids:
+            note_id = notes.get(uuid)
+            if note_id is None:
+                status_ = Status.NOT_FOUND
+            elif note_id in changed_ids:
+                status_ = Status.UPDATED
+            else:
+                status_ = Status.UNCHANGED
+            results.append({
+                'uuid': uuid,
+                'ok': status_ != Status.NOT_FOUND,
+                'status': status_,
+                'added': [tag.uuid for tag in added.get(note_id, [])],
+                'removed': [tag.uuid for tag in removed.get(note_id, [])],
+            })
+        return Response(NoteTagsResultSerializer(results, many=True).data)
+
     def _update_note_flag(self, request, flag_name: str, flag_value: bool, log_action: NoteLog.Action):
         note = self.get_object()
         old_value = getattr(note, flag_name)
         if old_value != flag_value:  # only update when value changed
             with transaction.atomic():
                 setattr(note, flag_name, flag_value)
-                note.save()
+                if flag_name == 'is_deleted':
+                    note.deleted_at = timezone.now() if flag_value else None
+                note.save(update_fields=[flag_name, 'deleted_at', 'updated_at'])
+                if flag_name == 'is_deleted':
+                    # notes in the trash are not searchable
+                    if flag_value:
+                        unindex_note(note)
+                    else:
+                        index_note(note)
                 # add log
                 NoteLog.objects.create(
                     note=note,
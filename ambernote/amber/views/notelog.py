@@ -1,13 +1,55 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.http import Http404
+from django.utils.translation import gettext_lazy as _
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, serializers
-from rest_framework.permissions import AllowAny
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
 
-from .base import BaseViewSet, NoteSpaceRelatedModelViewSetMixin
+from ambernote.authx.models import User
+from .base import BaseViewSet, CursorParameter, DynamicFieldsSerializerMixin, FieldsParameter, \
+    NoteSpaceRelatedModelViewSetMixin, PaginationParameter
+from ..history import reconstruct
 from ..models import Note, NoteLog
+from ..permissions import IsNoteSpaceGuest
 
+LogNoteParameter = openapi.Parameter(
+    name='note',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('UUID of the note, to list its logs (either note or notespace is required)'),
+    required=False,
+)
 
-class NoteLogRetrieveSerializer(serializers.ModelSerializer):
+LogNoteSpaceParameter = openapi.Parameter(
+    name='notespace',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('UUID of the notespace, to list the logs of all its notes (either note or notespace is required)'),
+    required=False,
+)
+
+LogUserParameter = openapi.Parameter(
+    name='user',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('UUID of the user, to list only the logs of the user'),
+    required=False,
+)
+
+LogActionParameter = openapi.Parameter(
+    name='action',
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description=_('Comma-separated actions, to list only the logs of the actions, e.g. "1,2" (created and updated)'),
+    required=False,
+)
+
+
+class NoteLogRetrieveSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = NoteLog
         fields = ('uuid', 'note', 'user', 'action', 'extras', 'created_at', 'updated_at')
@@ -17,6 +59,15 @@ class NoteLogRetrieveSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(slug_field='uuid', read_only=True)
 
 
+class NoteVersionSerializer(serializers.Serializer):
+    note = serializers.UUIDField(read_only=True)
+    log = serializers.UUIDField(read_only=True)
+    revision = serializers.IntegerField(read_only=True, allow_null=True)
+    title = serializers.CharField(read_only=True)
+    content = serializers.JSONField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+
+
 class NoteLogViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
     lookup_field = 'uuid'
     queryset = NoteLog.objects.order_by('-created_at')
@@ -30,19 +81,74 @@ class NoteLogViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
         """
         return [permissions.NOT(AllowAny())]
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+
+        params = self.request.query_params
+        if 'user' in params:
+            # filter by the id, so that the (notespace, user, created_at) index is used
+            try:
+                user_id = User.objects.filter(uuid=params['user']).values_list('id', flat=True).first()
+            except DjangoValidationError:
+                raise serializers.ValidationError('`user` query parameter must be a UUID.')
+            queryset = queryset.filter(user_id=user_id)
+        if 'action' in params:
+            try:
+                actions = {NoteLog.Action(int(value)) for value in params['action'].split(',')}
+            except ValueError:
+                raise serializers.ValidationError('`action` query parameter must be comma-separated actions.')
+            queryset = queryset.filter(action__in=actions)
+        return queryset
+
+    @swagger_auto_schema(manual_parameters=[
+        LogNoteParameter, LogNoteSpaceParameter, LogUserParameter, LogActionParameter,
+        PaginationParameter, CursorParameter, FieldsParameter,
+    ])
     def list(self, request, *args, **kwargs):
         """
-        List all note logs.
+        List logs of a note, or the activity of a notespace (logs of all its notes), latest first.
         """
         if 'note' not in request.query_params:
-            raise serializers.ValidationError('`note` query parameter is required.')
+            if 'notespace' not in request.query_params:
+                raise serializers.ValidationError('`note` or `notespace` query parameter is required.')
+            # only list logs of the notespace
+            return super().list(request, *args, **kwargs)
+
         try:
             note = Note.objects.get(uuid=request.query_params['note'])
-        except Note.DoesNotExist:
+        except (Note.DoesNotExist, DjangoValidationError):
             raise Http404
         # check if the user has permission to access the note
         self.check_notespace_perms(note.notespace)
         # only list logs of the note
         self.queryset = self.queryset.filter(note=note)
 
-        return ModelViewSet.list(self, request, *args, **kwargs)
+        return BaseViewSet.list(self, request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description=_(
+            'Get the title and content of the note right after the log. '
+            'Permission required notespace guest or above.'),
+        responses={200: NoteVersionSerializer()})
+    @action(methods=['get'], detail=True, url_path='version',
+            permission_classes=[IsAdminUser | IsNoteSpaceGuest])
+    def version(self, request, *args, **kwargs):
+        log = get_object_or_404(self.get_queryset().select_related('note__notespace'), uuid=kwargs['uuid'])
+        # check if the user has permission to access the note
+        self.check_notespace_perms(log.note.notespace)
+
+        version = reconstruct(log)
+        if version is None:
+            raise Http404('The version can not be reconstructed from logs.')
+
+        serializer = NoteVersionSerializer({
+            'note': log.note.uuid,
+            'log': log.uuid,
+            'revision': version.revision,
+            'title': version.title,
+            'content': version.content,
+            'created_at': log.created_at,
+        })
+        return Response(serializer.data)
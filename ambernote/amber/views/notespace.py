@@ -2,7 +2,7 @@ from django.db import transaction
 from rest_framework import serializers
 from rest_framework.permissions import IsAdminUser
 
-from .base import BaseViewSet
+from .base import BaseViewSet, DynamicFieldsSerializerMixin
 from ..models import NoteSpace, NoteSpaceMember
 
 
@@ -16,7 +16,21 @@ class EmbeddedMemberSerializer(serializers.ModelSerializer):
     role = serializers.ChoiceField(choices=NoteSpaceMember.Role.choices)
 
 
-class NoteSpaceRetrieveSerializer(serializers.ModelSerializer):
+class MemberUserSlugField(serializers.SlugRelatedField):
+    """
+    A member represented by the uuid of its user, as users are referred to by embedded members.
+    """
+    # related objects of the member read by the field (see DynamicFieldsSerializerMixin.prune_queryset)
+    related_lookups = ('user',)
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field='uuid', **kwargs)
+
+    def to_representation(self, obj):
+        return super().to_representation(obj.user)
+
+
+class NoteSpaceRetrieveSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = NoteSpace
         fields = ('uuid', 'type', 'name', 'created_at', 'updated_at', 'members')
@@ -24,6 +38,10 @@ class NoteSpaceRetrieveSerializer(serializers.ModelSerializer):
 
     members = EmbeddedMemberSerializer(many=True, read_only=True)
 
+    collapsed_fields = {
+        'members': MemberUserSlugField(many=True, read_only=True),
+    }
+
 
 class NoteSpaceCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -42,6 +60,7 @@ class NoteSpaceUpdateSerializer(serializers.ModelSerializer):
 class NoteSpaceViewSet(BaseViewSet):
     lookup_field = 'uuid'
     queryset = NoteSpace.objects.order_by('-created_at')
+    etag_relations = ('members',)
 
     def get_serializer_class(self):
         if self.action in ['create']:
@@ -3,7 +3,8 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, serializers
 from rest_framework.permissions import IsAdminUser
 
-from .base import BaseViewSet, NoteSpaceParameter, NoteSpaceRelatedModelViewSetMixin
+from .base import BaseViewSet, CursorParameter, DynamicFieldsSerializerMixin, FieldsParameter, NoteSpaceParameter, \
+    NoteSpaceRelatedModelViewSetMixin, PaginationParameter
 from ..models import NoteSpace, Tag
 from ..permissions import IsNoteSpaceMember
 
@@ -17,7 +18,7 @@ class TagCreateSerializer(serializers.ModelSerializer):
     notespace = serializers.SlugRelatedField(slug_field='uuid', queryset=NoteSpace.objects.all())
 
 
-class TagRetrieveSerializer(serializers.ModelSerializer):
+class TagRetrieveSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('uuid', 'name', 'notespace', 'created_at', 'updated_at')
@@ -44,6 +45,6 @@ class TagViewSet(NoteSpaceRelatedModelViewSetMixin, BaseViewSet):
 
     @swagger_auto_schema(
         operation_description=_('List all tags of the notespace.'),
-        manual_parameters=[NoteSpaceParameter])
+        manual_parameters=[NoteSpaceParameter, PaginationParameter, CursorParameter, FieldsParameter])
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -1,20 +1,22 @@
-from rest_framework import serializers, viewsets
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 from ambernote.authx.models import User
+from .base import BaseViewSet, DynamicFieldsSerializerMixin, FieldsParameter
 from ..permissions import IsAdminUserOrSelf
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('uuid', 'email', 'fullname')
         read_only_fields = ('uuid', 'email')
 
 
-class UserDetailSerializer(serializers.ModelSerializer):
+class UserDetailSerializer(DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     """
     The serializer for the user detail view.
     It contains sensitive information, so it should only be used by the user himself.
@@ -27,7 +29,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(BaseViewSet):
     lookup_field = 'uuid'
     queryset = User.objects.order_by('-date_joined')
     serializer_class = UserSerializer
@@ -39,6 +41,15 @@ class UserViewSet(viewsets.ModelViewSet):
         # otherwise
         return [IsAdminUser()]
 
+    @swagger_auto_schema(manual_parameters=[FieldsParameter])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(manual_parameters=[FieldsParameter])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(manual_parameters=[FieldsParameter])
     @action(detail=False, methods=['get'], url_path='me',
             serializer_class=UserDetailSerializer,
             permission_classes=[IsAuthenticated])
@@ -0,0 +1,356 @@
+"""
+Metrics of the application, exposed in the Prometheus text format at ``/metrics``.
+
+Metrics are kept in memory by each process. With several worker processes (gunicorn, uvicorn),
+set ``METRICS_DIR`` to a directory shared by the workers: every worker writes a snapshot of its metrics
+to ``<METRICS_DIR>/<pid>-<uuid>.json`` at most every ``METRICS_FLUSH_INTERVAL`` seconds,
+and ``/metrics`` sums the snapshots of all workers, so the worker answering the scrape does not matter.
+The uuid is drawn by each process, so that a worker never overwrites the snapshot of an exited worker
+which had the same pid.
+
+So that counters never decrease, the snapshot of an exited worker is folded into ``archived.json``
+(as the multiprocess mode of prometheus_client does): by the worker itself when it exits,
+or by :func:`mark_process_dead` for a worker which was killed, e.g. from the ``child_exit`` hook of gunicorn.
+Snapshots are folded and read under a file lock, so a scrape never counts a worker twice.
+Empty the directory before starting.
+
+``/metrics`` requires ``Authorization: Bearer <METRICS_TOKEN>``, or the session of a staff user.
+
+Requests are counted and timed by :class:`MetricsMiddleware`, labeled by the view and the action,
+e.g. ``view="NoteViewSet",action="list"``.
+"""
+import atexit
+import hmac
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .timing import current_timings
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where snapshots are folded without a lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (metric name, label values) => values, see Counter and Histogram
+Samples = dict[tuple[str, tuple[str, ...]], list[float]]
+
+# snapshot of the exited workers, in METRICS_DIR
+ARCHIVE_NAME = 'archived.json'
+LOCK_NAME = '.lock'
+
+
+def _read_samples(path: Path) -> Samples:
+    items = json.loads(path.read_text())
+    return {(name, tuple(labels)): values for name, labels, values in items}
+
+
+def _write_samples(path: Path, samples: Samples) -> None:
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps([[name, labels, values] for (name, labels), values in samples.items()]))
+    os.replace(tmp_path, path)  # atomic, a scrape never reads a partial snapshot
+
+
+def _add_samples(samples: Samples, other: Samples) -> None:
+    for key, values in other.items():
+        if key not in samples:
+            samples[key] = list(values)
+        elif len(samples[key]) == len(values):
+            samples[key] = [a + b for a, b in zip(samples[key], values)]
+
+
+@contextmanager
+def _locked(directory: str, exclusive: bool):
+    """
+    Lock the directory, exclusively to fold snapshots, shared to read them.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(Path(directory) / LOCK_NAME, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _archive(directory: str, paths: list[Path], samples: Optional[Samples] = None) -> None:
+    """
+    Fold snapshots of exited processes into the archive, and remove them.
+    :param samples: the current metrics of the process whose snapshot is `paths`, folded instead of
+        its (older) snapshot, which is only removed
+    """
+    archive_path = Path(directory) / ARCHIVE_NAME
+    with _locked(directory, exclusive=True):
+        archived = _read_samples(archive_path) if archive_path.exists() else {}
+        if samples is not None:
+            _add_samples(archived, samples)
+        else:
+            for path in paths:
+                try:
+                    _add_samples(archived, _read_samples(path))
+                except (OSError, ValueError):  # e.g. archived meanwhile
+                    continue
+        _write_samples(archive_path, archived)
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    """
+    Fold the snapshot of an exited worker into the archive,
+    for workers which could not do it themselves, e.g. killed by a timeout.
+    """
+    directory = directory or settings.METRICS_DIR
+    if directory is not None:
+        _archive(directory, list(Path(directory).glob(f'{pid}-*.json')))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, 'Metric'] = {}
+        self.values: Samples = {}
+        self.lock = threading.Lock()
+        self.flushed_at = monotonic()
+        self._pid, self._process_name = None, None
+
+    def register(self, metric: 'Metric') -> None:
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> Samples:
+        with self.lock:
+            return {key: list(values) for key, values in self.values.items()}
+
+    @property
+    def process_name(self) -> str:
+        """
+        Name of the snapshot of this process, drawn again in a forked worker.
+        """
+        if self._pid != os.getpid():
+            self._pid, self._process_name = os.getpid(), f'{os.getpid()}-{uuid4().hex}'
+        return self._process_name
+
+    def flush(self, directory: str) -> None:
+        """
+        Write the snapshot of this process to the directory.
+        """
+        self.flushed_at = monotonic()
+        _write_samples(Path(directory) / f'{self.process_name}.json', self.snapshot())
+
+    def archive(self, directory: str) -> None:
+        """
+        Fold the metrics of this process into the archive of the directory, when the process exits.
+        """
+        _archive(directory, [Path(directory) / f'{self.process_name}.json'], self.snapshot())
+
+    def collect(self, directory: Optional[str] = None) -> Samples:
+        """
+        Get the metrics of this process, or of all processes sharing the directory.
+        """
+        if directory is None:
+            return self.snapshot()
+
+        self.flush(directory)
+        samples: Samples = {}
+        with _locked(directory, exclusive=False):
+            for path in Path(directory).glob('*.json'):
+                try:
+                    _add_samples(samples, _read_samples(path))
+                except (OSError, ValueError):  # e.g. archived meanwhile
+                    logger.warning(f'Can not read metrics from {path}')
+        return samples
+
+    def render(self, samples: Samples) -> str:
+        """
+        Render the samples in the Prometheus text format.
+        """
+        by_name: dict[str, list[tuple[tuple[str, ...], list[float]]]] = {}
+        for (name, labels), values in sorted(samples.items()):
+            by_name.setdefault(name, []).append((labels, values))
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines += [f'# HELP {name} {metric.documentation}', f'# TYPE {name} {metric.type}']
+            for labels, values in by_name.get(name, []):
+                lines += metric.render(labels, values)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.registry = registry
+        registry.register(self)
+
+    def render(self, labels: tuple[str, ...], values: list[float]) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1.0) -> None:
+        key = (self.name, labels)
+        with self.registry.lock:
+            values = self.registry.values.get(key)
+            if values is None:
+                values = self.registry.values[key] = [0.0]
+            values[0] += amount
+
+    def render(self, labels, values):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {values[0]}']
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    def observe(self, value: float, labels: tuple[str, ...] = ()) -> None:
+        # values are the (non-cumulative) count of each bucket, then the sum
+        index = bisect_left(self.buckets, value)
+        key = (self.name, labels)
+        with self.registry.lock:
+            values = self.registry.values.get(key)
+            if values is None:
+                values = self.registry.values[key] = [0.0] * (len(self.buckets) + 1)
+            values[index] += 1
+            values[-1] += value
+
+    def render(self, labels, values):
+        lines, count = [], 0.0
+        for bound, bucket_count in zip(self.buckets, values):
+            count += bucket_count
+            le = '+Inf' if bound == float('inf') else str(bound)
+            lines.append(f'{self.name}_bucket{_format_labels((*self.labelnames, "le"), (*labels, le))} {count}')
+        label_text = _format_labels(self.labelnames, labels)
+        lines += [f'{self.name}_sum{label_text} {values[-1]}', f'{self.name}_count{label_text} {count}']
+        return lines
+
+
+REQUESTS = Counter(
+    'ambernote_http_requests_total', 'HTTP requests by view, action, method and status.',
+    ('view', 'action', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'ambernote_http_request_duration_seconds', 'Latency of HTTP requests by view and action.',
+    ('view', 'action'),
+)
+DB_QUERIES = Counter(
+    'ambernote_db_queries_total', 'Database queries of API requests by view and action.',
+    ('view', 'action'),
+)
+DB_QUERY_SECONDS = Counter(
+    'ambernote_db_query_seconds_total', 'Time spent in database queries of API requests by view and action.',
+    ('view', 'action'),
+)
+DB_CONNECTIONS = Counter(
+    'ambernote_db_connections_created_total',
+    'Database connections opened, a fast growth means connections are not reused (see CONN_MAX_AGE).',
+    ('alias',),
+)
+CACHE_REQUESTS = Counter(
+    'ambernote_cache_requests_total',
+    'Lookups of cached values by cache and result ("memo" is a hit of the request memo).',
+    ('cache', 'result'),
+)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS.inc((connection.alias,))
+
+
+def _view_labels(request) -> tuple[str, str]:
+    """
+    :returns: (view, action), e.g. ("NoteViewSet", "list"), or the view function and the method for other views
+    """
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', request.method.lower()
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view_class is None:
+        return match.func.__name__, request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return view_class.__name__, actions.get(request.method.lower(), request.method.lower())
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = settings.METRICS_DIR
+        self.flush_interval = settings.METRICS_FLUSH_INTERVAL
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(REGISTRY.archive, self.directory)
+
+    def __call__(self, request):
+        start = perf_counter()
+        response = self.get_response(request)
+        duration = perf_counter() - start
+
+        view, action = _view_labels(request)
+        REQUESTS.inc((view, action, request.method, str(response.status_code)))
+        REQUEST_DURATION.observe(duration, (view, action))
+        timings = current_timings()
+        if timings is not None:
+            DB_QUERIES.inc((view, action), timings.db_count)
+            DB_QUERY_SECONDS.inc((view, action), timings.db_duration)
+
+        if self.directory is not None and monotonic() - REGISTRY.flushed_at >= self.flush_interval:
+            REGISTRY.flush(self.directory)
+        return response
+
+
+def metrics_view(request):
+    """
+    Metrics in the Prometheus text format,
+    for "Authorization: Bearer <METRICS_TOKEN>" (if it is set) or staff users.
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    token_valid = settings.METRICS_TOKEN is not None \
+        and hmac.compare_digest(authorization.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode())
+    user = getattr(request, 'user', None)
+    if not token_valid and not (user is not None and user.is_staff):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    samples = REGISTRY.collect(settings.METRICS_DIR)
+    return HttpResponse(REGISTRY.render(samples), content_type=CONTENT_TYPE)
@@ -51,7 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'ambernote.timing.ServerTimingMiddleware',  # Server-Timing header and timing logs of API requests
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'ambernote.metrics.MetricsMiddleware',  # request metrics, exposed at /metrics
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Auto language detection based on browser preferences
     'django.middleware.common.CommonMiddleware',
@@ -193,3 +195,57 @@ ALLAUTH_CONFIRM_EMAIL_ON_GET = True
 # ambernote settings
 
 SPA_ROOT = BASE_DIR / 'ambernote-webui' / 'dist'
+
+# Retention of note logs in days for each action, None means keeping forever.
+# Expired logs are deleted by `manage.py compact_notelogs`, the latest log of a note is always kept.
+NOTELOG_RETENTION_DAYS = {
+    'CREATED': None,
+    'UPDATED': None,
+    'DELETED': None,
+    'RESTORED': None,
+    'ARCHIVED': 180,
+    'UNARCHIVED': 180,
+    'TAGGED': 365,
+    'UNTAGGED': 365,
+    'PINNED': 180,
+    'UNPINNED': 180,
+}
+
+# Consecutive UPDATED logs of a note by the same user within the window are merged into one
+# by `manage.py compact_notelogs`, once they are older than NOTELOG_MERGE_AFTER_HOURS.
+NOTELOG_MERGE_WINDOW_MINUTES = 60
+NOTELOG_MERGE_AFTER_HOURS = 24
+
+# Notes in the trash are deleted permanently after this period (in days) by `manage.py purge_trash`
+TRASH_RETENTION_DAYS = 30
+
+# Sync tokens are moved back to changes older than this period (in seconds), so that changes committed late
+# (after changes with higher ids were synced) are still returned, see ambernote/amber/sync.py.
+SYNC_SAFETY_WINDOW_SECONDS = 60
+
+# Roles of users in note spaces are cached in this cache for this period (in seconds),
+# cached roles of a note space are invalidated as soon as any of its members changes.
+# The cache must be shared by all worker processes (e.g. Redis or Memcached by CACHE_URL),
+# otherwise an invalidation by one worker is not seen by the others: without CACHE_URL,
+# roles are only memoized in each request.
+NOTESPACE_ROLE_CACHE = 'default' if os.environ.get('CACHE_URL') else None
+NOTESPACE_ROLE_CACHE_TIMEOUT = 60
+
+# Values of compressed JSON fields (note contents and note log extras) larger than this size (in bytes)
+# are compressed at rest, run `manage.py recompress_json` after changing it to rewrite existing rows.
+JSON_COMPRESSION_THRESHOLD = 1024
+
+# API requests (under this path) are timed by ServerTimingMiddleware, see ambernote/timing.py.
+# Requests slower than SERVER_TIMING_SLOW_MS (in milliseconds) are slow,
+# this fraction of them is logged with their SQL queries.
+SERVER_TIMING_PATH_PREFIX = '/api/'
+SERVER_TIMING_SLOW_MS = 500
+SERVER_TIMING_SLOW_SAMPLE_RATE = 0.1
+
+# Metrics are exposed at /metrics in the Prometheus text format, see ambernote/metrics.py.
+# With several worker processes, set METRICS_DIR to an (initially empty) directory shared by the workers,
+# where each worker writes its metrics every METRICS_FLUSH_INTERVAL seconds.
+# /metrics is only served to staff users, and to scrapers with "Authorization: Bearer <METRICS_TOKEN>" if it is set.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 1
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
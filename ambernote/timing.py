@@ -0,0 +1,179 @@
+"""
+Server-Timing of API requests.
+
+:class:`ServerTimingMiddleware` measures every request under ``SERVER_TIMING_PATH_PREFIX``:
+the number and time of database queries, the time spent serializing objects (see :class:`TimedSerializerMixin`)
+and checking permissions (see :class:`timer`).
+They are returned in the ``Server-Timing`` header, e.g. ``db;dur=3.100, serialize;dur=1.200, ..., db-queries;desc="4"``,
+and logged as a JSON line by the ``ambernote.timing`` logger (at INFO level).
+A sample of slow requests is logged with the SQL of their queries (at WARNING level).
+
+Measurements are a few counters and ``perf_counter()`` calls, so it is meant to be left on in production.
+"""
+import json
+import logging
+import random
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# at most this number of queries are kept for the log of a slow request
+MAX_SAMPLED_QUERIES = 100
+
+_current: ContextVar[Optional['RequestTimings']] = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Timings of the current request, durations are in seconds.
+    """
+    __slots__ = ('durations', 'running', 'db_count', 'db_duration', 'queries')
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self.running: set[str] = set()  # names of running timers
+        self.db_count = 0
+        self.db_duration = 0.0
+        self.queries: list[tuple[str, float]] = []
+
+    def add(self, name: str, duration: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def add_query(self, sql: str, duration: float) -> None:
+        self.db_count += 1
+        self.db_duration += duration
+        if len(self.queries) < MAX_SAMPLED_QUERIES:
+            self.queries.append((sql, duration))
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """
+    Get timings of the current request, None if it is not timed.
+    """
+    return _current.get()
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    """
+    Time the queries of every database connection, once for all,
+    which is cheaper than wrapping the connections in each request.
+    """
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+class timer:
+    """
+    Context manager adding the time spent in it to the named timing of the current request, if it is measured.
+    Nested timers of the same name are only counted once.
+    """
+    __slots__ = ('name', 'timings', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _current.get()
+        if self.timings is not None:
+            if self.name in self.timings.running:
+                self.timings = None  # nested, the outer timer counts it
+            else:
+                self.timings.running.add(self.name)
+                self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, perf_counter() - self.start)
+            self.timings.running.discard(self.name)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        with timer('serialize'):
+            return super().to_representation(data)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding the time spent in `to_representation` to the "serialize" timing of the request.
+    A list is timed as a whole (see :class:`TimedListSerializer`), rather than each of its items.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        kwargs['child'] = cls()
+        return TimedListSerializer(*args, **kwargs)
+
+    def to_representation(self, instance):
+        if self.parent is not None:  # an item of a list, or a nested object, timed by its parent
+            return super().to_representation(instance)
+        with timer('serialize'):
+            return super().to_representation(instance)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path_prefix = settings.SERVER_TIMING_PATH_PREFIX
+        self.slow_ms = settings.SERVER_TIMING_SLOW_MS
+        self.slow_sample_rate = settings.SERVER_TIMING_SLOW_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not request.path.startswith(self.path_prefix):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = perf_counter() - start
+            _current.reset(token)
+
+        metrics = [('db', timings.db_duration), *timings.durations.items(), ('total', total)]
+        response['Server-Timing'] = ', '.join([f'{name};dur={duration * 1000:.3f}' for name, duration in metrics]) \
+            + f', db-queries;desc="{timings.db_count}"'
+
+        slow = total * 1000 >= self.slow_ms
+        if slow or logger.isEnabledFor(logging.INFO):
+            self.log(request, response, timings, metrics, slow)
+        return response
+
+    def log(self, request, response, timings: RequestTimings, metrics: list[tuple[str, float]], slow: bool):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': request.resolver_match.view_name if request.resolver_match else None,
+            'status': response.status_code,
+            'db_queries': timings.db_count,
+            **{f'{name}_ms': _ms(duration) for name, duration in metrics},
+        }
+        logger.info(json.dumps(record))
+        if slow and random.random() < self.slow_sample_rate:
+            record['queries'] = [{'sql': sql, 'ms': _ms(duration)} for sql, duration in timings.queries]
+            logger.warning(json.dumps(record))
@@ -17,6 +17,7 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path, re_path
 
+from .metrics import metrics_view
 from .views import schema_view, spa_files_view
 
 urlpatterns = []
@@ -37,6 +38,8 @@ urlpatterns += [
     # API documentation
     path('api/swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('api/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
     # All other paths should be handled by the SPA
     # Exclude API, django-admin, and debug-toolbar paths
     re_path(r'^(?!api/|dj-admin/|__debug__/)(?P<path>.*)$', spa_files_view, name='spa-files-view'),